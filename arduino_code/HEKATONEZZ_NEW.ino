@@ -13,8 +13,8 @@
   1. Standby Mode: ESP32 menunggu tap RFID.
   2. Login Process: Saat RFID di-tap, kirim POST ke /api/scan-rfid dengan body {"card_id": "UID"}.
   3. Bin Check: Sebelum membuka pintu, cek sensor Ultrasonic. Jika jarak <= 5cm, jangan buka pintu, kirim status 'PENUH'. Jika aman, kirim status 'AMAN'.
-  4. Sorting Flow: Setelah kirim data user, ESP32 menunggu perintah balik dari Backend. Jika Backend membalas jenis sampah, gerakkan Servo Utama (D13) buka, tunggu 3 detik, lalu gerakkan Servo Pemilah (D25) ke arah yang sesuai.
-  5. Real-time Update: Kirim data jarak Ultrasonic secara berkala (tiap 2 detik) ke endpoint /api/bin-update.
+  4. Sorting Flow: Setelah kirim data user, Backend langsung membalas job_id (status "pending"). ESP32 long-poll ke /api/scan-status/<job_id>?wait=10 sampai hasil klasifikasi siap. Jika Backend membalas jenis sampah, gerakkan Servo Utama (D13) buka, tunggu 3 detik, lalu gerakkan Servo Pemilah (D25) ke arah yang sesuai.
+  5. Real-time Update: Baca jarak Ultrasonic tiap 2 detik, simpan di buffer, lalu kirim sekaligus (batch biner) tiap 10 detik ke /api/bin-telemetry. Status PENUH/AMAN saat tap tetap dikirim langsung ke /api/bin-update.
 */
 
 #include <SPI.h>
@@ -28,6 +28,8 @@
 const char* ssid     = "wiinn";      // GANTI DENGAN WIFI HP/LAPTOP
 const char* password = "malesahh";  // GANTI PASSNYA
 const String serverUrl = "http://10.81.7.144:5001";  // Ganti dengan IP Laptop Anda
+const String DEVICE_ID = "BIN-01";  // ID unik per tempat sampah (backend memisahkan state per bin)
+const String KIOSK_ID  = "default"; // Samakan dengan ?kiosk= di browser kiosk agar session per kiosk terpisah
 
 // --- 2. KONFIGURASI PIN ---
 #define SS_PIN      21
@@ -42,6 +44,14 @@ const int BATAS_PENUH = 5; // cm
 const int SERVO_PRIMARY_DELAY = 5;  // Reduced from 20ms to 5ms for faster movement
 const int SERVO_SECONDARY_DELAY = 5; // Reduced from 12ms to 5ms for faster movement
 const unsigned long ULTRASONIC_UPDATE_INTERVAL = 2000; // 2 detik
+const unsigned long TELEMETRY_SEND_INTERVAL = 10000;   // Kirim batch pembacaan tiap 10 detik
+const int TELEMETRY_BUFFER_SIZE = 16;                  // Maks pembacaan yang ditahan (tertua dibuang jika penuh)
+const int TELEMETRY_MAX_ID_LEN = 32;
+const int SCAN_STATUS_WAIT_SECONDS = 10;     // Long-poll per request ke /api/scan-status
+const unsigned long SCAN_RESULT_TIMEOUT = 30000; // Maks 30 detik menunggu hasil scan
+// Respons scan/job berisi user, log & analysis; ESP32 hanya menyimpan field di bawah (lihat parseRespons).
+// 6 field + teks-nya (job_id 32 karakter, message pendek), dihitung seperti ArduinoJson Assistant
+const size_t SCAN_RESPONSE_CAPACITY = JSON_OBJECT_SIZE(6) + 256;
 
 // Setting Posisi Servo
 const int TUTUP_UTAMA  = 0;
@@ -58,12 +68,28 @@ Servo servoUtama;
 Servo servoPemilah;
 
 unsigned long lastUltrasonicUpdate = 0;
+unsigned long lastTelemetrySend = 0;
+
+struct TelemetryReading {
+  unsigned long takenAt;  // millis() saat dibaca
+  uint16_t distanceMm;
+};
+TelemetryReading telemetryBuffer[TELEMETRY_BUFFER_SIZE];
+int telemetryCount = 0;
+// Batch yang sedang dikirim: id & jumlah pembacaannya tetap sama untuk setiap retry
+// sampai backend membalas, sehingga backend bisa menolak batch yang sudah pernah diterima
+uint32_t telemetryBatchId = 0;
+int telemetryBatchCount = 0;
 
 // Forward declarations
 int bacaUltrasonic();
 void updateBinStatus(int distance_cm, String status);
+void bufferTelemetry(int distance_cm);
+void kirimTelemetryBatch();
 void handleCard(String cardID, int distance_cm);
 bool kirimKeBackend(String uid, DynamicJsonDocument& responseDoc, int distance_cm);
+bool tungguHasilScan(const String& jobId, DynamicJsonDocument& responseDoc);
+bool parseRespons(const String& response, DynamicJsonDocument& responseDoc);
 void operateServo(const String& command);
 
 void setup() {
@@ -133,7 +159,8 @@ void updateBinStatus(int distance_cm, String status = "terisi") {
   
   http.addHeader("Content-Type", "application/json");
   
-  String payload = "{\"distance_cm\": " + String(distance_cm) + 
+  String payload = "{\"device_id\": \"" + DEVICE_ID + "\"" +
+                   ", \"distance_cm\": " + String(distance_cm) +
                    ", \"status\": \"" + status + "\"}";
   
   int httpResponseCode = http.POST(payload);
@@ -165,15 +192,20 @@ void loop() {
      WiFi.reconnect();
   }
 
-  // Real-time Update Ultrasonic ke Backend (setiap 2 detik)
+  // Baca Ultrasonic tiap 2 detik ke buffer, kirim batch tiap 10 detik (atau saat buffer penuh)
   unsigned long currentMillis = millis();
   if (currentMillis - lastUltrasonicUpdate >= ULTRASONIC_UPDATE_INTERVAL) {
     int jarak = bacaUltrasonic();
     if (jarak > 0 && jarak < 999) {
-      updateBinStatus(jarak);
+      bufferTelemetry(jarak);
     }
     lastUltrasonicUpdate = currentMillis;
   }
+  if (telemetryCount > 0 &&
+      (currentMillis - lastTelemetrySend >= TELEMETRY_SEND_INTERVAL || telemetryCount == TELEMETRY_BUFFER_SIZE)) {
+    kirimTelemetryBatch();
+    lastTelemetrySend = currentMillis;
+  }
 
   // 1. CEK RFID
   if (rfid.PICC_IsNewCardPresent() && rfid.PICC_ReadCardSerial()) {
@@ -216,13 +248,24 @@ void loop() {
 // --- LOGIKA UTAMA ---
 void handleCard(String cardID, int distance_cm) {
   Serial.println("📡 Meminta backend mengidentifikasi role / sampah...");
-  DynamicJsonDocument responseDoc(768);
+  DynamicJsonDocument responseDoc(SCAN_RESPONSE_CAPACITY);
   if (!kirimKeBackend(cardID, responseDoc, distance_cm)) {
     Serial.println("❌ Backend tidak responsif, coba ulang.");
     return;
   }
 
-  const String status = responseDoc["status"] | "";
+  String status = responseDoc["status"] | "";
+  if (status == "pending") {
+    // Backend memproses kamera + AI di background, ambil hasilnya dengan job_id
+    const String jobId = responseDoc["job_id"] | "";
+    Serial.println("⏳ Scan diproses backend (job " + jobId + ")...");
+    if (jobId.length() == 0 || !tungguHasilScan(jobId, responseDoc)) {
+      Serial.println("❌ Hasil scan tidak diterima, coba ulang.");
+      return;
+    }
+    status = responseDoc["status"] | "";
+  }
+
   if (status == "role_login") {
     const String role = responseDoc["role"] | "unknown";
     Serial.printf("👤 Role detected: %s\n", role.c_str());
@@ -384,17 +427,92 @@ void operateServo(const String& command) {
   Serial.println("✅ Selesai - Semua servo kembali ke posisi awal.");
 }
 
+// --- FUNGSI TELEMETRY BATCH ---
+void bufferTelemetry(int distance_cm) {
+  if (telemetryCount == TELEMETRY_BUFFER_SIZE) {
+    // Server tidak terjangkau: buang pembacaan tertua, simpan yang terbaru
+    memmove(&telemetryBuffer[0], &telemetryBuffer[1], sizeof(TelemetryReading) * (TELEMETRY_BUFFER_SIZE - 1));
+    telemetryCount--;
+    if (telemetryBatchCount > 0) {
+      telemetryBatchCount--;  // Batch tertunda ikut kehilangan pembacaan tertuanya, id tetap
+    }
+  }
+  telemetryBuffer[telemetryCount].takenAt = millis();
+  telemetryBuffer[telemetryCount].distanceMm = (uint16_t)(distance_cm * 10);
+  telemetryCount++;
+}
+
+// Format biner: "EB", versi 1, panjang DEVICE_ID, DEVICE_ID, lalu per pembacaan
+// umur (ms, uint32 LE) + jarak (mm, uint16 LE). 16 pembacaan = ~110 byte.
+// Umur berubah di setiap retry, jadi backend mengenali batch ulang dari header X-Telemetry-Batch.
+void kirimTelemetryBatch() {
+  if (telemetryBatchId == 0 || telemetryBatchCount == 0) {
+    // Batch baru; pembacaan yang masuk selama retry menunggu batch berikutnya
+    telemetryBatchId = esp_random() | 1;
+    telemetryBatchCount = telemetryCount;
+  }
+
+  uint8_t payload[4 + TELEMETRY_MAX_ID_LEN + TELEMETRY_BUFFER_SIZE * 6];
+  uint8_t idLen = min((int)DEVICE_ID.length(), TELEMETRY_MAX_ID_LEN);
+  payload[0] = 'E';
+  payload[1] = 'B';
+  payload[2] = 1;
+  payload[3] = idLen;
+  memcpy(payload + 4, DEVICE_ID.c_str(), idLen);
+
+  size_t pos = 4 + idLen;
+  unsigned long now = millis();
+  for (int i = 0; i < telemetryBatchCount; i++) {
+    uint32_t age = now - telemetryBuffer[i].takenAt;
+    uint16_t mm = telemetryBuffer[i].distanceMm;
+    payload[pos++] = age & 0xFF;
+    payload[pos++] = (age >> 8) & 0xFF;
+    payload[pos++] = (age >> 16) & 0xFF;
+    payload[pos++] = (age >> 24) & 0xFF;
+    payload[pos++] = mm & 0xFF;
+    payload[pos++] = (mm >> 8) & 0xFF;
+  }
+
+  HTTPClient http;
+  http.setTimeout(3000);
+  if (!http.begin(serverUrl + "/api/bin-telemetry")) {
+    Serial.println("⚠️ Telemetry: Failed to connect");
+    return;
+  }
+  http.addHeader("Content-Type", "application/octet-stream");
+  http.addHeader("X-Telemetry-Batch", String(telemetryBatchId, HEX));
+  int httpResponseCode = http.POST(payload, pos);
+  if (httpResponseCode > 0 && httpResponseCode < 500) {
+    // Terkirim (4xx = data ditolak, tidak ada gunanya dikirim ulang)
+    Serial.print("✅ Telemetry batch: ");
+    Serial.print(telemetryBatchCount);
+    Serial.print(" pembacaan (HTTP ");
+    Serial.print(httpResponseCode);
+    Serial.println(")");
+    // Buang pembacaan batch ini saja, pembacaan yang masuk selama retry tetap di buffer
+    telemetryCount -= telemetryBatchCount;
+    memmove(&telemetryBuffer[0], &telemetryBuffer[telemetryBatchCount], sizeof(TelemetryReading) * telemetryCount);
+    telemetryBatchId = 0;
+    telemetryBatchCount = 0;
+  }
+  // Gagal koneksi / 5xx: buffer disimpan, dicoba lagi di interval berikutnya
+  http.end();
+}
+
 // --- FUNGSI KOMUNIKASI HTTP ---
 bool kirimKeBackend(String uid, DynamicJsonDocument& responseDoc, int distance_cm) {
   const int max_attempts = 3;
   bool success = false;
   HTTPClient http;
+  // ID unik per tap, sama untuk setiap retry: backend tidak memproses/mengkreditkan tap yang sama dua kali
+  String scanId = DEVICE_ID + "-" + String(esp_random(), HEX) + String(millis(), HEX);
 
   for (int attempt = 1; attempt <= max_attempts && !success; attempt++) {
     http.begin(serverUrl + "/api/scan-rfid");
     http.addHeader("Content-Type", "application/json");
-    http.setTimeout(30000); // 30 detik timeout untuk scan-rfid (kamera + TensorFlow processing, tanpa Gemini)
-    String payload = "{\"card_id\": \"" + uid + "\"";
+    http.setTimeout(5000); // Backend langsung membalas job_id, kamera + TensorFlow jalan di background
+    String payload = "{\"card_id\": \"" + uid + "\", \"device_id\": \"" + DEVICE_ID +
+                     "\", \"kiosk_id\": \"" + KIOSK_ID + "\", \"scan_id\": \"" + scanId + "\"";
     if (distance_cm > 0) {
       payload += ", \"distance_cm\": ";
       payload += String(distance_cm);
@@ -404,17 +522,13 @@ bool kirimKeBackend(String uid, DynamicJsonDocument& responseDoc, int distance_c
     int httpResponseCode = http.POST(payload);
     if (httpResponseCode > 0) {
       String response = http.getString();
-      DeserializationError error = deserializeJson(responseDoc, response);
-      if (!error) {
+      if (parseRespons(response, responseDoc)) {
         success = true;
-      } else {
-        Serial.println("❌ Error parse JSON backend.");
       }
     } else if (httpResponseCode == 404) {
       Serial.println("⚠️ RFID belum terdaftar.");
       String response = http.getString();
-      DeserializationError error = deserializeJson(responseDoc, response);
-      if (!error) {
+      if (parseRespons(response, responseDoc)) {
         success = true;
       }
     } else {
@@ -432,3 +546,64 @@ bool kirimKeBackend(String uid, DynamicJsonDocument& responseDoc, int distance_c
   return success;
 }
 
+bool tungguHasilScan(const String& jobId, DynamicJsonDocument& responseDoc) {
+  unsigned long startTime = millis();
+  HTTPClient http;
+
+  while (millis() - startTime < SCAN_RESULT_TIMEOUT) {
+    http.begin(serverUrl + "/api/scan-status/" + jobId + "?wait=" + String(SCAN_STATUS_WAIT_SECONDS));
+    http.setTimeout((SCAN_STATUS_WAIT_SECONDS + 5) * 1000);
+    int httpResponseCode = http.GET();
+
+    if (httpResponseCode > 0) {
+      String response = http.getString();
+      http.end();
+      if (!parseRespons(response, responseDoc)) {
+        return false;
+      }
+      if (httpResponseCode == 404) {
+        Serial.println("⚠️ Job scan tidak ditemukan di backend.");
+        return false;
+      }
+      const String status = responseDoc["status"] | "";
+      if (status != "pending") {
+        return true;
+      }
+      // Masih diproses (HTTP 202), long-poll lagi
+      continue;
+    }
+
+    Serial.print("⚠️ HTTP GET scan-status error: ");
+    Serial.println(httpResponseCode);
+    http.end();
+    delay(500);
+  }
+
+  return false;
+}
+
+// Parse respons scan/job hanya untuk field yang dipakai ESP32 (filter ArduinoJson),
+// sehingga field baru di backend tidak membuat buffer JSON kehabisan memori
+bool parseRespons(const String& response, DynamicJsonDocument& responseDoc) {
+  StaticJsonDocument<JSON_OBJECT_SIZE(6)> filter;
+  filter["status"] = true;
+  filter["job_id"] = true;
+  filter["role"] = true;
+  filter["esp_command"] = true;
+  filter["message"] = true;
+  filter["duplicate"] = true;
+
+  DeserializationError error = deserializeJson(responseDoc, response, DeserializationOption::Filter(filter));
+  if (error == DeserializationError::NoMemory) {
+    Serial.print("❌ Respons backend melebihi buffer JSON (");
+    Serial.print(SCAN_RESPONSE_CAPACITY);
+    Serial.println(" byte), naikkan SCAN_RESPONSE_CAPACITY.");
+    return false;
+  }
+  if (error) {
+    Serial.print("❌ Error parse JSON backend: ");
+    Serial.println(error.c_str());
+    return false;
+  }
+  return true;
+}
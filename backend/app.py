@@ -1,43 +1,55 @@
+# Diimpor paling awal: titik nol laporan waktu startup (GET /api/ready)
+import startup
+
 import datetime
+import hashlib
 import os
 import time
-from typing import Optional
-from io import BytesIO
+from typing import Optional, Union
 
+import click
 import mysql.connector
-from flask import Flask, jsonify, request
+import numpy as np
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
-from openai import OpenAI
-from PIL import Image
 
 import ai_service
+import bin_forecast
+import bin_registry
 import camera_module
+import chat_cache
+import dashboard_cache
+import db_pool
+import event_bus
+import llm_client
+import log_export
+import log_partitions
+import log_query
+import mvp_ranking
+import points_ledger
+import rank_index
+import reset_data
+import scan_jobs
+import session_store
+import stats_rollup
+import telemetry
 import trash_classifier
 
+startup.mark("imports")
+
 app = Flask(__name__)
 CORS(app)
 
 app.config["JSON_SORT_KEYS"] = False
 
-DB_CONFIG = {
-    "host": os.environ.get("MYSQL_HOST", "127.0.0.1"),
-    "port": int(os.environ.get("MYSQL_PORT", "3306")),
-    "user": os.environ.get("MYSQL_USER", "root"),
-    "password": os.environ.get("MYSQL_PASSWORD", ""),
-    "database": os.environ.get("MYSQL_DATABASE", "ecosmart"),
-}
+DB_CONFIG = db_pool.DB_CONFIG
 
 CONFIDENCE_THRESHOLD = 0.7
 REWARD_POINTS = 3000
-
-# OpenAI Configuration
-OPENAI_API_KEY = os.environ.get(
-    "OPENAI_API_KEY",
-    "sk-proj-1hIz61nUGq_5fEk3yvOEoNbaFGhb@IH_Jw6P2wx5s7RmUn2EoeAwcW_TcNGADvchkka7NyVCXWT3BlbkFJJe"
-)
-openai_client = None
-if OPENAI_API_KEY:
-    openai_client = OpenAI(api_key=OPENAI_API_KEY)
+# Jeda antara tap RFID dan frame yang diklasifikasi (0 = frame terbaru saat itu juga)
+SCAN_CAPTURE_DELAY_SECONDS = float(os.environ.get("SCAN_CAPTURE_DELAY_SECONDS", "2"))
+# Saran jeda (header Retry-After) untuk scan yang ditolak selama model masih dimuat
+MODEL_WARMUP_RETRY_AFTER_SECONDS = int(os.environ.get("MODEL_WARMUP_RETRY_AFTER_SECONDS", "5"))
 
 LOCATION_RULES = [
     ("192.168.1.", "Gedung A"),
@@ -46,23 +58,15 @@ LOCATION_RULES = [
     ("127.0.0.1", "Laptop Lokal"),
 ]
 
-BIN_STATE = {
-    "status": "siap",
-    "distance_cm": None,
-    "updated_at": None,
-}
-
 PENDING_REGISTRATION = {
     "rfid_uid": None,
     "timestamp": None,
 }
 
-# Global Session Management
-current_active_session = None
-
 
 def _get_connection():
-    return mysql.connector.connect(**DB_CONFIG)
+    """Pinjam koneksi dari pool; conn.close() mengembalikannya ke pool."""
+    return db_pool.get_connection()
 
 
 def _map_label_to_command(label: str) -> str:
@@ -83,15 +87,127 @@ def _map_ip_to_location(ip_address: str) -> str:
     return "Sektor Terluar"
 
 
-def _update_bin_state(status: str, distance: Optional[float] = None) -> dict:
-    BIN_STATE["status"] = status or BIN_STATE["status"]
-    if distance is not None:
-        try:
-            BIN_STATE["distance_cm"] = float(distance)
-        except (ValueError, TypeError):
-            BIN_STATE["distance_cm"] = None
-    BIN_STATE["updated_at"] = datetime.datetime.now().isoformat()
-    return BIN_STATE
+telemetry_writer = telemetry.TelemetryWriter(_get_connection)
+telemetry_batches = telemetry.BatchDeduper()
+
+
+forecast_engine = bin_forecast.ForecastEngine(_get_connection, bin_registry.registry.query)
+
+
+def _resolve_bin(payload: Optional[dict] = None) -> tuple:
+    """(bin_id, lokasi) pengirim: device_id dari payload/header X-Device-Id, atau lokasi IP untuk firmware lama."""
+    payload = payload or {}
+    location = _map_ip_to_location(request.remote_addr or "")
+    device_id = str(payload.get("device_id") or request.headers.get("X-Device-Id") or "").strip()
+    return device_id or location, location
+
+
+def _update_bin_state(bin_id: str, location: Optional[str], status: Optional[str],
+                      distance: Optional[float] = None, record_telemetry: bool = True) -> dict:
+    state = bin_registry.registry.update(bin_id, location, status, distance)
+    if record_telemetry and state["distance_cm"] is not None and distance is not None:
+        # Hanya append ke buffer; ditulis batch oleh thread telemetry
+        telemetry_writer.record(bin_id, state["distance_cm"], state["status"])
+    event_bus.bus.publish("bin", state)
+    return state
+
+
+def _resolve_kiosk(payload: Optional[dict] = None) -> str:
+    """Identitas kiosk: kiosk_id di body, header X-Kiosk-Id atau ?kiosk=; default satu kiosk bersama."""
+    payload = payload or {}
+    kiosk_id = payload.get("kiosk_id") or request.headers.get("X-Kiosk-Id") or request.args.get("kiosk")
+    return str(kiosk_id or "").strip() or session_store.DEFAULT_KIOSK
+
+
+def _session_payload(session: Optional[dict]) -> dict:
+    """Bentuk respons /api/check-session; juga dikirim sebagai event SSE 'session'."""
+    if session:
+        # Handle REGISTERING status
+        if session.get("status") == "REGISTERING":
+            return {
+                "active": True,
+                "status": "REGISTERING",
+                "rfid_uid": session.get("rfid_uid"),
+            }
+        # Handle normal session
+        if "role" in session:
+            return {
+                "active": True,
+                "role": session["role"],
+                "user": {
+                    "id": session.get("user_id"),
+                    "rfid_uid": session.get("rfid_uid"),
+                    "name": session.get("name"),
+                    "role": session.get("role"),
+                    "prodi": session.get("prodi"),
+                    "saldo": session.get("saldo"),
+                    "timestamp": session.get("timestamp"),  # Include timestamp for logout check
+                },
+            }
+    return {"active": False}
+
+
+def _set_active_session(kiosk_id: str, session: Optional[dict]) -> None:
+    if session is None:
+        session_store.store.delete(kiosk_id)
+    else:
+        session_store.store.set(kiosk_id, session)
+    event_bus.bus.publish("session", _session_payload(session), scope=kiosk_id)
+
+
+def _insert_trash_log(cursor, user: dict, trash_type: str, confidence: float, location_label: str) -> dict:
+    """INSERT satu baris trash_logs; return log terformat (dipublish setelah commit)."""
+    cursor.execute(
+        """
+        INSERT INTO trash_logs (user_id, trash_type, confidence, location_ip)
+        VALUES (%s, %s, %s, %s)
+        """,
+        (user["id"], trash_type, confidence, location_label),
+    )
+    stats_rollup.record_log(cursor, trash_type, location_label)
+    return {
+        "id": cursor.lastrowid,
+        "timestamp": datetime.datetime.now().isoformat(),
+        "trash_type": trash_type,
+        "confidence": confidence,
+        "location_ip": location_label or "Tidak Diketahui",
+        "user_name": user.get("name"),
+        "rfid_uid": user.get("rfid_uid"),
+        "user_role": user.get("role"),
+        "user_prodi": user.get("prodi"),
+    }
+
+
+def _credit_scan(conn, cursor, user: dict, label: str, confidence: float, location_label: str, ledger_key: str):
+    """
+    Simpan log scan + kredit poin dalam satu transaksi. Return (saldo_baru, duplicate).
+    Jika `ledger_key` sudah pernah dikreditkan (retry scan yang sama), transaksi
+    di-rollback: log dan poin tidak ditulis dua kali.
+    """
+    log = _insert_trash_log(cursor, user, label, confidence, location_label)
+    new_saldo = points_ledger.credit(cursor, user["id"], REWARD_POINTS, ledger_key, log_id=log["id"])
+    if new_saldo is None:
+        conn.rollback()
+        print(f"ℹ️ [LEDGER] Scan {ledger_key} sudah dikreditkan, dilewati")
+        return points_ledger.current_saldo(cursor, user["id"]), True
+    conn.commit()
+    _on_user_committed({"id": user["id"], "saldo": new_saldo})
+    _on_log_committed(log)
+    return new_saldo, False
+
+
+def _on_log_committed(log: dict) -> None:
+    """Panggil setelah conn.commit() agar cache & subscriber hanya melihat log yang tersimpan."""
+    dashboard_snapshot.apply_log(log)
+    event_bus.bus.publish("logs", log)
+
+
+def _on_user_committed(user: dict) -> None:
+    """Panggil setelah commit yang mengubah user (saldo baru, registrasi)."""
+    if "saldo" in user:
+        saldo_ranking.update(user["id"], user["saldo"])
+    dashboard_snapshot.apply_user(user)
+    mvp_board.invalidate()
 
 
 def _set_pending_registration(rfid_uid: str):
@@ -99,12 +215,53 @@ def _set_pending_registration(rfid_uid: str):
     PENDING_REGISTRATION["timestamp"] = datetime.datetime.now().isoformat()
 
 
-def _classify_image(image_path: str):
+def _on_model_warm(ok: bool) -> None:
+    startup.mark("model_ready" if ok else "model_failed")
+    startup.print_report()
+
+
+def _on_ai_warm(ok: bool) -> None:
+    startup.mark("gemini_ready" if ok else "gemini_failed")
+
+
+def _start_warm_up() -> None:
+    """Muat model TensorFlow & klien chatbot di background (idempotent, tidak memblokir)."""
+    trash_classifier.warm_up_async(on_done=_on_model_warm)
+    ai_service.warm_up_async(on_done=_on_ai_warm)
+
+
+def _model_warming_response():
+    """
+    None jika scan boleh diproses; selain itu response 503 selama model masih
+    dimuat. Jika load gagal, scan tetap jalan dengan fallback klasifikasi lama.
+    """
+    if trash_classifier.is_ready() or trash_classifier.model_status()["state"] == "failed":
+        return None
+    _start_warm_up()
+    response = jsonify(
+        {
+            "status": "warming_up",
+            "esp_command": "NO_ACTION",
+            "message": "Model AI sedang dimuat, silakan coba lagi sebentar lagi",
+        }
+    )
+    response.status_code = 503
+    response.headers["Retry-After"] = str(MODEL_WARMUP_RETRY_AFTER_SECONDS)
+    return response
+
+
+def _classify_image(image: Union[str, bytes, np.ndarray]):
     """
     Klasifikasi gambar menggunakan TensorFlow saja (tidak pakai Gemini untuk scan).
     Gemini hanya untuk chatbot.
+    `image` boleh path file, bytes ter-encode, atau frame BGR yang sudah di-decode.
     """
-    local_result = trash_classifier.predict_image(image_path)
+    if isinstance(image, str):
+        local_result = trash_classifier.predict_image(image)
+    elif isinstance(image, (bytes, bytearray)):
+        local_result = trash_classifier.predict_bytes(bytes(image))
+    else:
+        local_result = trash_classifier.predict_array(image)
     label = local_result.get("label", "ERROR")
     confidence = float(local_result.get("confidence", 0.0))
     analysis = {"used": "local", "details": local_result}
@@ -121,30 +278,8 @@ def _classify_image(image_path: str):
 
 
 def _build_stats(cursor):
-    cursor.execute(
-        "SELECT COUNT(*) AS total FROM trash_logs WHERE trash_type IN ('KERTAS', 'ANORGANIK')"
-    )
-    total = cursor.fetchone()["total"]
-    cursor.execute(
-        "SELECT trash_type, COUNT(*) AS cnt FROM trash_logs WHERE trash_type IN ('KERTAS', 'ANORGANIK') GROUP BY trash_type"
-    )
-    type_counts = {row["trash_type"]: row["cnt"] for row in cursor.fetchall()}
-    cursor.execute(
-        "SELECT IFNULL(location_ip, 'Tidak Diketahui') AS location, COUNT(*) AS cnt "
-        "FROM trash_logs "
-        "WHERE trash_type IN ('KERTAS', 'ANORGANIK') "
-        "GROUP BY location ORDER BY cnt DESC LIMIT 5"
-    )
-    location_chart = [
-        {"location": row["location"], "count": row["cnt"]}
-        for row in cursor.fetchall()
-    ]
-    return {
-        "total_logs": total,
-        "kertas": type_counts.get("KERTAS", 0),
-        "anorganik": type_counts.get("ANORGANIK", 0),
-        "location_chart": location_chart,
-    }
+    # Dibaca dari tabel rollup (O(jumlah bucket)), bukan COUNT/GROUP BY atas trash_logs
+    return stats_rollup.fetch_stats(cursor)
 
 
 def _format_logs(log_rows):
@@ -167,88 +302,233 @@ def _format_logs(log_rows):
     return formatted
 
 
-def _fetch_dashboard_data():
+RECENT_LOGS_QUERY = """
+    SELECT
+        l.id,
+        l.timestamp,
+        l.trash_type,
+        l.confidence,
+        l.location_ip,
+        u.name AS user_name,
+        u.rfid_uid,
+        u.role AS user_role,
+        u.prodi AS user_prodi
+    FROM trash_logs l
+    JOIN users u ON u.id = l.user_id
+    {where}
+    ORDER BY l.timestamp DESC
+    LIMIT 20
+"""
+
+
+def _load_dashboard_snapshot() -> dict:
+    """Query penuh untuk DashboardSnapshot (dipanggil saat cache kosong/kedaluwarsa)."""
     conn = _get_connection()
     try:
         cursor = conn.cursor(dictionary=True)
-        stats = _build_stats(cursor)
-        cursor.execute(
-            "SELECT id, rfid_uid, name, role, prodi, saldo FROM users ORDER BY saldo DESC LIMIT 5"
-        )
-        leaderboard = cursor.fetchall()
+        type_counts, location_counts = stats_rollup.fetch_counts(cursor)
         cursor.execute(
             "SELECT id, rfid_uid, name, role, prodi, saldo FROM users ORDER BY name"
         )
         users = cursor.fetchall()
-        cursor.execute(
-            """
-            SELECT
-                l.id,
-                l.timestamp,
-                l.trash_type,
-                l.confidence,
-                l.location_ip,
-                u.name AS user_name,
-                u.rfid_uid,
-                u.role AS user_role,
-                u.prodi AS user_prodi
-            FROM trash_logs l
-            JOIN users u ON u.id = l.user_id
-            ORDER BY l.timestamp DESC
-            LIMIT 20
-            """
-        )
-        recent_logs = _format_logs(cursor.fetchall())
-        # Get last scan for user dashboard - filter out logout/role logs like program lama
-        last_scan = None
-        if recent_logs:
-            for log in recent_logs:
-                trash_type = log.get("trash_type", "")
-                # Skip logout and role login logs - only get actual trash scans
-                if "LOGOUT" not in trash_type and not trash_type.startswith("ROLE_"):
-                    last_scan = log
-                    break
-        
-        payload = {
-            "stats": stats,
-            "leaderboard": leaderboard,
+        # Batas waktu membuat MySQL hanya membaca partisi bulan terbaru; tanpa batas
+        # (fallback untuk instalasi yang masih sepi) semua partisi ikut dibuka.
+        since = log_partitions.recent_window_start()
+        cursor.execute(RECENT_LOGS_QUERY.format(where="WHERE l.timestamp >= %s"), (since,))
+        rows = cursor.fetchall()
+        if len(rows) < dashboard_cache.RECENT_LOGS_LIMIT:
+            cursor.execute(RECENT_LOGS_QUERY.format(where=""))
+            rows = cursor.fetchall()
+        recent_logs = _format_logs(rows)
+        # Scan terakhir dicari di SQL (index event_kind), bukan dari 20 log terakhir
+        last_scan = log_query.fetch_last_scan(cursor)
+        return {
             "users": users,
             "recent_logs": recent_logs,
-            "last_scan": last_scan,  # Last actual trash scan, not logout
-            "pending_registration": PENDING_REGISTRATION.copy() if PENDING_REGISTRATION.get("rfid_uid") else None,
-            "bin_state": BIN_STATE.copy(),
+            "last_scan": _format_logs([last_scan])[0] if last_scan else None,
+            "location_counts": location_counts,
+            "type_counts": type_counts,
         }
-        return payload
     finally:
         cursor.close()
         conn.close()
 
 
-def _fetch_chat_stats():
+def _load_saldo_ranking() -> list:
+    """(user_id, saldo) semua user untuk RankIndex."""
     conn = _get_connection()
+    cursor = conn.cursor()
     try:
-        cursor = conn.cursor(dictionary=True)
-        stats = _build_stats(cursor)
-        return stats
+        cursor.execute("SELECT id, saldo FROM users")
+        return cursor.fetchall()
     finally:
         cursor.close()
         conn.close()
 
 
+saldo_ranking = rank_index.RankIndex(_load_saldo_ranking)
+dashboard_snapshot = dashboard_cache.DashboardSnapshot(_load_dashboard_snapshot, rank_index=saldo_ranking)
+mvp_board = mvp_ranking.MvpLeaderboard(_get_connection, REWARD_POINTS)
+
+
+def _fetch_dashboard_data():
+    """Return (payload, etag). Bagian DB dari snapshot cache; bin & registrasi selalu live."""
+    payload, version = dashboard_snapshot.get()
+    pending = PENDING_REGISTRATION.copy() if PENDING_REGISTRATION.get("rfid_uid") else None
+    # Versi dibaca lebih dulu: jika bin berubah di tengah, ETag berikutnya pasti beda
+    bins_version = bin_registry.registry.version
+    # last_scan = last actual trash scan, not logout (dipilih oleh snapshot)
+    payload["pending_registration"] = pending
+    payload["bin_state"] = bin_registry.registry.latest()
+    payload["bins"] = bin_registry.registry.query()
+    etag = dashboard_cache.make_etag(version, bins_version, pending and sorted(pending.items()))
+    return payload, etag
+
+
+def _fetch_chat_stats():
+    """Ringkasan statistik untuk chatbot, diambil dari snapshot dashboard (tanpa query saat hangat)."""
+    payload, _version = dashboard_snapshot.get()
+    return payload["stats"]
+
+
+def _chat_cache_key(provider: str, question: str, stats: dict) -> tuple:
+    return (provider, chat_cache.normalize_question(question), chat_cache.stats_version(stats))
+
+
+def _chat_source(provider: str, fallback: bool) -> str:
+    # Nama lama dipertahankan: "gemini_fallback" saat OpenAI gagal lalu Gemini menjawab
+    return f"{provider}_fallback" if fallback else provider
+
+
+def _chat_answer(provider: str, question: str) -> tuple:
+    """
+    Return (result, cache_source, stats). Stats diambil sekali per request dan
+    dipakai ulang oleh semua provider; jawaban di-cache per (provider,
+    pertanyaan ternormalisasi, versi stats) dan pertanyaan identik yang sedang
+    diproses digabung menjadi satu panggilan.
+    """
+    stats = _fetch_chat_stats()
+
+    def compute():
+        try:
+            result = ai_service.chat_client.ask(question, stats, prefer=provider)
+        except llm_client.LLMUnavailable as exc:
+            print(f"❌ [CHAT] Semua provider gagal: {exc}")
+            # Pesan "sedang sibuk" tidak di-cache agar pertanyaan berikutnya mencoba lagi
+            return {"answer": ai_service.LLM_BUSY_ANSWER, "source": "unavailable"}, False
+        return {"answer": result.answer, "source": _chat_source(result.provider, result.fallback)}, True
+
+    result, cache_source = chat_cache.answer_cache.get_or_compute(_chat_cache_key(provider, question, stats), compute)
+    return result, cache_source, stats
+
+
 @app.route("/")
 def home():
     return "EcoSmart.AI Backend siaga! 🚀"
 
 
+@app.route("/api/db-pool-stats", methods=["GET"])
+def db_pool_stats():
+    return jsonify(db_pool.pool_stats())
+
+
+@app.route("/api/ready", methods=["GET"])
+def ready():
+    """
+    Readiness probe: 200 jika model klasifikasi sudah hangat, 503 selama
+    warm-up (request ini sekaligus memicu warm-up jika belum berjalan).
+    """
+    is_ready = trash_classifier.is_ready()
+    if not is_ready:
+        _start_warm_up()
+    return jsonify(
+        {
+            "ready": is_ready,
+            "model": trash_classifier.model_status(),
+            "gemini": ai_service.gemini_status(),
+            "startup": startup.report(),
+        }
+    ), 200 if is_ready else 503
+
+
+@app.route("/api/inference-stats", methods=["GET"])
+def inference_stats():
+    return jsonify(trash_classifier.inference_stats())
+
+
+@app.route("/api/camera-status", methods=["GET"])
+def camera_status():
+    return jsonify(camera_module.camera_status())
+
+
+def _parse_wait_seconds(value) -> float:
+    try:
+        return max(0.0, float(value or 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _process_scan_job(job_queue, job, user: dict, location_label: str, bin_id: str, distance_cm, tapped_at: float):
+    """Dijalankan worker scan_jobs: capture → klasifikasi → update saldo & log."""
+    job_queue.set_state(job, "capturing")
+    # FIX: Ambil frame yang direkam SCAN_CAPTURE_DELAY_SECONDS setelah tap untuk
+    # biarkan frontend redirect dulu. Kamera sudah terbuka di capture service,
+    # jadi tidak ada lagi waktu buka device + pemanasan per scan.
+    frame = camera_module.capture_frame(newer_than=tapped_at + SCAN_CAPTURE_DELAY_SECONDS)
+    if frame is None:
+        return {"status": "cam_error", "message": "Kamera gagal menangkap gambar"}, 503
+    camera_module.save_capture_async(frame=frame, prefix="rfid")
+
+    job_queue.set_state(job, "classifying")
+    label, confidence, analysis = _classify_image(frame)
+    esp_command = _map_label_to_command(label)
+    _update_bin_state(bin_id, location_label, "terisi", distance_cm)
+
+    job_queue.set_state(job, "saving")
+    conn = _get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        new_saldo, duplicate = _credit_scan(
+            conn, cursor, user, label, confidence, location_label,
+            job.key or points_ledger.idempotency_key("job", job.id),
+        )
+    finally:
+        cursor.close()
+        conn.close()
+
+    log_entry = {
+        "timestamp": datetime.datetime.now().isoformat(),
+        "trash_type": label,
+        "confidence": confidence,
+        "location_ip": location_label,
+    }
+    return {
+        "status": "success",
+        "esp_command": esp_command,
+        "label": label,
+        "confidence": confidence,
+        "model_source": analysis.get("used"),
+        "analysis": analysis,
+        "user": {
+            "id": user["id"],
+            "name": user["name"],
+            "role": user["role"],
+            "saldo": new_saldo,
+        },
+        "location": location_label,
+        "log": log_entry,
+        "duplicate": duplicate,
+    }, 200
+
+
 @app.route("/api/scan-rfid", methods=["POST"])
 def scan_rfid():
-    global current_active_session  # Declare global at the start of function
-    
     payload = request.get_json(silent=True) or {}
     card_id = str(payload.get("card_id", "")).strip().upper()
     distance_cm = payload.get("distance_cm")
     if not card_id:
         return jsonify({"status": "invalid", "message": "card_id kosong"}), 400
+    kiosk_id = _resolve_kiosk(payload)
 
     conn = _get_connection()
     cursor = conn.cursor(dictionary=True)
@@ -257,11 +537,11 @@ def scan_rfid():
         user = cursor.fetchone()
         if not user:
             # Smart Registration: Set session ke REGISTERING
-            current_active_session = {
+            _set_active_session(kiosk_id, {
                 "status": "REGISTERING",
                 "rfid_uid": card_id,
                 "timestamp": datetime.datetime.now().isoformat(),
-            }
+            })
             _set_pending_registration(card_id)
             return jsonify(
                 {
@@ -272,10 +552,16 @@ def scan_rfid():
                 }
             ), 404
 
-        location_label = _map_ip_to_location(request.remote_addr or "")
+        if user["role"] not in {"admin", "petugas"}:
+            # Tap user memicu scan: tolak dulu (tanpa membuka session) selama model dimuat
+            warming = _model_warming_response()
+            if warming is not None:
+                return warming
 
-        # Set active session for all roles
-        current_active_session = {
+        bin_id, location_label = _resolve_bin(payload)
+
+        # Set active session for all roles (hanya di kiosk yang di-tap)
+        _set_active_session(kiosk_id, {
             "user_id": user["id"],
             "rfid_uid": user["rfid_uid"],
             "name": user["name"],
@@ -283,7 +569,7 @@ def scan_rfid():
             "prodi": user.get("prodi"),
             "saldo": user["saldo"],
             "timestamp": datetime.datetime.now().isoformat(),
-        }
+        })
 
         if user["role"] in {"admin", "petugas"}:
             role_log_type = f"ROLE_{user['role'].upper()}"
@@ -293,15 +579,10 @@ def scan_rfid():
                 "confidence": 1.0,
                 "location_ip": location_label,
             }
-            _update_bin_state("siap")
-            cursor.execute(
-                """
-                INSERT INTO trash_logs (user_id, trash_type, confidence, location_ip)
-                VALUES (%s, %s, %s, %s)
-                """,
-                (user["id"], role_log_type, 1.0, location_label),
-            )
+            _update_bin_state(bin_id, location_label, "siap")
+            log = _insert_trash_log(cursor, user, role_log_type, 1.0, location_label)
             conn.commit()
+            _on_log_committed(log)
             return jsonify(
                 {
                     "status": "role_login",
@@ -321,71 +602,247 @@ def scan_rfid():
                 }
             )
 
-        # FIX: Delay 2 detik sebelum capture untuk biarkan frontend redirect dulu
-        print("⏳ [SCAN] Menunggu 2 detik untuk frontend redirect...")
-        time.sleep(2)
-        
-        image_path = camera_module.take_picture()
-        if not image_path:
-            return (
-                jsonify(
-                    {"status": "cam_error", "message": "Kamera gagal menangkap gambar"}
-                ),
-                503,
-            )
-
-        label, confidence, analysis = _classify_image(image_path)
-        esp_command = _map_label_to_command(label)
-        _update_bin_state("terisi", distance_cm)
-
-        new_saldo = user["saldo"] + REWARD_POINTS
-        cursor.execute(
-            "UPDATE users SET saldo = %s WHERE id = %s", (new_saldo, user["id"])
-        )
-        cursor.execute(
-            """
-            INSERT INTO trash_logs (user_id, trash_type, confidence, location_ip)
-            VALUES (%s, %s, %s, %s)
-            """,
-            (user["id"], label, confidence, location_label),
-        )
-        conn.commit()
-
-        log_entry = {
-            "timestamp": datetime.datetime.now().isoformat(),
-            "trash_type": label,
-            "confidence": confidence,
-            "location_ip": location_label,
-        }
-        return jsonify(
-            {
-                "status": "success",
-                "esp_command": esp_command,
-                "label": label,
-                "confidence": confidence,
-                "model_source": analysis.get("used"),
-                "analysis": analysis,
+        # Capture + klasifikasi + simpan dikerjakan worker; request langsung kembali.
+        # scan_id dari firmware (sama untuk setiap retry satu tap) = idempotency key
+        scan_id = str(payload.get("scan_id") or request.headers.get("Idempotency-Key") or "").strip()
+        tapped_at = time.time()
+        job = scan_jobs.job_queue.submit(
+            _process_scan_job,
+            user,
+            location_label,
+            bin_id,
+            distance_cm,
+            tapped_at,
+            meta={
                 "user": {
                     "id": user["id"],
                     "name": user["name"],
                     "role": user["role"],
-                    "saldo": new_saldo,
+                    "saldo": user["saldo"],
                 },
                 "location": location_label,
-                "log": log_entry,
-            }
+                "bin_id": bin_id,
+            },
+            key=points_ledger.idempotency_key("rfid", kiosk_id, scan_id) if scan_id else None,
         )
+
     finally:
         cursor.close()
         conn.close()
 
+    # Firmware lama / klien yang butuh hasil langsung bisa minta ditunggu di sini
+    wait_seconds = _parse_wait_seconds(payload.get("wait"))
+    if payload.get("sync"):
+        wait_seconds = scan_jobs.MAX_LONG_POLL_SECONDS
+    if wait_seconds:
+        job = scan_jobs.job_queue.wait(job.id, wait_seconds)
+        if job.state in scan_jobs.FINAL_STATES:
+            return jsonify(job.snapshot()), job.http_status
+
+    response = job.snapshot()
+    response["status_url"] = f"/api/scan-status/{job.id}"
+    return jsonify(response), 202
+
+
+@app.route("/api/scan-status/<job_id>", methods=["GET"])
+def scan_status(job_id):
+    """Status job scan. ?wait=N (detik, maks 30) untuk long-poll sampai job selesai."""
+    wait_seconds = _parse_wait_seconds(request.args.get("wait"))
+    job = scan_jobs.job_queue.wait(job_id, wait_seconds) if wait_seconds else scan_jobs.job_queue.get(job_id)
+    if job is None:
+        return jsonify({"status": "not_found", "message": "Job scan tidak ditemukan"}), 404
+    return jsonify(job.snapshot()), job.http_status
+
+
+@app.route("/api/scan-jobs-stats", methods=["GET"])
+def scan_jobs_stats():
+    return jsonify(scan_jobs.job_queue.stats())
+
+
+@app.route("/api/stats-series", methods=["GET"])
+def stats_series():
+    """Chart per jam/hari dari rollup: ?bucket=day|hour&days=7&location=Gedung A"""
+    bucket = request.args.get("bucket", "day")
+    if bucket not in {"day", "hour"}:
+        return jsonify({"status": "invalid", "message": "bucket harus day atau hour"}), 400
+    try:
+        days = max(1, min(int(request.args.get("days", "7")), 366))
+    except ValueError:
+        return jsonify({"status": "invalid", "message": "days harus angka"}), 400
+    since = datetime.datetime.now() - datetime.timedelta(days=days)
+    if bucket == "day":
+        since = since.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    conn = _get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        series = stats_rollup.fetch_series(cursor, bucket, since, request.args.get("location"))
+        return jsonify({"status": "success", "bucket": bucket, "series": series})
+    finally:
+        cursor.close()
+        conn.close()
+
+
+@app.route("/api/events", methods=["GET"])
+def events():
+    """
+    Server-Sent Events: push perubahan session, status tong dan log baru.
+    ?topics=session,bin,logs (default semua). Heartbeat tiap 15 detik.
+    """
+    topics = [t.strip() for t in request.args.get("topics", "").split(",") if t.strip()]
+    # Event session hanya untuk kiosk ini (?kiosk=); bin & logs tetap untuk semua
+    subscription = event_bus.bus.subscribe(topics, scope=_resolve_kiosk())
+    response = Response(
+        stream_with_context(event_bus.bus.stream(subscription)),
+        mimetype="text/event-stream",
+    )
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@app.route("/api/events-stats", methods=["GET"])
+def events_stats():
+    return jsonify(event_bus.bus.stats())
+
 
 @app.route("/api/bin-status", methods=["GET", "POST"])
 def bin_status():
+    """
+    ?bin_id=X        -> satu bin
+    ?bin_id=X,Y / ?location=... / ?status=...  -> {"bins": [...], "count": n}
+    tanpa parameter  -> bin yang terakhir melapor (format lama) + "bins" berisi semua bin
+    """
     payload = request.get_json(silent=True) or {}
+    registry = bin_registry.registry
     if request.method == "POST":
-        _update_bin_state(payload.get("status") or BIN_STATE["status"], payload.get("distance_cm"))
-    return jsonify(BIN_STATE.copy())
+        bin_id, location = _resolve_bin(payload)
+        return jsonify(_update_bin_state(bin_id, location, payload.get("status"), payload.get("distance_cm")))
+
+    requested = [b.strip() for b in (request.args.get("bin_id") or "").split(",") if b.strip()]
+    location = request.args.get("location") or None
+    status = request.args.get("status") or None
+    if len(requested) == 1 and not location and not status:
+        state = registry.get(requested[0])
+        if state is None:
+            return jsonify({"status": "not_found", "message": "Bin tidak ditemukan"}), 404
+        return jsonify(state)
+    if requested or location or status:
+        bins = registry.query(requested or None, location, status)
+        return jsonify({"bins": bins, "count": len(bins)})
+
+    bins = registry.query()
+    return jsonify({**registry.latest(), "bins": bins, "count": len(bins)})
+
+
+@app.route("/api/bin-telemetry", methods=["POST"])
+def bin_telemetry():
+    """
+    Batch pembacaan ultrasonic dari ESP32 (kirim tiap N detik, bukan per pembacaan).
+    Content-Type: application/json (array atau {device_id, readings}),
+    application/x-ndjson, atau application/octet-stream (format biner telemetry.py).
+    Header X-Telemetry-Batch (opsional): id batch yang sama untuk setiap retry;
+    batch yang sudah diterima dijawab 200 tanpa disimpan ulang.
+    """
+    received_at = datetime.datetime.now()
+    batch_id = (request.headers.get("X-Telemetry-Batch") or "").strip()
+    if len(batch_id) > telemetry.MAX_BATCH_ID_LENGTH:
+        return jsonify({"status": "error", "message": "X-Telemetry-Batch terlalu panjang"}), 400
+    try:
+        device_id, items, errors = telemetry.parse_batch(request.get_data(cache=False), request.mimetype)
+        default_bin, location = _resolve_bin({"device_id": device_id})
+        if batch_id and not telemetry_batches.claim(default_bin, batch_id):
+            return jsonify({"status": "duplicate", "accepted": 0, "rejected": 0, "errors": []}), 200
+        try:
+            readings, errors = telemetry.validate_readings(items, default_bin, received_at, errors)
+        except telemetry.BatchError:
+            if batch_id:
+                telemetry_batches.release(default_bin, batch_id)
+            raise
+    except telemetry.BatchError as exc:
+        return jsonify({"status": "error", "message": str(exc)}), 400
+
+    if readings:
+        telemetry_writer.record_many(readings)
+        # Registry & SSE cukup sekali per bin dengan pembacaan terbaru
+        for bin_id, (_, _, distance_cm, status) in telemetry.latest_per_bin(readings).items():
+            _update_bin_state(bin_id, location, status, distance_cm, record_telemetry=False)
+
+    body = {
+        "status": "success" if readings or not errors else "error",
+        "accepted": len(readings),
+        "rejected": len(errors),
+        "errors": errors[:20],
+    }
+    return jsonify(body), 200 if readings or not errors else 400
+
+
+@app.route("/api/bin-history", methods=["GET"])
+def bin_history():
+    """
+    Riwayat fill level: ?bin_id=BIN-01&hours=24 (atau since/until ISO) &resolution=auto|raw|minute|hour.
+    auto: raw untuk <= 2 jam, menit untuk <= 3 hari, selebihnya jam.
+    """
+    bin_id = (request.args.get("bin_id") or "").strip()
+    if not bin_id:
+        return jsonify({"status": "invalid", "message": "bin_id wajib"}), 400
+    try:
+        # Offset zona waktu (mis. ...Z) diubah ke waktu lokal naive agar bisa dibandingkan
+        until = (
+            telemetry.parse_local_datetime(request.args["until"]) if request.args.get("until")
+            else datetime.datetime.now()
+        )
+        if request.args.get("since"):
+            since = telemetry.parse_local_datetime(request.args["since"])
+        else:
+            hours = min(max(float(request.args.get("hours", 24)), 0.1), 24 * 366)
+            since = until - datetime.timedelta(hours=hours)
+    except (ValueError, TypeError, OverflowError):
+        return jsonify({"status": "invalid", "message": "since/until/hours tidak valid"}), 400
+
+    conn = _get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        history = telemetry.fetch_history(cursor, bin_id, since, until, request.args.get("resolution", "auto"))
+    except (ValueError, TypeError) as exc:
+        return jsonify({"status": "invalid", "message": str(exc)}), 400
+    finally:
+        cursor.close()
+        conn.close()
+    history.update({"since": since.isoformat(), "until": until.isoformat()})
+    return jsonify(history)
+
+
+@app.route("/api/telemetry-stats", methods=["GET"])
+def telemetry_stats():
+    return jsonify({**telemetry_writer.stats(), "batches": telemetry_batches.stats()})
+
+
+@app.route("/api/bin-forecast", methods=["GET"])
+def bin_forecast_view():
+    """Prediksi waktu penuh per bin (dari cache background). ?bin_id= untuk satu bin."""
+    forecast = forecast_engine.get()
+    bin_id = request.args.get("bin_id")
+    bins = [f for f in forecast["bins"] if f["bin_id"] == bin_id] if bin_id else forecast["bins"]
+    return jsonify({"status": "success", "computed_at": forecast["computed_at"], "bins": bins})
+
+
+@app.route("/api/pickup-route", methods=["GET"])
+def pickup_route():
+    """Urutan pickup untuk petugas. ?petugas_id= untuk bagian rute satu petugas."""
+    forecast = forecast_engine.get()
+    route, computed_at = forecast["route"], forecast["computed_at"]
+    petugas_id = request.args.get("petugas_id", type=int)
+    if petugas_id is not None:
+        assignment = next((a for a in route["assignments"] if a["petugas"]["id"] == petugas_id), None)
+        stops = assignment["stops"] if assignment else []
+        return jsonify({"status": "success", "computed_at": computed_at, "stops": stops})
+    return jsonify({"status": "success", "computed_at": computed_at, **route})
+
+
+@app.route("/api/forecast-stats", methods=["GET"])
+def forecast_stats():
+    return jsonify(forecast_engine.stats())
 
 
 @app.route("/api/bin-update", methods=["POST"])
@@ -399,18 +856,16 @@ def bin_update():
         if distance_cm is None:
             return jsonify({"status": "error", "message": "distance_cm required"}), 400
         
-        # Validate distance_cm is a number
+        # Validate distance_cm is a number (aturan sama dengan /api/bin-telemetry)
         try:
-            distance_cm = float(distance_cm)
-            if distance_cm < 0 or distance_cm > 1000:
-                return jsonify({"status": "error", "message": "distance_cm out of range"}), 400
-        except (ValueError, TypeError):
-            return jsonify({"status": "error", "message": "distance_cm must be a number"}), 400
+            distance_cm = telemetry.validate_distance(distance_cm)
+        except ValueError as exc:
+            return jsonify({"status": "error", "message": str(exc)}), 400
         
-        _update_bin_state(status, distance_cm)
+        bin_id, location = _resolve_bin(payload)
         return jsonify({
             "status": "success",
-            "bin_state": BIN_STATE.copy()
+            "bin_state": _update_bin_state(bin_id, location, status, distance_cm)
         })
     except Exception as exc:
         print(f"❌ [BIN-UPDATE] Error: {exc}")
@@ -419,44 +874,24 @@ def bin_update():
 
 @app.route("/api/check-session", methods=["GET"])
 def check_session():
-    """Endpoint for frontend polling to check active session"""
-    global current_active_session
-    if current_active_session:
-        # Handle REGISTERING status
-        if current_active_session.get("status") == "REGISTERING":
-            return jsonify({
-                "active": True,
-                "status": "REGISTERING",
-                "rfid_uid": current_active_session.get("rfid_uid"),
-            })
-        # Handle normal session
-        if "role" in current_active_session:
-            return jsonify({
-                "active": True,
-                "role": current_active_session["role"],
-                "user": {
-                    "id": current_active_session.get("user_id"),
-                    "rfid_uid": current_active_session.get("rfid_uid"),
-                    "name": current_active_session.get("name"),
-                    "role": current_active_session.get("role"),
-                    "prodi": current_active_session.get("prodi"),
-                    "saldo": current_active_session.get("saldo"),
-                    "timestamp": current_active_session.get("timestamp"),  # Include timestamp for logout check
-                },
-            })
-    return jsonify({"active": False})
+    """Endpoint for frontend polling to check active session (?kiosk= atau header X-Kiosk-Id)"""
+    return jsonify(_session_payload(session_store.store.get(_resolve_kiosk())))
+
+
+@app.route("/api/session-stats", methods=["GET"])
+def session_stats():
+    return jsonify(session_store.store.stats())
 
 
 @app.route("/api/logout", methods=["POST"])
 def logout():
     """Clear active session and log logout event - like program lama"""
-    global current_active_session
     payload = request.get_json(silent=True) or {}
     rfid_uid = str(payload.get("rfid_uid", "")).strip().upper()
     role = payload.get("role", "user")
     
     # Clear session FIRST - important!
-    current_active_session = None
+    _set_active_session(_resolve_kiosk(payload), None)
     
     if not rfid_uid:
         return jsonify({"status": "success", "message": "Session cleared"})
@@ -468,15 +903,13 @@ def logout():
         user = cursor.fetchone()
         if user:
             location_label = _map_ip_to_location(request.remote_addr or "")
-            cursor.execute(
-                """
-                INSERT INTO trash_logs (user_id, trash_type, confidence, location_ip)
-                VALUES (%s, %s, %s, %s)
-                """,
-                (user["id"], f"ROLE_{role.upper()}_LOGOUT", 1.0, location_label),
-            )
+            log = _insert_trash_log(cursor, user, f"ROLE_{role.upper()}_LOGOUT", 1.0, location_label)
             conn.commit()
-        _update_bin_state("siap")
+            _on_log_committed(log)
+        # Logout datang dari browser kiosk; tanpa bin_id, reset bin yang terakhir aktif
+        bin_id = payload.get("bin_id") or bin_registry.registry.latest()["bin_id"]
+        if bin_id:
+            _update_bin_state(bin_id, None, "siap")
         return jsonify({"status": "success", "message": "Logout berhasil"})
     except Exception as exc:
         print(f"❌ [LOGOUT] Error: {exc}")
@@ -489,8 +922,70 @@ def logout():
 
 @app.route("/api/dashboard-data", methods=["GET"])
 def dashboard_data():
-    payload = _fetch_dashboard_data()
-    return jsonify(payload)
+    payload, etag = _fetch_dashboard_data()
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(payload)
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@app.route("/api/dashboard-cache-stats", methods=["GET"])
+def dashboard_cache_stats():
+    return jsonify(dashboard_snapshot.stats())
+
+
+@app.route("/api/logs", methods=["GET"])
+def logs():
+    """
+    Riwayat log dengan keyset pagination, terbaru dulu:
+    ?limit=50&cursor=<next_cursor>&kind=scan|role|logout|all&trash_type=KERTAS
+    &location=Gedung A&user_id=3&prodi=Informatika&since=2025-01-01&until=2025-01-31
+    """
+    conn = _get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        rows, next_cursor = log_query.fetch_page(cursor, request.args)
+    except log_query.FilterError as exc:
+        return jsonify({"status": "invalid", "message": str(exc)}), 400
+    finally:
+        cursor.close()
+        conn.close()
+    formatted = _format_logs(rows)
+    for log, row in zip(formatted, rows):
+        log["event_kind"] = row["event_kind"]
+    return jsonify({"status": "success", "logs": formatted, "next_cursor": next_cursor})
+
+
+@app.route("/api/export", methods=["GET"])
+def export():
+    """
+    Download streaming: ?dataset=logs|users&format=csv|ndjson&gzip=1 plus filter
+    /api/logs (logs) atau role/prodi/since/until (users). Memori konstan berapa pun barisnya.
+    """
+    try:
+        chunks, mimetype, filename, slot = log_export.stream(
+            request.args.get("dataset", "logs"),
+            request.args.get("format", "csv"),
+            request.args,
+            compress=request.args.get("gzip") in {"1", "true"},
+        )
+    except log_query.FilterError as exc:
+        return jsonify({"status": "invalid", "message": str(exc)}), 400
+    except log_export.ExportBusy as exc:
+        response = jsonify({"status": "busy", "message": str(exc)})
+        response.status_code = 503
+        response.headers["Retry-After"] = str(log_export.EXPORT_RETRY_AFTER_SECONDS)
+        return response
+    response = Response(chunks, mimetype=mimetype)
+    # Klien putus sebelum stream dimulai: generator tidak pernah jalan, slot dilepas di sini
+    response.call_on_close(slot.release)
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    # Jangan di-buffer reverse proxy: kirim potongan ke klien begitu siap
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
 
 
 @app.route("/api/register-user", methods=["POST"])
@@ -523,6 +1018,7 @@ def register_user():
             (rfid_uid,),
         )
         user = cursor.fetchone()
+        _on_user_committed(user)
         return jsonify({"status": "success", "user": user}), 201
     except mysql.connector.errors.IntegrityError as exc:
         if exc.errno == mysql.connector.errorcode.ER_DUP_ENTRY:
@@ -579,10 +1075,12 @@ def create_user():
             (rfid_uid,),
         )
         new_user = cursor.fetchone()
+        _on_user_committed(new_user)
 
-        # Clear session REGISTERING
-        global current_active_session
-        current_active_session = None
+        # Clear session REGISTERING di kiosk tempat kartu ini di-tap
+        for kiosk_id, session in session_store.store.all().items():
+            if session.get("status") == "REGISTERING" and session.get("rfid_uid") == rfid_uid:
+                _set_active_session(kiosk_id, None)
 
         return jsonify({
             "status": "success",
@@ -607,115 +1105,133 @@ def chat_gemini():
     if not question:
         return jsonify({"status": "invalid", "message": "Pertanyaan wajib"}), 400
 
-    stats = _fetch_chat_stats()
-    answer = ai_service.ask_gemini(question, stats)
-    return jsonify({"status": "success", "answer": answer, "stats": stats})
+    result, cache_source, stats = _chat_answer("gemini", question)
+    return jsonify(
+        {"status": "success", "answer": result["answer"], "stats": stats, "cached": cache_source != "computed"}
+    )
 
 
 @app.route("/api/chat-openai", methods=["POST"])
 def chat_openai():
-    """OpenAI Chatbot endpoint for Admin Dashboard"""
+    """OpenAI Chatbot endpoint for Admin Dashboard (fallback ke Gemini jika OpenAI tidak tersedia/gagal)"""
     payload = request.get_json(silent=True) or {}
     question = payload.get("question", "").strip()
     if not question:
         return jsonify({"status": "invalid", "message": "Pertanyaan wajib"}), 400
 
-    if not openai_client:
-        # Fallback to Gemini if OpenAI not available
-        try:
-            stats = _fetch_chat_stats()
-            answer = ai_service.ask_gemini(question, stats)
-            return jsonify({"status": "success", "answer": answer, "source": "gemini"})
-        except Exception as exc:
-            return jsonify({"status": "error", "message": f"AI service tidak tersedia: {str(exc)}"}), 500
-
     try:
-        stats = _fetch_chat_stats()
-        context = f"Total sampah: {stats.get('total_logs', 0)}, Kertas: {stats.get('kertas', 0)}, Anorganik: {stats.get('anorganik', 0)}"
-        
-        response = openai_client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Kamu adalah EcoSmart Assistant. Jawab singkat, ramah, dan edukatif tentang sampah."
-                },
-                {
-                    "role": "user",
-                    "content": f"Konteks: {context}\n\nPertanyaan: {question}"
-                }
-            ],
-            max_tokens=200,
-            temperature=0.7,
-        )
-        
-        answer = response.choices[0].message.content.strip()
-        return jsonify({"status": "success", "answer": answer, "source": "openai"})
+        result, cache_source, _stats = _chat_answer("openai", question)
     except Exception as exc:
-        print(f"❌ [CHAT-OPENAI] Error: {exc}")
-        # Fallback to Gemini on error
+        return jsonify({"status": "error", "message": f"AI service error: {str(exc)}"}), 500
+    return jsonify(
+        {
+            "status": "success",
+            "answer": result["answer"],
+            "source": result["source"],
+            "cached": cache_source != "computed",
+        }
+    )
+
+
+@app.route("/api/chat-stream", methods=["POST"])
+def chat_stream():
+    """
+    Jawaban chatbot token demi token (text/event-stream lewat POST; dibaca
+    frontend dengan fetch + ReadableStream). Event: start, token, done, error.
+    """
+    payload = request.get_json(silent=True) or {}
+    question = payload.get("question", "").strip()
+    provider = payload.get("provider", "openai")
+    if not question:
+        return jsonify({"status": "invalid", "message": "Pertanyaan wajib"}), 400
+
+    stats = _fetch_chat_stats()
+    key = _chat_cache_key(provider, question, stats)
+    cached = chat_cache.answer_cache.peek(key)
+
+    def generate():
+        if cached is not None:
+            yield event_bus.format_sse("token", {"text": cached["answer"]})
+            yield event_bus.format_sse("done", {**cached, "cached": True})
+            return
+        parts = []
+        source = None
         try:
-            stats = _fetch_chat_stats()
-            answer = ai_service.ask_gemini(question, stats)
-            return jsonify({"status": "success", "answer": answer, "source": "gemini_fallback"})
-        except Exception as gemini_exc:
-            return jsonify({"status": "error", "message": f"AI service error: {str(exc)}"}), 500
+            for chunk in ai_service.chat_client.stream(question, stats, prefer=provider):
+                if source is None:
+                    source = _chat_source(chunk.provider, chunk.fallback)
+                    yield event_bus.format_sse("start", {"source": source})
+                parts.append(chunk.text)
+                yield event_bus.format_sse("token", {"text": chunk.text})
+        except llm_client.LLMUnavailable as exc:
+            print(f"❌ [CHAT-STREAM] {exc}")
+            if parts:
+                yield event_bus.format_sse("error", {"message": "Jawaban terputus, silakan ulangi."})
+                return
+            yield event_bus.format_sse("token", {"text": ai_service.LLM_BUSY_ANSWER})
+            yield event_bus.format_sse(
+                "done", {"answer": ai_service.LLM_BUSY_ANSWER, "source": "unavailable", "cached": False}
+            )
+            return
+        result = {"answer": "".join(parts).strip(), "source": source}
+        chat_cache.answer_cache.put(key, result)
+        yield event_bus.format_sse("done", {**result, "cached": False})
+
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@app.route("/api/chat-cache-stats", methods=["GET"])
+def chat_cache_stats():
+    return jsonify({**chat_cache.answer_cache.stats(), "provider": ai_service.CHAT_PROVIDER})
+
+
+@app.route("/api/llm-stats", methods=["GET"])
+def llm_stats():
+    return jsonify(ai_service.chat_client.stats())
 
 
 @app.route("/api/mvp-leaderboard", methods=["GET"])
 def mvp_leaderboard():
-    """Get MVP leaderboard grouped by Prodi"""
-    conn = _get_connection()
-    cursor = conn.cursor(dictionary=True)
+    """Agregat per prodi + top-N user tiap prodi: ?period=all|day|week|month&top=5"""
     try:
-        cursor.execute(
-            """
-            SELECT 
-                prodi,
-                COUNT(DISTINCT u.id) as total_users,
-                SUM(u.saldo) as total_saldo,
-                AVG(u.saldo) as avg_saldo,
-                MAX(u.saldo) as max_saldo
-            FROM users u
-            WHERE u.role = 'user' AND u.prodi IS NOT NULL
-            GROUP BY prodi
-            ORDER BY total_saldo DESC, avg_saldo DESC
-            """
-        )
-        leaderboard = cursor.fetchall()
-        
-        # Get top users per prodi
-        cursor.execute(
-            """
-            SELECT 
-                u.id,
-                u.name,
-                u.prodi,
-                u.saldo,
-                u.rfid_uid
-            FROM users u
-            WHERE u.role = 'user' AND u.prodi IS NOT NULL
-            ORDER BY u.prodi, u.saldo DESC
-            """
+        payload, cached = mvp_board.summary(request.args.get("period", "all"), request.args.get("top"))
+    except mvp_ranking.LeaderboardError as exc:
+        return jsonify({"status": "invalid", "message": str(exc)}), 400
+    return jsonify({**payload, "cached": cached})
+
+
+@app.route("/api/mvp-leaderboard/<prodi>", methods=["GET"])
+def mvp_leaderboard_prodi(prodi):
+    """Peringkat lengkap satu prodi per halaman: ?period=all&limit=20&cursor=<next_cursor>"""
+    try:
+        payload, cached = mvp_board.page(
+            prodi, request.args.get("period", "all"), request.args.get("limit"), request.args.get("cursor")
         )
-        all_users = cursor.fetchall()
-        
-        # Group users by prodi
-        prodi_users = {}
-        for user in all_users:
-            prodi = user["prodi"]
-            if prodi not in prodi_users:
-                prodi_users[prodi] = []
-            prodi_users[prodi].append(user)
-        
-        return jsonify({
-            "status": "success",
-            "leaderboard": leaderboard,
-            "users_by_prodi": prodi_users,
-        })
-    finally:
-        cursor.close()
-        conn.close()
+    except mvp_ranking.LeaderboardError as exc:
+        return jsonify({"status": "invalid", "message": str(exc)}), 400
+    return jsonify({**payload, "cached": cached})
+
+
+@app.route("/api/user-rank/<int:user_id>", methods=["GET"])
+def user_rank(user_id):
+    """Peringkat saldo satu user (sama dengan urutan leaderboard dashboard), dari index di memori."""
+    result = saldo_ranking.rank(user_id)
+    if result is None:
+        return jsonify({"status": "not_found", "message": "User tidak ditemukan"}), 404
+    return jsonify({"status": "success", **result})
+
+
+@app.route("/api/rank-stats", methods=["GET"])
+def rank_stats():
+    return jsonify(saldo_ranking.stats())
+
+
+@app.route("/api/mvp-leaderboard-stats", methods=["GET"])
+def mvp_leaderboard_stats():
+    return jsonify(mvp_board.stats())
 
 
 @app.cli.command("fresh")
@@ -725,20 +1241,125 @@ def clear_logs():
     cursor = conn.cursor()
     try:
         cursor.execute("DELETE FROM trash_logs")
+        stats_rollup.clear(cursor)
         conn.commit()
+        dashboard_snapshot.invalidate()
+        mvp_board.invalidate()
         print("✅ Trash logs cleared.")
     finally:
         cursor.close()
         conn.close()
 
 
+@app.cli.command("reset-data")
+def reset_data_command():
+    """Hapus log sampah dan nolkan saldo semua user (lewat points_ledger)."""
+    conn = _get_connection()
+    try:
+        reset_data.reset_trash_data(conn)
+    finally:
+        conn.close()
+    # Saldo berubah massal: muat ulang peringkat, jangan update per user
+    saldo_ranking.replace(_load_saldo_ranking())
+    dashboard_snapshot.invalidate()
+    mvp_board.invalidate()
+
+
+@app.cli.command("export")
+@click.option("--dataset", type=click.Choice(sorted(log_export.DATASETS)), default="logs")
+@click.option("--format", "fmt", type=click.Choice(sorted(log_export.FORMATS)), default="csv")
+@click.option("--since", help="Tanggal/waktu ISO awal (inklusif)")
+@click.option("--until", help="Tanggal/waktu ISO akhir (eksklusif; tanggal saja = sampai akhir hari itu)")
+@click.option("--kind", default="all", help="Jenis event log: scan, role, logout atau all")
+@click.option("--gzip", "compress", is_flag=True, help="Kompres hasil dengan gzip")
+@click.option("--output", "-o", default=None, help="Path file (default: nama otomatis; '-' untuk stdout)")
+def export_data(dataset, fmt, since, until, kind, compress, output):
+    """Export trash_logs/users ke CSV atau NDJSON secara streaming."""
+    args = {key: value for key, value in {"since": since, "until": until, "kind": kind}.items() if value}
+    stats = {"rows": 0}
+    try:
+        chunks, _mimetype, filename, slot = log_export.stream(dataset, fmt, args, compress=compress, stats=stats)
+    except log_query.FilterError as exc:
+        raise click.BadParameter(str(exc))
+    except log_export.ExportBusy as exc:
+        raise click.ClickException(str(exc))
+    path = output or filename
+    try:
+        handle = click.get_binary_stream("stdout") if path == "-" else open(path + ".tmp", "wb")
+    except BaseException:
+        slot.release()
+        raise
+    try:
+        for chunk in chunks:
+            handle.write(chunk)
+    except BaseException:
+        if path != "-":
+            handle.close()
+            os.remove(path + ".tmp")
+        raise
+    finally:
+        slot.release()
+    if path != "-":
+        handle.close()
+        os.replace(path + ".tmp", path)
+    click.echo(f"✅ Export {dataset}: {stats['rows']} baris -> {path}", err=True)
+
+
+@app.cli.command("reconcile-saldo")
+@click.option("--apply", is_flag=True, help="Timpa saldo yang selisih dengan total ledger")
+@click.option("--batch-size", type=int, default=points_ledger.RECONCILE_BATCH_SIZE)
+def reconcile_saldo(apply, batch_size):
+    """Hitung ulang saldo semua user dari points_ledger (per batch)."""
+    conn = _get_connection()
+    try:
+        result = points_ledger.reconcile(conn, apply=apply, batch_size=batch_size)
+        if apply and result["fixed"]:
+            dashboard_snapshot.invalidate()
+            mvp_board.invalidate()
+        points_ledger.print_report(result, apply)
+    finally:
+        conn.close()
+
+
+@app.cli.command("rebuild-stats")
+def rebuild_stats():
+    """Bangun ulang tabel rollup statistik dari trash_logs."""
+    conn = _get_connection()
+    try:
+        rows = stats_rollup.rebuild(conn)
+        dashboard_snapshot.invalidate()
+        print(f"✅ Rollup statistik dibangun ulang ({rows} bucket).")
+    finally:
+        conn.close()
+
+
+@app.cli.command("rotate-logs")
+def rotate_logs():
+    """Tambah partisi bulan depan, arsipkan & drop partisi trash_logs di luar retensi."""
+    conn = _get_connection()
+    try:
+        result = log_partitions.run_maintenance(conn)
+        if not result["partitioned"]:
+            print("ℹ️  trash_logs belum dipartisi. Jalankan: python migrate_db.py")
+            return
+        if result["archived"]:
+            dashboard_snapshot.invalidate()
+        print(f"✅ Partisi baru: {result['created'] or '-'}; diarsipkan: {len(result['archived'])}")
+    finally:
+        conn.close()
+
+
 @app.route("/api/scan-trash", methods=["POST"])
 def scan_trash():
     """Endpoint untuk frontend mengirim gambar dari kamera real-time untuk klasifikasi"""
-    global current_active_session
-    
-    if not current_active_session or current_active_session.get("role") != "user":
+    kiosk_id = _resolve_kiosk(request.form)
+    active_session = session_store.store.get(kiosk_id)
+    if not active_session or active_session.get("role") != "user":
         return jsonify({"status": "error", "message": "Session tidak valid"}), 401
+    session_store.store.touch(kiosk_id)
+    warming = _model_warming_response()
+    if warming is not None:
+        return warming
     
     if "image" not in request.files:
         return jsonify({"status": "error", "message": "Gambar tidak ditemukan"}), 400
@@ -748,15 +1369,15 @@ def scan_trash():
         return jsonify({"status": "error", "message": "File kosong"}), 400
 
     try:
-        # Save image temporarily
+        # Decode langsung di memori - tidak ada round-trip JPEG lewat disk
         image_data = file.read()
-        image = Image.open(BytesIO(image_data))
-        temp_path = "static/captures/scan_realtime.jpg"
-        os.makedirs("static/captures", exist_ok=True)
-        image.save(temp_path, "JPEG")
-        
+        frame = trash_classifier.decode_image_bytes(image_data)
+        if frame is None:
+            return jsonify({"status": "error", "message": "Format gambar tidak valid"}), 400
+        camera_module.save_capture_async(data=image_data, prefix="realtime")
+
         # Classify using model .h5
-        label, confidence, analysis = _classify_image(temp_path)
+        label, confidence, analysis = _classify_image(frame)
         
         # Map label to command
         esp_command = _map_label_to_command(label)
@@ -765,30 +1386,29 @@ def scan_trash():
         conn = _get_connection()
         cursor = conn.cursor(dictionary=True)
         try:
-            cursor.execute("SELECT * FROM users WHERE id = %s", (current_active_session["user_id"],))
+            cursor.execute("SELECT * FROM users WHERE id = %s", (active_session["user_id"],))
             user = cursor.fetchone()
             
             if user:
-                new_saldo = user["saldo"] + REWARD_POINTS
-                cursor.execute("UPDATE users SET saldo = %s WHERE id = %s", (new_saldo, user["id"]))
                 location_label = _map_ip_to_location(request.remote_addr or "")
-                cursor.execute(
-                    """
-                    INSERT INTO trash_logs (user_id, trash_type, confidence, location_ip)
-                    VALUES (%s, %s, %s, %s)
-                    """,
-                    (user["id"], label, confidence, location_label),
+                # Tanpa scan_id, gambar yang sama persis (upload ulang) dianggap scan yang sama
+                scan_id = (request.form.get("scan_id") or request.headers.get("Idempotency-Key") or "").strip()
+                ledger_key = points_ledger.idempotency_key(
+                    "trash", user["id"], scan_id or "sha1-" + hashlib.sha1(image_data).hexdigest()
+                )
+                new_saldo, duplicate = _credit_scan(
+                    conn, cursor, user, label, confidence, location_label, ledger_key
                 )
-                conn.commit()
-                
+
                 return jsonify({
                     "status": "success",
                     "label": label,
                     "confidence": confidence,
                     "esp_command": esp_command,
                     "model_source": analysis.get("used"),
-                    "points": REWARD_POINTS,
+                    "points": 0 if duplicate else REWARD_POINTS,
                     "new_saldo": new_saldo,
+                    "duplicate": duplicate,
                     "analysis": analysis,
                 })
         finally:
@@ -800,7 +1420,19 @@ def scan_trash():
         return jsonify({"status": "error", "message": str(exc)}), 500
 
 
+startup.mark("app_loaded")
+
+
 if __name__ == "__main__":
-    trash_classifier.load_model_once()
+    # Dengan debug=True, proses reloader induk jangan ikut memegang device kamera
+    # (atau memuat model): hanya proses anak yang melayani request
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        _start_warm_up()
+        saldo_ranking.preload()
+        camera_module.start_capture_service()
+        forecast_engine.start()
+        log_partitions.start_maintenance_thread(
+            _get_connection, on_archived=lambda _result: dashboard_snapshot.invalidate()
+        )
     print("🔥 EcoSmart.AI Backend siap di port 5001.")
     app.run(host="0.0.0.0", port=5001, debug=True)
\ No newline at end of file
@@ -0,0 +1,319 @@
+"""
+Prediksi kapan tiap bin penuh dan urutan pickup untuk petugas.
+
+Laju pengisian per bin diestimasi dengan regresi linier jarak ultrasonic vs
+waktu sejak pengosongan terakhir, dari rollup telemetry per menit. Jumlah
+berjalan regresi diperbarui inkremental: setiap refresh hanya membaca bucket
+menit baru. Jika belum ada tren (sensor diam / data sedikit), laju diambil
+dari jumlah setoran per lokasi di trash_stats_rollup dikali perkiraan
+cm per setoran. Hasil dan rute pickup dihitung di thread background lalu
+disajikan dari cache.
+"""
+import datetime
+import json
+import math
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+EMPTY_DISTANCE_CM = float(os.environ.get("BIN_EMPTY_DISTANCE_CM", "30"))
+FULL_DISTANCE_CM = float(os.environ.get("BIN_FULL_DISTANCE_CM", "5"))  # BATAS_PENUH di firmware
+REFRESH_SECONDS = float(os.environ.get("FORECAST_REFRESH_SECONDS", "60"))
+FULL_RECOMPUTE_SECONDS = 3600.0
+LOOKBACK_HOURS = float(os.environ.get("FORECAST_LOOKBACK_HOURS", "24"))
+CM_PER_DEPOSIT = float(os.environ.get("FORECAST_CM_PER_DEPOSIT", "0.5"))
+PICKUP_HORIZON_HOURS = float(os.environ.get("PICKUP_HORIZON_HOURS", "8"))
+PICKUP_FILL_PERCENT = 80.0
+URGENT_HOURS = 2.0
+# Jarak naik sebanyak ini antar bucket = bin baru dikosongkan, tren dimulai ulang
+EMPTY_JUMP_CM = 10.0
+MIN_TREND_POINTS = 3
+# Bucket menit yang masih bisa bertambah (flush buffer/batch perangkat) belum dibaca
+SETTLE_SECONDS = 120
+# Koordinat opsional untuk urutan rute: {"BIN-01": [x, y], "Gedung A": [x, y]}
+BIN_COORDINATES = json.loads(os.environ.get("BIN_COORDINATES") or "{}")
+
+
+class FillTrend:
+    """Regresi linier jarak (cm) terhadap waktu (jam) sejak pengosongan terakhir."""
+
+    __slots__ = ("n", "sum_t", "sum_d", "sum_tt", "sum_td", "origin", "last_ts", "last_distance")
+
+    def __init__(self):
+        self.last_ts = None
+        self.last_distance = None
+        self.reset()
+
+    def reset(self) -> None:
+        self.n = 0
+        self.sum_t = self.sum_d = self.sum_tt = self.sum_td = 0.0
+        self.origin = None
+
+    def add(self, ts: datetime.datetime, distance: float) -> None:
+        if self.last_distance is not None and distance - self.last_distance >= EMPTY_JUMP_CM:
+            self.reset()
+        if self.origin is None:
+            self.origin = ts
+        t = (ts - self.origin).total_seconds() / 3600.0
+        self.n += 1
+        self.sum_t += t
+        self.sum_d += distance
+        self.sum_tt += t * t
+        self.sum_td += t * distance
+        self.last_ts = ts
+        self.last_distance = distance
+
+    def slope(self) -> Optional[float]:
+        """cm per jam (negatif = makin penuh), None jika data belum cukup."""
+        if self.n < MIN_TREND_POINTS:
+            return None
+        denominator = self.n * self.sum_tt - self.sum_t * self.sum_t
+        if denominator <= 1e-9:
+            return None
+        return (self.n * self.sum_td - self.sum_t * self.sum_d) / denominator
+
+
+def fill_percent(distance: Optional[float]) -> Optional[float]:
+    if distance is None:
+        return None
+    fraction = (EMPTY_DISTANCE_CM - distance) / (EMPTY_DISTANCE_CM - FULL_DISTANCE_CM)
+    return round(max(0.0, min(1.0, fraction)) * 100, 1)
+
+
+def forecast_bin(bin_id: str, location: Optional[str], distance: Optional[float], slope: Optional[float],
+                 deposits_per_hour: float, now: datetime.datetime) -> dict:
+    rate = None
+    method = None
+    if slope is not None and slope < 0:
+        rate, method = -slope, "trend"
+    elif deposits_per_hour > 0:
+        rate, method = deposits_per_hour * CM_PER_DEPOSIT, "deposits"
+
+    hours_to_full = None
+    if distance is not None:
+        remaining = max(0.0, distance - FULL_DISTANCE_CM)
+        if remaining == 0:
+            hours_to_full = 0.0
+        elif rate:
+            hours_to_full = round(remaining / rate, 2)
+
+    return {
+        "bin_id": bin_id,
+        "location": location,
+        "distance_cm": distance,
+        "fill_percent": fill_percent(distance),
+        "fill_rate_cm_per_hour": round(rate, 3) if rate else None,
+        "method": method,
+        "hours_to_full": hours_to_full,
+        "predicted_full_at": (
+            (now + datetime.timedelta(hours=hours_to_full)).isoformat() if hours_to_full is not None else None
+        ),
+    }
+
+
+def _coordinates(forecast: dict, coordinates: dict):
+    return coordinates.get(forecast["bin_id"]) or coordinates.get(forecast["location"] or "")
+
+
+def _order_tier(tier: list, coordinates: dict, position) -> tuple:
+    """Nearest-neighbour jika semua bin di tier punya koordinat, selain itu urut waktu penuh."""
+    if tier and position is not None and all(_coordinates(f, coordinates) for f in tier):
+        remaining = list(tier)
+        ordered = []
+        while remaining:
+            nearest = min(remaining, key=lambda f: math.dist(position, _coordinates(f, coordinates)))
+            remaining.remove(nearest)
+            ordered.append(nearest)
+            position = _coordinates(nearest, coordinates)
+        return ordered, position
+    ordered = sorted(tier, key=lambda f: (f["hours_to_full"], -(f["fill_percent"] or 0)))
+    if ordered and _coordinates(ordered[-1], coordinates):
+        position = _coordinates(ordered[-1], coordinates)
+    return ordered, position
+
+
+def plan_route(forecasts: list, petugas: list, horizon_hours: float = PICKUP_HORIZON_HOURS,
+               coordinates: Optional[dict] = None) -> dict:
+    """
+    Bin yang perlu diambil (>= 80% atau penuh dalam horizon), dikelompokkan per urgensi
+    (sudah penuh, penuh < 2 jam, sisanya) lalu diurutkan di dalam tiap kelompok.
+    Rute dibagi berurutan ke akun petugas agar stop yang berdekatan tetap satu petugas.
+    """
+    coordinates = BIN_COORDINATES if coordinates is None else coordinates
+    due = []
+    for forecast in forecasts:
+        hours = forecast["hours_to_full"]
+        if (forecast["fill_percent"] or 0) >= PICKUP_FILL_PERCENT or (hours is not None and hours <= horizon_hours):
+            if hours is None:
+                # Sudah >= 80% tapi laju belum diketahui: anggap mendesak
+                hours = 0.0 if (forecast["fill_percent"] or 0) >= 100 else URGENT_HOURS
+            due.append(dict(forecast, hours_to_full=hours))
+
+    tiers = ([], [], [])
+    for forecast in due:
+        hours = forecast["hours_to_full"]
+        tiers[0 if hours <= 0 else 1 if hours <= URGENT_HOURS else 2].append(forecast)
+
+    stops = []
+    position = coordinates.get("depot")
+    for tier in tiers:
+        ordered, position = _order_tier(tier, coordinates, position)
+        stops.extend(ordered)
+    for index, stop in enumerate(stops, start=1):
+        stop["order"] = index
+
+    assignments = []
+    if petugas:
+        chunk = math.ceil(len(stops) / len(petugas)) if stops else 0
+        for index, person in enumerate(petugas):
+            assignments.append({
+                "petugas": person,
+                "stops": stops[index * chunk:(index + 1) * chunk] if chunk else [],
+            })
+    return {"horizon_hours": horizon_hours, "stops": stops, "assignments": assignments}
+
+
+class ForecastEngine:
+    """
+    Hitung ulang prediksi & rute tiap REFRESH_SECONDS di background. `connect()`
+    mengembalikan koneksi MySQL (pool); `bins_provider()` mengembalikan state bin
+    terkini (bin_registry). Rebuild penuh tiap jam untuk menyerap data terlambat.
+    """
+
+    def __init__(self, connect: Callable, bins_provider: Callable[[], list],
+                 refresh_seconds: float = REFRESH_SECONDS):
+        self.connect = connect
+        self.bins_provider = bins_provider
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._trends = {}
+        self._consumed_until = None
+        self._last_full_rebuild = 0.0
+        self._cache = None
+        self._computed_monotonic = 0.0
+        self._thread = None
+        self._stats = {"refreshes": 0, "full_rebuilds": 0, "errors": 0, "last_refresh_ms": None}
+
+    def _load_trends(self, cursor, now: datetime.datetime) -> None:
+        if time.monotonic() - self._last_full_rebuild > FULL_RECOMPUTE_SECONDS or self._consumed_until is None:
+            self._trends = {}
+            self._consumed_until = now - datetime.timedelta(hours=LOOKBACK_HOURS)
+            self._last_full_rebuild = time.monotonic()
+            self._stats["full_rebuilds"] += 1
+        settled = (now - datetime.timedelta(seconds=SETTLE_SECONDS)).replace(second=0, microsecond=0)
+        if settled <= self._consumed_until:
+            return
+        cursor.execute(
+            "SELECT bin_id, bucket_start, sum_cm, samples FROM bin_telemetry_rollup "
+            "WHERE resolution = 'minute' AND bucket_start >= %s AND bucket_start < %s "
+            "ORDER BY bucket_start",
+            (self._consumed_until, settled),
+        )
+        for row in cursor.fetchall():
+            if row["samples"]:
+                trend = self._trends.setdefault(row["bin_id"], FillTrend())
+                trend.add(row["bucket_start"], row["sum_cm"] / row["samples"])
+        self._consumed_until = settled
+
+    def _is_fresh(self) -> bool:
+        with self._lock:
+            return self._cache is not None and time.monotonic() - self._computed_monotonic <= self.refresh_seconds
+
+    def refresh(self, only_if_stale: bool = False) -> dict:
+        with self._refresh_lock:
+            if only_if_stale and self._is_fresh():
+                # Sudah dihitung oleh request/thread lain selama menunggu lock
+                return self._cache
+            started = time.perf_counter()
+            now = datetime.datetime.now()
+            conn = self.connect()
+            try:
+                cursor = conn.cursor(dictionary=True)
+                try:
+                    self._load_trends(cursor, now)
+                    cursor.execute(
+                        "SELECT location, SUM(cnt) AS cnt FROM trash_stats_rollup "
+                        "WHERE bucket_kind = 'hour' AND bucket_start >= %s "
+                        "AND trash_type IN ('KERTAS', 'ANORGANIK') GROUP BY location",
+                        (now - datetime.timedelta(hours=LOOKBACK_HOURS),),
+                    )
+                    deposit_rates = {row["location"]: float(row["cnt"]) / LOOKBACK_HOURS for row in cursor.fetchall()}
+                    cursor.execute("SELECT id, name, prodi FROM users WHERE role = 'petugas' ORDER BY id")
+                    petugas = cursor.fetchall()
+                finally:
+                    cursor.close()
+            finally:
+                conn.close()
+
+            bins = {state["bin_id"]: state for state in self.bins_provider()}
+            forecasts = []
+            for bin_id in sorted(set(bins) | set(self._trends)):
+                state = bins.get(bin_id, {})
+                trend = self._trends.get(bin_id)
+                distance = state.get("distance_cm")
+                if distance is None and trend is not None:
+                    distance = trend.last_distance
+                location = state.get("location")
+                forecasts.append(forecast_bin(
+                    bin_id,
+                    location,
+                    distance,
+                    trend.slope() if trend else None,
+                    deposit_rates.get(location, 0.0),
+                    now,
+                ))
+            forecasts.sort(key=lambda f: (f["hours_to_full"] is None, f["hours_to_full"] or 0))
+
+            result = {
+                "computed_at": now.isoformat(),
+                "bins": forecasts,
+                "route": plan_route(forecasts, petugas),
+            }
+            with self._lock:
+                self._cache = result
+                self._computed_monotonic = time.monotonic()
+                self._stats["refreshes"] += 1
+                self._stats["last_refresh_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            return result
+
+    def get(self) -> dict:
+        """
+        Hasil cache terakhir. Jika belum ada atau lebih tua dari refresh_seconds
+        (start() tidak dipanggil, atau thread refresh gagal terus) dihitung ulang
+        secara sinkron; jika gagal padahal ada hasil lama, hasil lama dipakai.
+        """
+        if self._is_fresh():
+            with self._lock:
+                return self._cache
+        try:
+            return self.refresh(only_if_stale=True)
+        except Exception as exc:
+            with self._lock:
+                cached = self._cache
+                self._stats["errors"] += 1
+            if cached is None:
+                raise
+            print(f"⚠️ [FORECAST] Refresh gagal, memakai hasil lama: {exc}")
+            return cached
+
+    def start(self) -> threading.Thread:
+        def _loop():
+            while True:
+                try:
+                    self.refresh()
+                except Exception as exc:
+                    self._stats["errors"] += 1
+                    print(f"⚠️ [FORECAST] Refresh gagal: {exc}")
+                time.sleep(self.refresh_seconds)
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=_loop, name="bin-forecast", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def stats(self) -> dict:
+        with self._lock:
+            computed_at = self._cache["computed_at"] if self._cache else None
+        return {"computed_at": computed_at, "tracked_trends": len(self._trends), **self._stats}
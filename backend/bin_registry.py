@@ -0,0 +1,102 @@
+import datetime
+import threading
+import time
+from typing import Iterable, Optional
+
+DEFAULT_STATUS = "siap"
+
+
+class BinState:
+    __slots__ = ("bin_id", "location", "status", "distance_cm", "updated_at", "updated_ts")
+
+    def __init__(self, bin_id: str, location: Optional[str] = None):
+        self.bin_id = bin_id
+        self.location = location
+        self.status = DEFAULT_STATUS
+        self.distance_cm = None
+        self.updated_at = None
+        self.updated_ts = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "bin_id": self.bin_id,
+            "location": self.location,
+            "status": self.status,
+            "distance_cm": self.distance_cm,
+            "updated_at": self.updated_at,
+        }
+
+
+def empty_state() -> dict:
+    """Bentuk bin_state lama saat belum ada bin yang melapor."""
+    return {"bin_id": None, "location": None, "status": DEFAULT_STATUS, "distance_cm": None, "updated_at": None}
+
+
+class BinRegistry:
+    """
+    State terakhir per tempat sampah, dikunci oleh device id ESP32 (atau nama
+    lokasi dari IP untuk firmware lama). Update O(1) di bawah satu lock; bin
+    yang terakhir melapor dicatat agar konsumen satu-bin tetap bekerja.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bins = {}
+        self._latest_id = None
+        self._version = 0
+
+    def update(self, bin_id: str, location: Optional[str] = None, status: Optional[str] = None,
+               distance: Optional[float] = None) -> dict:
+        with self._lock:
+            state = self._bins.get(bin_id)
+            if state is None:
+                state = self._bins[bin_id] = BinState(bin_id, location)
+            if location:
+                state.location = location
+            state.status = status or state.status
+            if distance is not None:
+                try:
+                    state.distance_cm = float(distance)
+                except (ValueError, TypeError):
+                    state.distance_cm = None
+            state.updated_at = datetime.datetime.now().isoformat()
+            state.updated_ts = time.time()
+            self._latest_id = bin_id
+            self._version += 1
+            return state.to_dict()
+
+    def get(self, bin_id: str) -> Optional[dict]:
+        with self._lock:
+            state = self._bins.get(bin_id)
+            return state.to_dict() if state else None
+
+    def latest(self) -> dict:
+        with self._lock:
+            state = self._bins.get(self._latest_id)
+            return state.to_dict() if state else empty_state()
+
+    def query(self, bin_ids: Optional[Iterable[str]] = None, location: Optional[str] = None,
+              status: Optional[str] = None) -> list:
+        """Semua bin (urut bin_id), opsional difilter id, lokasi dan/atau status."""
+        with self._lock:
+            if bin_ids is not None:
+                states = [self._bins[b] for b in bin_ids if b in self._bins]
+            else:
+                states = list(self._bins.values())
+            return [
+                state.to_dict()
+                for state in sorted(states, key=lambda s: s.bin_id)
+                if (location is None or state.location == location)
+                and (status is None or state.status == status)
+            ]
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"bins": len(self._bins), "version": self._version, "latest_bin_id": self._latest_id}
+
+
+registry = BinRegistry()
@@ -2,15 +2,31 @@ import cv2
 import time
 import os
 import platform
+import queue
+import threading
+import uuid
+import datetime
+import collections
 from typing import Optional, Tuple
 
+import numpy as np
+
 # Lokasi penyimpanan gambar sementara
 CAPTURE_FOLDER = "static/captures"
+# Simpan arsip gambar scan ke disk (di background, nama file unik per scan)
+SAVE_CAPTURES = os.environ.get("SAVE_CAPTURES", "1") not in {"0", "false", "False"}
+CAPTURE_SAVE_QUEUE_SIZE = 64
 # OBS Virtual Cam biasanya di index 0
 PREFERRED_INDICES = (1, 0)
 TARGET_RESOLUTION = (1280, 720)
 WARM_UP_FRAMES = 5  # Kurangi untuk mempercepat (OBS Virtual Cam cepat)
 WARM_UP_SLEEP_SECONDS = 0.5  # Kurangi dari 2 detik ke 0.5 detik
+# Capture service: kamera tetap terbuka di thread background, frame terbaru di ring buffer
+CAMERA_PERSISTENT = os.environ.get("CAMERA_PERSISTENT", "1") not in {"0", "false", "False"}
+FRAME_BUFFER_SIZE = int(os.environ.get("CAMERA_FRAME_BUFFER", "4"))
+FRAME_WAIT_TIMEOUT_SECONDS = 3.0
+MAX_READ_FAILURES = 10  # Frame gagal berturut-turut sebelum kamera dianggap hilang
+REOPEN_DELAY_SECONDS = 2.0
 
 IS_WINDOWS = platform.system().lower() == "windows"
 WINDOWS_BACKENDS = (cv2.CAP_DSHOW, cv2.CAP_MSMF)
@@ -34,32 +50,44 @@ def _backend_name(backend: int) -> str:
     return "UNKNOWN_BACKEND"
 
 
-def _open_camera() -> Tuple[Optional[cv2.VideoCapture], Optional[int]]:
-    for backend in CAMERA_BACKENDS:
-        for index in PREFERRED_INDICES:
+def _open_camera_at(backend: int, index: int) -> Optional[cv2.VideoCapture]:
+    backend_label = _backend_name(backend)
+    print(f"📸 [CAMERA] Mencoba membuka kamera index {index} "
+          f"dengan backend {backend_label}...")
 
-            backend_label = _backend_name(backend)
-            print(f"📸 [CAMERA] Mencoba membuka kamera index {index} "
-                  f"dengan backend {backend_label}...")
+    cap = cv2.VideoCapture(index, backend)
 
-            cap = cv2.VideoCapture(index, backend)
+    if not cap.isOpened():
+        cap.release()
+        print(f"⚠️ [CAMERA] Kamera index {index} gagal dibuka ({backend_label}).")
+        return None
 
-            if not cap.isOpened():
-                cap.release()
-                print(f"⚠️ [CAMERA] Kamera index {index} gagal dibuka ({backend_label}).")
-                continue
+    # Set resolusi
+    width, height = TARGET_RESOLUTION
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
 
-            # Set resolusi
-            width, height = TARGET_RESOLUTION
-            cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    print(f"✅ [CAMERA] Kamera index {index} aktif dengan backend "
+          f"{backend_label} dan resolusi {width}x{height}.")
+    return cap
 
-            print(f"✅ [CAMERA] Kamera index {index} aktif dengan backend "
-                  f"{backend_label} dan resolusi {width}x{height}.")
-            return cap, index
+
+def _open_camera(
+    preferred: Optional[Tuple[int, int]] = None,
+) -> Tuple[Optional[cv2.VideoCapture], Optional[int], Optional[int]]:
+    """Coba kombinasi (backend, index) yang terakhir berhasil dulu, lalu semua kandidat."""
+    candidates = [(backend, index) for backend in CAMERA_BACKENDS for index in PREFERRED_INDICES]
+    if preferred in candidates:
+        candidates.remove(preferred)
+        candidates.insert(0, preferred)
+
+    for backend, index in candidates:
+        cap = _open_camera_at(backend, index)
+        if cap is not None:
+            return cap, index, backend
 
     print("❌ [CAMERA] Gagal membuka semua kamera yang tersedia.")
-    return None, None
+    return None, None, None
 
 
 def _warm_up_camera(cap: cv2.VideoCapture) -> None:
@@ -73,15 +101,141 @@ def _warm_up_camera(cap: cv2.VideoCapture) -> None:
             break
 
 
-def take_picture() -> Optional[str]:
+class CaptureService:
     """
-    Membuka webcam, mengambil 1 frame, menyimpannya, lalu menutup webcam.
-    Return: Path file gambar (String) atau None jika gagal.
+    Thread background yang menjaga kamera tetap terbuka dan terus membaca frame
+    ke ring buffer, sehingga capture saat tap RFID cukup mengambil frame terbaru.
+    Kombinasi backend/index yang berhasil diingat; jika kamera hilang (frame gagal
+    berturut-turut) device dibuka ulang otomatis.
     """
-    _ensure_capture_folder()
-    filename = f"{CAPTURE_FOLDER}/scan_latest.jpg"
 
-    cap, index = _open_camera()
+    def __init__(self, buffer_size: int = FRAME_BUFFER_SIZE):
+        # Item ring buffer: (waktu epoch frame dibaca, frame BGR)
+        self._frames = collections.deque(maxlen=max(1, buffer_size))
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_good = None  # (backend, index)
+        self._stats = {
+            "frames": 0,
+            "read_failures": 0,
+            "reopens": 0,
+            "opened_at": None,
+        }
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="camera-capture", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=5)
+
+    def _run(self) -> None:
+        cap = None
+        failures = 0
+        while not self._stop.is_set():
+            if cap is None:
+                cap, index, backend = _open_camera(self._last_good)
+                if cap is None:
+                    self._stop.wait(REOPEN_DELAY_SECONDS)
+                    continue
+                _warm_up_camera(cap)
+                with self._cond:
+                    if self._last_good is not None:
+                        self._stats["reopens"] += 1
+                    self._last_good = (backend, index)
+                    self._stats["opened_at"] = time.time()
+                failures = 0
+
+            ret, frame = cap.read()
+            if not ret or frame is None or frame.size == 0:
+                failures += 1
+                with self._cond:
+                    self._stats["read_failures"] += 1
+                if failures >= MAX_READ_FAILURES:
+                    print("⚠️ [CAMERA] Kamera tidak mengirim frame, membuka ulang device...")
+                    cap.release()
+                    cap = None
+                    with self._cond:
+                        self._frames.clear()
+                    self._stop.wait(REOPEN_DELAY_SECONDS)
+                else:
+                    time.sleep(0.05)
+                continue
+
+            failures = 0
+            with self._cond:
+                self._frames.append((time.time(), frame))
+                self._stats["frames"] += 1
+                self._cond.notify_all()
+
+        if cap is not None:
+            cap.release()
+
+    def latest_frame(
+        self,
+        newer_than: Optional[float] = None,
+        timeout: float = FRAME_WAIT_TIMEOUT_SECONDS,
+    ) -> Optional[np.ndarray]:
+        """
+        Ambil frame paling baru. Jika `newer_than` (epoch) diisi, tunggu sampai ada
+        frame yang dibaca setelah waktu itu. Return None jika timeout.
+        """
+        self.start()
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._frames:
+                    captured_at, frame = self._frames[-1]
+                    if newer_than is None or captured_at > newer_than:
+                        return frame
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+    def status(self) -> dict:
+        with self._cond:
+            last_frame_at = self._frames[-1][0] if self._frames else None
+            backend, index = self._last_good or (None, None)
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "backend": _backend_name(backend) if backend is not None else None,
+                "index": index,
+                "buffered_frames": len(self._frames),
+                "last_frame_age_ms": round((time.time() - last_frame_at) * 1000.0, 1)
+                if last_frame_at else None,
+                **self._stats,
+            }
+
+
+_capture_service = None
+_capture_service_lock = threading.Lock()
+
+
+def get_capture_service() -> CaptureService:
+    global _capture_service
+    if _capture_service is None:
+        with _capture_service_lock:
+            if _capture_service is None:
+                _capture_service = CaptureService()
+    return _capture_service
+
+
+def start_capture_service() -> None:
+    if CAMERA_PERSISTENT:
+        get_capture_service().start()
+
+
+def _capture_frame_once() -> Optional[np.ndarray]:
+    cap, _, _ = _open_camera()
     if cap is None:
         return None
 
@@ -93,9 +247,7 @@ def take_picture() -> Optional[str]:
             print("❌ [CAMERA] Gagal menangkap frame yang valid setelah pemanasan.")
             return None
 
-        cv2.imwrite(filename, frame)
-        print(f"✅ [CAMERA] Gambar tersimpan di: {filename}")
-        return filename
+        return frame
 
     except Exception as exc:
         print(f"❌ [CAMERA] Terjadi error saat pengambilan gambar: {exc}")
@@ -106,6 +258,114 @@ def take_picture() -> Optional[str]:
         cv2.destroyAllWindows()
 
 
+def capture_frame(newer_than: Optional[float] = None) -> Optional[np.ndarray]:
+    """
+    Ambil 1 frame BGR (numpy array) tanpa menulis ke disk, atau None jika gagal.
+    Dengan CAMERA_PERSISTENT aktif, frame diambil dari capture service (milidetik);
+    jika tidak, webcam dibuka-tutup seperti sebelumnya.
+    `newer_than` (epoch): hanya terima frame yang diambil setelah waktu tersebut.
+    """
+    if not CAMERA_PERSISTENT:
+        if newer_than is not None:
+            time.sleep(max(0.0, newer_than - time.time()))
+        return _capture_frame_once()
+
+    timeout = FRAME_WAIT_TIMEOUT_SECONDS
+    if newer_than is not None:
+        timeout += max(0.0, newer_than - time.time())
+    frame = get_capture_service().latest_frame(newer_than=newer_than, timeout=timeout)
+    if frame is None:
+        print("❌ [CAMERA] Tidak ada frame baru dari capture service.")
+    return frame
+
+
+def camera_status() -> dict:
+    if not CAMERA_PERSISTENT:
+        return {"running": False, "persistent": False}
+    status = get_capture_service().status()
+    status["persistent"] = True
+    return status
+
+
+def _unique_capture_path(prefix: str, extension: str = "jpg") -> str:
+    stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    return f"{CAPTURE_FOLDER}/{prefix}_{stamp}_{uuid.uuid4().hex[:8]}.{extension}"
+
+
+def _write_capture(path: str, frame: Optional[np.ndarray], data: Optional[bytes]) -> None:
+    _ensure_capture_folder()
+    if data is not None:
+        with open(path, "wb") as handle:
+            handle.write(data)
+    else:
+        cv2.imwrite(path, frame)
+
+
+_save_queue = queue.Queue(maxsize=CAPTURE_SAVE_QUEUE_SIZE)
+_save_thread = None
+_save_thread_lock = threading.Lock()
+
+
+def _save_worker() -> None:
+    while True:
+        path, frame, data = _save_queue.get()
+        try:
+            _write_capture(path, frame, data)
+        except Exception as exc:
+            print(f"⚠️ [CAMERA] Gagal menyimpan arsip {path}: {exc}")
+        finally:
+            _save_queue.task_done()
+
+
+def save_capture_async(
+    frame: Optional[np.ndarray] = None,
+    data: Optional[bytes] = None,
+    prefix: str = "scan",
+    extension: str = "jpg",
+) -> Optional[str]:
+    """
+    Jadwalkan penyimpanan arsip gambar di background dengan nama unik.
+    `data` (bytes ter-encode) ditulis apa adanya tanpa encode ulang; jika tidak ada,
+    `frame` di-encode JPEG oleh worker. Return path yang akan ditulis, atau None jika
+    penyimpanan dimatikan / antrean penuh.
+    """
+    global _save_thread
+    if not SAVE_CAPTURES or (frame is None and data is None):
+        return None
+
+    if _save_thread is None:
+        with _save_thread_lock:
+            if _save_thread is None:
+                _save_thread = threading.Thread(target=_save_worker, name="capture-saver", daemon=True)
+                _save_thread.start()
+
+    path = _unique_capture_path(prefix, extension)
+    try:
+        _save_queue.put_nowait((path, frame, data))
+    except queue.Full:
+        print("⚠️ [CAMERA] Antrean simpan gambar penuh, arsip dilewati.")
+        return None
+    return path
+
+
+def take_picture() -> Optional[str]:
+    """
+    Ambil 1 frame lewat capture_frame() (dari capture service persisten, atau
+    buka-tutup webcam jika CAMERA_PERSISTENT nonaktif) lalu simpan ke CAPTURE_FOLDER.
+    Return: Path file gambar (String) atau None jika gagal.
+    Untuk alur scan gunakan capture_frame() agar tidak perlu round-trip ke disk.
+    """
+    frame = capture_frame()
+    if frame is None:
+        return None
+
+    _ensure_capture_folder()
+    filename = _unique_capture_path("scan")
+    cv2.imwrite(filename, frame)
+    print(f"✅ [CAMERA] Gambar tersimpan di: {filename}")
+    return filename
+
+
 # Untuk tes manual
 if __name__ == "__main__":
     take_picture()
@@ -0,0 +1,28 @@
+import hashlib
+import json
+import os
+import re
+import unicodedata
+
+import ttl_cache
+
+CHAT_CACHE_TTL_SECONDS = float(os.environ.get("CHAT_CACHE_TTL_SECONDS", "600"))
+CHAT_CACHE_MAX_ENTRIES = int(os.environ.get("CHAT_CACHE_MAX_ENTRIES", "256"))
+
+
+def normalize_question(question: str) -> str:
+    """
+    Bentuk kanonik pertanyaan untuk kunci cache: hanya huruf besar/kecil,
+    tanda baca dan spasi yang diseragamkan. Kata-katanya tidak diubah, karena
+    "berapa poin saya" dan "berapa poin" bisa berbeda maksud.
+    """
+    text = unicodedata.normalize("NFKC", question or "").lower()
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+
+def stats_version(stats: dict) -> str:
+    """Digest ringkasan statistik; jawaban lama otomatis tidak dipakai saat data berubah."""
+    return hashlib.sha1(json.dumps(stats, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:12]
+
+
+answer_cache = ttl_cache.TTLCache(CHAT_CACHE_MAX_ENTRIES, CHAT_CACHE_TTL_SECONDS)
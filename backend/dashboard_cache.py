@@ -0,0 +1,185 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+DASHBOARD_CACHE_TTL_SECONDS = float(os.environ.get("DASHBOARD_CACHE_TTL_SECONDS", "60"))
+RECENT_LOGS_LIMIT = 20
+LEADERBOARD_LIMIT = 5
+LOCATION_CHART_LIMIT = 5
+SCAN_TYPES = ("KERTAS", "ANORGANIK")
+USER_FIELDS = ("id", "rfid_uid", "name", "role", "prodi", "saldo")
+# Versi snapshot mulai dari 0 lagi setiap restart, jadi ETag diberi penanda proses
+_INSTANCE_TAG = uuid.uuid4().hex[:8]
+
+
+def is_scan_log(trash_type: str) -> bool:
+    """Log scan sampah asli, bukan login/logout role."""
+    trash_type = trash_type or ""
+    return "LOGOUT" not in trash_type and not trash_type.startswith("ROLE_")
+
+
+class DashboardSnapshot:
+    """
+    Cache snapshot dashboard di memori. Dimuat penuh dari database lewat `loader`
+    (saat pertama kali, saat TTL habis, atau setelah invalidate), dan diperbarui
+    langsung oleh route yang menulis (log baru, perubahan saldo/user) sehingga
+    polling berikutnya tidak perlu menyentuh database.
+
+    `loader()` harus mengembalikan dict: users (urut nama), recent_logs,
+    location_counts ({lokasi: jumlah}), type_counts ({trash_type: jumlah}),
+    dan opsional last_scan (log scan terakhir, dari query event_kind = 'scan').
+    """
+
+    def __init__(self, loader: Callable[[], dict], ttl_seconds: float = DASHBOARD_CACHE_TTL_SECONDS, rank_index=None):
+        self.loader = loader
+        # Opsional (rank_index.RankIndex): leaderboard diambil dari index, bukan sort semua user
+        self.rank_index = rank_index
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        self._state = None
+        self._loaded_at = 0.0
+        self._version = 0
+        self._rendered = None  # (versi, payload) agar sort tidak diulang tiap request
+        self._stats = {"hits": 0, "reloads": 0, "incremental_updates": 0}
+
+    # --- baca ---
+
+    def _expired(self) -> bool:
+        return self._state is None or time.monotonic() - self._loaded_at > self.ttl_seconds
+
+    def _reload(self) -> None:
+        # Satu thread saja yang query ke database; thread lain menunggu hasilnya
+        with self._load_lock:
+            with self._lock:
+                if not self._expired():
+                    return
+            state = self.loader()
+            if self.rank_index is not None:
+                self.rank_index.replace((row["id"], row["saldo"]) for row in state["users"])
+            with self._lock:
+                self._state = {
+                    "users": {row["id"]: _pick_user(row) for row in state["users"]},
+                    "recent_logs": list(state["recent_logs"])[:RECENT_LOGS_LIMIT],
+                    "last_scan": state.get("last_scan"),
+                    "location_counts": dict(state["location_counts"]),
+                    "type_counts": dict(state["type_counts"]),
+                }
+                if "last_scan" not in state:
+                    # Loader lama: cari di recent_logs (bisa None jika 20 log terakhir login/logout role)
+                    self._state["last_scan"] = next(
+                        (log for log in self._state["recent_logs"] if is_scan_log(log.get("trash_type"))),
+                        None,
+                    )
+                self._loaded_at = time.monotonic()
+                self._version += 1
+                self._stats["reloads"] += 1
+
+    def get(self) -> tuple:
+        """Return (payload_dict, version). Payload berisi stats, leaderboard, users, recent_logs, last_scan."""
+        while True:
+            if self._expired():
+                self._reload()
+            with self._lock:
+                if self._state is None:
+                    continue
+                self._stats["hits"] += 1
+                if self._rendered is None or self._rendered[0] != self._version:
+                    self._rendered = (self._version, self._render())
+                version, payload = self._rendered
+                # Salinan dangkal: dict user/log di dalamnya tidak pernah dimutasi, hanya diganti
+                return dict(payload), version
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def _render(self) -> dict:
+        state = self._state
+        users = sorted(state["users"].values(), key=lambda u: ((u.get("name") or ""), u["id"]))
+        if self.rank_index is not None:
+            leaderboard = [
+                state["users"][user_id]
+                for user_id, _saldo in self.rank_index.top(LEADERBOARD_LIMIT)
+                if user_id in state["users"]
+            ]
+        else:
+            leaderboard = sorted(state["users"].values(), key=lambda u: (-(u.get("saldo") or 0), u["id"]))[
+                :LEADERBOARD_LIMIT
+            ]
+        locations = sorted(state["location_counts"].items(), key=lambda item: -item[1])[:LOCATION_CHART_LIMIT]
+        type_counts = state["type_counts"]
+        return {
+            "stats": {
+                "total_logs": sum(type_counts.get(t, 0) for t in SCAN_TYPES),
+                "kertas": type_counts.get("KERTAS", 0),
+                "anorganik": type_counts.get("ANORGANIK", 0),
+                "location_chart": [{"location": loc, "count": cnt} for loc, cnt in locations],
+            },
+            "leaderboard": leaderboard,
+            "users": users,
+            "recent_logs": list(state["recent_logs"]),
+            "last_scan": state["last_scan"],
+        }
+
+    # --- update inkremental ---
+
+    def apply_log(self, log: dict) -> None:
+        with self._lock:
+            if self._state is None:
+                return
+            state = self._state
+            state["recent_logs"].insert(0, log)
+            del state["recent_logs"][RECENT_LOGS_LIMIT:]
+            trash_type = log.get("trash_type")
+            if is_scan_log(trash_type):
+                state["last_scan"] = log
+            if trash_type in SCAN_TYPES:
+                state["type_counts"][trash_type] = state["type_counts"].get(trash_type, 0) + 1
+                location = log.get("location_ip") or "Tidak Diketahui"
+                state["location_counts"][location] = state["location_counts"].get(location, 0) + 1
+            self._bump()
+
+    def apply_user(self, user: dict) -> None:
+        """Tambah/perbarui satu user (mis. saldo baru atau registrasi)."""
+        with self._lock:
+            if self._state is None:
+                return
+            current = self._state["users"].get(user["id"], {})
+            merged = dict(current)
+            merged.update({key: user[key] for key in USER_FIELDS if key in user})
+            self._state["users"][user["id"]] = _pick_user(merged)
+            self._bump()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded_at = 0.0
+            self._state = None
+            self._version += 1
+
+    def _bump(self) -> None:
+        self._version += 1
+        self._stats["incremental_updates"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "version": self._version,
+                "loaded": self._state is not None,
+                "age_seconds": round(time.monotonic() - self._loaded_at, 3) if self._state else None,
+                "ttl_seconds": self.ttl_seconds,
+                **self._stats,
+            }
+
+
+def _pick_user(row: dict) -> dict:
+    return {key: row.get(key) for key in USER_FIELDS}
+
+
+def make_etag(version: int, *live_parts: Optional[object]) -> str:
+    """Tag ETag (tanpa kutip) dari versi snapshot + bagian payload yang tidak di-cache."""
+    digest = hashlib.sha1(repr((_INSTANCE_TAG, version) + live_parts).encode("utf-8")).hexdigest()[:16]
+    return f"dash-{digest}"
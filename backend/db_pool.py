@@ -0,0 +1,251 @@
+import collections
+import os
+import threading
+import time
+
+import mysql.connector
+from mysql.connector import errors
+
+DB_CONFIG = {
+    "host": os.environ.get("MYSQL_HOST", "127.0.0.1"),
+    "port": int(os.environ.get("MYSQL_PORT", "3306")),
+    "user": os.environ.get("MYSQL_USER", "root"),
+    "password": os.environ.get("MYSQL_PASSWORD", ""),
+    "database": os.environ.get("MYSQL_DATABASE", "ecosmart"),
+}
+
+# Ukuran pool tetap + koneksi overflow sementara saat beban puncak
+POOL_SIZE = int(os.environ.get("MYSQL_POOL_SIZE", "10"))
+POOL_MAX_OVERFLOW = int(os.environ.get("MYSQL_POOL_MAX_OVERFLOW", "10"))
+# Koneksi lebih tua dari ini ditutup & dibuat ulang (hindari wait_timeout MySQL)
+POOL_RECYCLE_SECONDS = int(os.environ.get("MYSQL_POOL_RECYCLE", "1800"))
+# Batas waktu menunggu koneksi kosong sebelum menyerah
+POOL_TIMEOUT_SECONDS = float(os.environ.get("MYSQL_POOL_TIMEOUT", "10"))
+# Koneksi yang idle lebih lama dari ini di-ping dulu sebelum dipinjamkan
+POOL_PING_AFTER_SECONDS = float(os.environ.get("MYSQL_POOL_PING_AFTER", "30"))
+
+
+class PooledConnection:
+    """
+    Pembungkus koneksi MySQL dari pool. Semua atribut diteruskan ke koneksi asli,
+    kecuali close() yang mengembalikan koneksi ke pool (bukan menutup socket).
+    """
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._checked_out_at = time.monotonic()
+
+    def __getattr__(self, name):
+        raw = self.__dict__.get("_raw")
+        if raw is None:
+            raise errors.InterfaceError("Koneksi sudah dikembalikan ke pool")
+        return getattr(raw, name)
+
+    def close(self):
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool._release(raw, self._created_at, self._checked_out_at)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        config: dict,
+        size: int = POOL_SIZE,
+        max_overflow: int = POOL_MAX_OVERFLOW,
+        recycle_seconds: int = POOL_RECYCLE_SECONDS,
+        timeout_seconds: float = POOL_TIMEOUT_SECONDS,
+        ping_after_seconds: float = POOL_PING_AFTER_SECONDS,
+    ):
+        self.config = dict(config)
+        self.size = max(1, size)
+        self.max_overflow = max(0, max_overflow)
+        self.recycle_seconds = recycle_seconds
+        self.timeout_seconds = timeout_seconds
+        self.ping_after_seconds = ping_after_seconds
+
+        # Item idle: (koneksi, waktu dibuat, waktu terakhir dikembalikan)
+        self._idle = collections.deque()
+        self._cond = threading.Condition()
+        self._open = 0
+        self._in_use = 0
+        self._metrics = {
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "created": 0,
+            "recycled": 0,
+            "health_check_failures": 0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+            "checkout_ms_total": 0.0,
+            "checkout_ms_max": 0.0,
+        }
+
+    def _connect(self):
+        raw = mysql.connector.connect(**self.config)
+        with self._cond:
+            self._metrics["created"] += 1
+        return raw
+
+    def _discard(self, raw) -> None:
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, raw, created_at: float, idle_since: float) -> bool:
+        now = time.monotonic()
+        if self.recycle_seconds > 0 and now - created_at > self.recycle_seconds:
+            with self._cond:
+                self._metrics["recycled"] += 1
+            return False
+        if now - idle_since < self.ping_after_seconds:
+            return True
+        try:
+            raw.ping(reconnect=False)
+            return True
+        except Exception:
+            with self._cond:
+                self._metrics["health_check_failures"] += 1
+            return False
+
+    def get_connection(self) -> PooledConnection:
+        started = time.monotonic()
+        deadline = started + self.timeout_seconds
+        waited = False
+
+        while True:
+            idle_item = None
+            may_create = False
+            with self._cond:
+                while not self._idle and self._open >= self.size + self.max_overflow:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._metrics["timeouts"] += 1
+                        raise errors.PoolError(
+                            f"Pool koneksi MySQL habis setelah menunggu {self.timeout_seconds:.1f} detik"
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+                if self._idle:
+                    idle_item = self._idle.pop()
+                else:
+                    self._open += 1
+                    may_create = True
+
+            if idle_item is not None:
+                raw, created_at, idle_since = idle_item
+                if not self._is_healthy(raw, created_at, idle_since):
+                    self._discard(raw)
+                    with self._cond:
+                        self._open -= 1
+                        self._cond.notify()
+                    continue
+            else:
+                try:
+                    raw = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._open -= 1
+                        self._cond.notify()
+                    raise
+                created_at = time.monotonic()
+
+            wait_ms = (time.monotonic() - started) * 1000.0
+            with self._cond:
+                self._in_use += 1
+                self._metrics["checkouts"] += 1
+                if waited:
+                    self._metrics["waits"] += 1
+                self._metrics["wait_ms_total"] += wait_ms
+                self._metrics["wait_ms_max"] = max(self._metrics["wait_ms_max"], wait_ms)
+            return PooledConnection(self, raw, created_at)
+
+    def _release(self, raw, created_at: float, checked_out_at: float) -> None:
+        checkout_ms = (time.monotonic() - checked_out_at) * 1000.0
+        reusable = True
+        try:
+            if raw.in_transaction:
+                raw.rollback()
+        except Exception:
+            reusable = False
+
+        with self._cond:
+            self._in_use -= 1
+            self._metrics["checkout_ms_total"] += checkout_ms
+            self._metrics["checkout_ms_max"] = max(self._metrics["checkout_ms_max"], checkout_ms)
+            # Koneksi overflow langsung ditutup agar pool kembali ke ukuran normal
+            if reusable and len(self._idle) + self._in_use < self.size:
+                self._idle.append((raw, created_at, time.monotonic()))
+                raw = None
+            else:
+                self._open -= 1
+            self._cond.notify()
+
+        if raw is not None:
+            self._discard(raw)
+
+    def close_all(self) -> None:
+        with self._cond:
+            idle, self._idle = list(self._idle), collections.deque()
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for raw, _, _ in idle:
+            self._discard(raw)
+
+    def stats(self) -> dict:
+        with self._cond:
+            metrics = dict(self._metrics)
+            checkouts = metrics["checkouts"] or 1
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "recycle_seconds": self.recycle_seconds,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "checkouts": metrics["checkouts"],
+                "waits": metrics["waits"],
+                "timeouts": metrics["timeouts"],
+                "created": metrics["created"],
+                "recycled": metrics["recycled"],
+                "health_check_failures": metrics["health_check_failures"],
+                "wait_ms_avg": round(metrics["wait_ms_total"] / checkouts, 3),
+                "wait_ms_max": round(metrics["wait_ms_max"], 3),
+                "checkout_ms_avg": round(metrics["checkout_ms_total"] / checkouts, 3),
+                "checkout_ms_max": round(metrics["checkout_ms_max"], 3),
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_CONFIG)
+                print(
+                    f"✅ [DB] Pool MySQL siap (size={_pool.size}, "
+                    f"overflow={_pool.max_overflow}, recycle={_pool.recycle_seconds}s)"
+                )
+    return _pool
+
+
+def get_connection() -> PooledConnection:
+    return get_pool().get_connection()
+
+
+def pool_stats() -> dict:
+    return get_pool().stats()
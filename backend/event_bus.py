@@ -0,0 +1,109 @@
+import json
+import queue
+import threading
+import time
+from typing import Iterable, Iterator, Optional
+
+TOPICS = ("session", "bin", "logs")
+HEARTBEAT_SECONDS = 15.0
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class Subscription:
+    def __init__(self, bus, topics: Iterable[str], scope: Optional[str] = None):
+        self.bus = bus
+        self.topics = frozenset(topics)
+        # Event ber-scope (mis. session per kiosk) hanya dikirim ke subscriber dengan scope sama
+        self.scope = scope
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.dropped = 0
+
+    def deliver(self, message: str) -> None:
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            # Klien terlalu lambat: buang event tertua, state terbaru tetap sampai
+            self.dropped += 1
+            try:
+                self.queue.get_nowait()
+                self.queue.put_nowait(message)
+            except (queue.Empty, queue.Full):
+                pass
+
+    def accepts(self, topic: str, scope: Optional[str]) -> bool:
+        return topic in self.topics and (scope is None or self.scope is None or scope == self.scope)
+
+    def close(self) -> None:
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """
+    Pub/sub in-process untuk Server-Sent Events. Setiap subscriber punya antrean
+    sendiri dan hanya menerima topik yang diminta; event terakhir per topik
+    disimpan (per scope) agar klien baru langsung dapat state terkini.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._last_event = {}
+        self._event_id = 0
+
+    def subscribe(self, topics: Iterable[str], scope: Optional[str] = None) -> Subscription:
+        subscription = Subscription(self, [topic for topic in topics if topic in TOPICS] or TOPICS, scope)
+        with self._lock:
+            self._subscribers.add(subscription)
+            replay = [
+                message for (topic, event_scope), message in self._last_event.items()
+                if topic != "logs" and subscription.accepts(topic, event_scope)
+            ]
+        for message in replay:
+            subscription.deliver(message)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, topic: str, data: dict, scope: Optional[str] = None) -> None:
+        with self._lock:
+            self._event_id += 1
+            message = format_sse(topic, data, self._event_id)
+            self._last_event[(topic, scope)] = message
+            targets = [sub for sub in self._subscribers if sub.accepts(topic, scope)]
+        for subscription in targets:
+            subscription.deliver(message)
+
+    def stream(self, subscription: Subscription, heartbeat_seconds: float = HEARTBEAT_SECONDS) -> Iterator[str]:
+        """Generator body SSE: kirim event saat ada, komentar heartbeat saat idle."""
+        try:
+            yield f"retry: 3000\n: connected {time.time():.0f}\n\n"
+            while True:
+                try:
+                    yield subscription.queue.get(timeout=heartbeat_seconds)
+                except queue.Empty:
+                    yield f": heartbeat {time.time():.0f}\n\n"
+        finally:
+            subscription.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            per_topic = {topic: 0 for topic in TOPICS}
+            for subscription in self._subscribers:
+                for topic in subscription.topics:
+                    per_topic[topic] += 1
+            return {
+                "subscribers": len(self._subscribers),
+                "per_topic": per_topic,
+                "last_event_id": self._event_id,
+            }
+
+
+def format_sse(topic: str, data: dict, event_id: Optional[int] = None) -> str:
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {topic}\ndata: {payload}\n\n"
+
+
+bus = EventBus()
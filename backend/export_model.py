@@ -0,0 +1,256 @@
+"""
+Export model Keras (.h5) ke TFLite/ONNX untuk runtime inference yang lebih
+ringan, dengan kuantisasi INT8 opsional (post-training, dikalibrasi dari
+folder gambar lokal), plus cek paritas akurasi dan benchmark latensi.
+
+    python export_model.py tflite [--int8 --calib-dir DIR]
+    python export_model.py onnx   [--int8 --calib-dir DIR]
+    python export_model.py parity --images DIR [--min-agreement 0.98]
+    python export_model.py bench  [--runs 50]
+
+Butuh TensorFlow (export), tf2onnx + onnxruntime (ONNX). Kiosk yang hanya
+menjalankan model hasil export cukup memasang tflite-runtime atau onnxruntime.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+import inference_runtime
+import preprocessing
+import trash_classifier
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+DEFAULT_CALIB_SAMPLES = 200
+BENCH_WARMUP_RUNS = 3
+
+
+def list_images(folder: str, limit: int = 0, seed: int = 0) -> list:
+    """Gambar di folder (rekursif, mis. satu subfolder per kelas), diacak deterministik."""
+    paths = []
+    for root, _dirs, files in os.walk(folder):
+        paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(IMAGE_EXTENSIONS))
+    paths.sort()
+    random.Random(seed).shuffle(paths)
+    return paths[:limit] if limit else paths
+
+
+def load_inputs(paths: list) -> list:
+    """[(path, input (H, W, 3) float32)] dengan preprocessing yang sama persis dengan server."""
+    inputs = []
+    for path in paths:
+        img = preprocessing.read(path)
+        if img is None:
+            print(f"⚠️ [EXPORT] Gambar dilewati (tidak terbaca): {path}")
+            continue
+        inputs.append((path, preprocessing.prepare(img)))
+    return inputs
+
+
+def _calibration_inputs(calib_dir: str, samples: int) -> list:
+    if not calib_dir:
+        raise SystemExit("❌ --int8 membutuhkan --calib-dir berisi contoh gambar sampah")
+    inputs = [array for _path, array in load_inputs(list_images(calib_dir, samples))]
+    if not inputs:
+        raise SystemExit(f"❌ Tidak ada gambar kalibrasi di {calib_dir}")
+    print(f"📊 [EXPORT] Kalibrasi INT8 dengan {len(inputs)} gambar")
+    return inputs
+
+
+def _load_keras():
+    import tensorflow as tf
+
+    return tf.keras.models.load_model(trash_classifier.MODEL_PATH)
+
+
+def export_tflite(output: str, int8: bool, calib_dir: str, samples: int) -> str:
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(_load_keras())
+    if int8:
+        calibration = _calibration_inputs(calib_dir, samples)
+
+        def representative_dataset():
+            for array in calibration:
+                yield [array[np.newaxis, ...]]
+
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        # Full-integer: semua operator INT8; input/output tetap float32 agar server tidak berubah
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    with open(output, "wb") as handle:
+        handle.write(converter.convert())
+    return output
+
+
+def export_onnx(output: str, int8: bool, calib_dir: str, samples: int, opset: int) -> str:
+    import tensorflow as tf
+    import tf2onnx
+
+    height, width = trash_classifier.IMG_SIZE[1], trash_classifier.IMG_SIZE[0]
+    signature = (tf.TensorSpec((None, height, width, 3), tf.float32, name="input"),)
+    fp32_output = output if not int8 else output + ".fp32.tmp"
+    tf2onnx.convert.from_keras(_load_keras(), input_signature=signature, opset=opset, output_path=fp32_output)
+    if not int8:
+        return output
+
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    calibration = _calibration_inputs(calib_dir, samples)
+
+    class _Reader(CalibrationDataReader):
+        def __init__(self):
+            self._items = iter(calibration)
+
+        def get_next(self):
+            array = next(self._items, None)
+            return None if array is None else {"input": array[np.newaxis, ...]}
+
+    try:
+        quantize_static(
+            fp32_output,
+            output,
+            _Reader(),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+        )
+    finally:
+        os.remove(fp32_output)
+    return output
+
+
+def _exported_runtimes(paths: list) -> list:
+    if not paths:
+        paths = [path for name, path in inference_runtime.candidates("auto") if name != "keras"]
+    runtimes = []
+    for path in paths:
+        try:
+            runtimes.append(inference_runtime.load_runtime(inference_runtime.backend_for_path(path), path))
+        except Exception as exc:
+            print(f"⚠️ [EXPORT] {path} dilewati: {exc}")
+    return runtimes
+
+
+def _predict_one(runtime, array: np.ndarray) -> tuple:
+    started = time.perf_counter()
+    raw = np.squeeze(runtime.predict_batch(array[np.newaxis, ...]))
+    return raw, (time.perf_counter() - started) * 1000
+
+
+def parity(images_dir: str, model_paths: list, limit: int, min_agreement: float) -> bool:
+    """Bandingkan label & skor tiap model hasil export dengan .h5 asli pada gambar yang sama."""
+    inputs = load_inputs(list_images(images_dir, limit))
+    if not inputs:
+        raise SystemExit(f"❌ Tidak ada gambar di {images_dir}")
+    runtimes = _exported_runtimes(model_paths)
+    if not runtimes:
+        raise SystemExit("❌ Belum ada model hasil export (jalankan `python export_model.py tflite/onnx`)")
+
+    reference = inference_runtime.load_runtime("keras", trash_classifier.MODEL_PATH)
+    expected = []
+    reference_ms = []
+    for _path, array in inputs:
+        raw, elapsed = _predict_one(reference, array)
+        expected.append((raw, trash_classifier.interpret(raw)))
+        reference_ms.append(elapsed)
+    print(f"📏 [PARITY] {len(inputs)} gambar, referensi keras {np.mean(reference_ms):.1f} ms/gambar")
+
+    passed = True
+    for runtime in runtimes:
+        agree = 0
+        diffs = []
+        latencies = []
+        mismatches = []
+        for (path, array), (expected_raw, expected_result) in zip(inputs, expected):
+            raw, elapsed = _predict_one(runtime, array)
+            latencies.append(elapsed)
+            diffs.append(float(np.max(np.abs(np.asarray(raw, dtype="float32") - expected_raw))))
+            label, _confidence = trash_classifier.interpret(raw)
+            if label == expected_result[0]:
+                agree += 1
+            else:
+                mismatches.append(os.path.basename(path))
+        agreement = agree / len(inputs)
+        ok = agreement >= min_agreement
+        passed = passed and ok
+        print(
+            f"{'✅' if ok else '❌'} [PARITY] {runtime.name} ({os.path.basename(runtime.path)}): "
+            f"label sama {agreement:.1%}, selisih skor maks {max(diffs):.4f} / rata-rata {np.mean(diffs):.4f}, "
+            f"{np.mean(latencies):.1f} ms/gambar"
+        )
+        if mismatches:
+            print(f"   Beda label: {', '.join(mismatches[:10])}{' ...' if len(mismatches) > 10 else ''}")
+    return passed
+
+
+def bench(runs: int, batch_size: int) -> None:
+    """Latensi forward pass tiap model yang tersedia (input acak, tanpa preprocessing)."""
+    height, width = trash_classifier.IMG_SIZE[1], trash_classifier.IMG_SIZE[0]
+    batch = np.random.default_rng(0).random((batch_size, height, width, 3), dtype=np.float32)
+    for name, path in inference_runtime.candidates("auto"):
+        try:
+            runtime = inference_runtime.load_runtime(name, path)
+        except Exception as exc:
+            print(f"⚠️ [BENCH] {name} ({os.path.basename(path)}) dilewati: {exc}")
+            continue
+        for _ in range(BENCH_WARMUP_RUNS):
+            runtime.predict_batch(batch)
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            runtime.predict_batch(batch)
+            timings.append((time.perf_counter() - started) * 1000)
+        print(
+            f"⏱️ [BENCH] {name:6s} {os.path.basename(path):40s} batch {batch_size}: "
+            f"p50 {np.percentile(timings, 50):.1f} ms, p95 {np.percentile(timings, 95):.1f} ms, "
+            f"ukuran {os.path.getsize(path) / 1e6:.1f} MB"
+        )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Export & validasi model klasifikasi sampah")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for name in ("tflite", "onnx"):
+        command = commands.add_parser(name, help=f"Export .h5 ke {name.upper()}")
+        command.add_argument("--int8", action="store_true", help="Kuantisasi INT8 post-training")
+        command.add_argument("--calib-dir", help="Folder gambar untuk kalibrasi INT8")
+        command.add_argument("--calib-samples", type=int, default=DEFAULT_CALIB_SAMPLES)
+        command.add_argument("--output", help="Path hasil (default: path yang dicari runtime)")
+        if name == "onnx":
+            command.add_argument("--opset", type=int, default=13)
+
+    command = commands.add_parser("parity", help="Bandingkan model hasil export dengan .h5")
+    command.add_argument("--images", required=True, help="Folder gambar uji")
+    command.add_argument("--model", action="append", default=[], help="Model tertentu (boleh berulang)")
+    command.add_argument("--limit", type=int, default=0)
+    command.add_argument("--min-agreement", type=float, default=0.98)
+
+    command = commands.add_parser("bench", help="Latensi forward pass tiap model yang tersedia")
+    command.add_argument("--runs", type=int, default=50)
+    command.add_argument("--batch", type=int, default=1)
+
+    args = parser.parse_args(argv)
+    if args.command == "tflite":
+        default = inference_runtime.TFLITE_INT8_MODEL_PATH if args.int8 else inference_runtime.TFLITE_MODEL_PATH
+        path = export_tflite(args.output or default, args.int8, args.calib_dir, args.calib_samples)
+    elif args.command == "onnx":
+        default = inference_runtime.ONNX_INT8_MODEL_PATH if args.int8 else inference_runtime.ONNX_MODEL_PATH
+        path = export_onnx(args.output or default, args.int8, args.calib_dir, args.calib_samples, args.opset)
+    elif args.command == "parity":
+        return 0 if parity(args.images, args.model, args.limit, args.min_agreement) else 1
+    else:
+        bench(args.runs, args.batch)
+        return 0
+    print(f"✅ [EXPORT] {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+    print("   Cek akurasi: python export_model.py parity --images <folder gambar uji>")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, List
+
+
+class _PendingRequest:
+    __slots__ = ("item", "result", "error", "done", "enqueued_at")
+
+    def __init__(self, item: Any):
+        self.item = item
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        self.enqueued_at = time.monotonic()
+
+
+class MicroBatcher:
+    """
+    Worker in-process yang mengumpulkan request bersamaan menjadi micro-batch.
+    Request pertama membuka jendela tunggu max_wait_ms; semua request yang masuk
+    dalam jendela itu (maks max_batch_size) diproses dengan satu panggilan batch_fn,
+    lalu hasilnya dikembalikan ke masing-masing pemanggil sesuai urutan.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+        name: str = "batcher",
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_seconds = max(0.0, max_wait_ms) / 1000.0
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "processed": 0,
+            "batches": 0,
+            "errors": 0,
+            "max_batch_size_seen": 0,
+            "max_queue_depth": 0,
+            "queue_wait_ms_total": 0.0,
+            "batch_ms_total": 0.0,
+        }
+        self._batch_size_histogram = {}
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f"{self.name}-worker", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, item: Any, timeout: float = None) -> Any:
+        """Kirim satu item dan tunggu hasilnya (blocking)."""
+        self._ensure_started()
+        pending = _PendingRequest(item)
+        self._queue.put(pending)
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            self._stats["requests"] += 1
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], depth)
+
+        if not pending.done.wait(timeout):
+            raise TimeoutError(f"[{self.name}] Hasil inferensi tidak kembali dalam {timeout} detik")
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _collect_batch(self) -> List[_PendingRequest]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_seconds
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect_batch()
+            started = time.monotonic()
+            try:
+                results = self.batch_fn([pending.item for pending in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(
+                        f"batch_fn mengembalikan {len(results)} hasil untuk {len(batch)} input"
+                    )
+                for pending, result in zip(batch, results):
+                    pending.result = result
+            except Exception as exc:
+                print(f"❌ [{self.name}] Batch gagal ({len(batch)} request): {exc}")
+                for pending in batch:
+                    pending.error = exc
+                with self._stats_lock:
+                    self._stats["errors"] += 1
+            finally:
+                finished = time.monotonic()
+                with self._stats_lock:
+                    size = len(batch)
+                    self._stats["batches"] += 1
+                    self._stats["processed"] += size
+                    self._stats["max_batch_size_seen"] = max(self._stats["max_batch_size_seen"], size)
+                    self._stats["batch_ms_total"] += (finished - started) * 1000.0
+                    self._stats["queue_wait_ms_total"] += sum(
+                        (started - pending.enqueued_at) * 1000.0 for pending in batch
+                    )
+                    self._batch_size_histogram[size] = self._batch_size_histogram.get(size, 0) + 1
+                for pending in batch:
+                    pending.done.set()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+            histogram = dict(sorted(self._batch_size_histogram.items()))
+        batches = stats["batches"] or 1
+        processed = stats["processed"] or 1
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_seconds * 1000.0,
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": stats["max_queue_depth"],
+            "requests": stats["requests"],
+            "batches": stats["batches"],
+            "errors": stats["errors"],
+            "avg_batch_size": round(stats["processed"] / batches, 3) if stats["batches"] else 0.0,
+            "max_batch_size_seen": stats["max_batch_size_seen"],
+            "batch_size_histogram": histogram,
+            "avg_queue_wait_ms": round(stats["queue_wait_ms_total"] / processed, 3),
+            "avg_batch_ms": round(stats["batch_ms_total"] / batches, 3),
+        }
@@ -0,0 +1,187 @@
+"""
+Runtime inference yang bisa dipilih untuk trash_classifier: Keras (.h5),
+TFLite (.tflite, fp32 atau INT8) dan ONNX Runtime (.onnx, fp32 atau INT8).
+
+File model hasil export (lihat export_model.py) diletakkan di samping .h5.
+INFERENCE_BACKEND=auto memakai kandidat pertama yang file-nya ada dan
+library-nya terpasang, dengan urutan CANDIDATES. Urutan itu mengikuti
+kecepatan & memori di host kiosk: INT8 lebih dulu, Keras (import TensorFlow
+penuh) paling akhir. Bandingkan sendiri dengan `python export_model.py bench`.
+"""
+import abc
+import os
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+MODELS_DIR = "models"
+MODEL_BASENAME = "model_sampah_csv_custom"
+KERAS_MODEL_PATH = os.path.join(MODELS_DIR, f"{MODEL_BASENAME}.h5")
+TFLITE_MODEL_PATH = os.environ.get("TFLITE_MODEL_PATH", os.path.join(MODELS_DIR, f"{MODEL_BASENAME}.tflite"))
+TFLITE_INT8_MODEL_PATH = os.environ.get(
+    "TFLITE_INT8_MODEL_PATH", os.path.join(MODELS_DIR, f"{MODEL_BASENAME}_int8.tflite")
+)
+ONNX_MODEL_PATH = os.environ.get("ONNX_MODEL_PATH", os.path.join(MODELS_DIR, f"{MODEL_BASENAME}.onnx"))
+ONNX_INT8_MODEL_PATH = os.environ.get("ONNX_INT8_MODEL_PATH", os.path.join(MODELS_DIR, f"{MODEL_BASENAME}_int8.onnx"))
+
+# auto | keras | tflite | onnx
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "auto").lower()
+# 0 = biarkan runtime memilih jumlah thread sendiri
+INFERENCE_THREADS = int(os.environ.get("INFERENCE_THREADS", "0"))
+
+CANDIDATES = [
+    ("tflite", TFLITE_INT8_MODEL_PATH),
+    ("onnx", ONNX_INT8_MODEL_PATH),
+    ("onnx", ONNX_MODEL_PATH),
+    ("tflite", TFLITE_MODEL_PATH),
+    ("keras", KERAS_MODEL_PATH),
+]
+
+
+class Runtime(abc.ABC):
+    """Satu model yang sudah dimuat. predict_batch menerima (N, H, W, 3) float32 dalam rentang 0..1."""
+
+    name = "base"
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @abc.abstractmethod
+    def predict_batch(self, batch: np.ndarray) -> np.ndarray:
+        ...
+
+    def describe(self) -> dict:
+        return {"backend": self.name, "model": os.path.basename(self.path)}
+
+
+class KerasRuntime(Runtime):
+    name = "keras"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        import tensorflow as tf
+
+        self._model = tf.keras.models.load_model(path)
+
+    def predict_batch(self, batch: np.ndarray) -> np.ndarray:
+        return np.asarray(self._model.predict_on_batch(batch))
+
+
+def _load_tflite_interpreter(path: str):
+    """tflite_runtime (paket kecil, tanpa TensorFlow) jika ada, selain itu tf.lite."""
+    kwargs = {"model_path": path}
+    if INFERENCE_THREADS:
+        kwargs["num_threads"] = INFERENCE_THREADS
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+
+        Interpreter = tf.lite.Interpreter
+    return Interpreter(**kwargs)
+
+
+class TFLiteRuntime(Runtime):
+    name = "tflite"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._interpreter = _load_tflite_interpreter(path)
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._batch_size = int(self._input["shape"][0])
+        # Interpreter tidak thread-safe; batcher hanya punya satu worker, lock untuk pemanggil lain
+        self._lock = threading.Lock()
+
+    @property
+    def integer_io(self) -> bool:
+        return self._input["dtype"] in (np.int8, np.uint8)
+
+    def _resize(self, batch_size: int) -> None:
+        if batch_size == self._batch_size:
+            return
+        shape = list(self._input["shape"])
+        shape[0] = batch_size
+        self._interpreter.resize_tensor_input(self._input["index"], shape)
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._batch_size = batch_size
+
+    def predict_batch(self, batch: np.ndarray) -> np.ndarray:
+        with self._lock:
+            self._resize(len(batch))
+            data = batch
+            if self.integer_io:
+                # Model full-integer: kuantisasi input dengan skala hasil kalibrasi
+                scale, zero_point = self._input["quantization"]
+                info = np.iinfo(self._input["dtype"])
+                data = np.clip(np.round(batch / scale + zero_point), info.min, info.max)
+            self._interpreter.set_tensor(self._input["index"], data.astype(self._input["dtype"], copy=False))
+            self._interpreter.invoke()
+            output = self._interpreter.get_tensor(self._output["index"])
+            if self._output["dtype"] in (np.int8, np.uint8):
+                scale, zero_point = self._output["quantization"]
+                output = (output.astype("float32") - zero_point) * scale
+            return np.array(output)
+
+    def describe(self) -> dict:
+        return {**super().describe(), "integer_io": self.integer_io}
+
+
+class OnnxRuntime(Runtime):
+    name = "onnx"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if INFERENCE_THREADS:
+            options.intra_op_num_threads = INFERENCE_THREADS
+        self._session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+        self._input_name = self._session.get_inputs()[0].name
+
+    def predict_batch(self, batch: np.ndarray) -> np.ndarray:
+        return np.asarray(self._session.run(None, {self._input_name: batch.astype("float32", copy=False)})[0])
+
+
+RUNTIMES = {"keras": KerasRuntime, "tflite": TFLiteRuntime, "onnx": OnnxRuntime}
+
+
+def candidates(backend: str = INFERENCE_BACKEND) -> List[Tuple[str, str]]:
+    """(backend, path) yang file-nya ada, sesuai urutan prioritas."""
+    if backend != "auto" and backend not in RUNTIMES:
+        raise ValueError(f"INFERENCE_BACKEND tidak dikenal: {backend} (pilih: auto, {', '.join(RUNTIMES)})")
+    return [
+        (name, path)
+        for name, path in CANDIDATES
+        if (backend == "auto" or name == backend) and os.path.exists(path)
+    ]
+
+
+def backend_for_path(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower()
+    return {".h5": "keras", ".keras": "keras", ".tflite": "tflite", ".onnx": "onnx"}.get(extension, "keras")
+
+
+def load_runtime(backend: str = INFERENCE_BACKEND, path: Optional[str] = None) -> Runtime:
+    """
+    Muat runtime pertama yang berhasil. Kandidat yang library-nya belum
+    terpasang atau file-nya rusak dilewati dengan peringatan.
+    """
+    if path:
+        return RUNTIMES[backend if backend in RUNTIMES else backend_for_path(path)](path)
+    errors = []
+    for name, candidate_path in candidates(backend):
+        try:
+            runtime = RUNTIMES[name](candidate_path)
+        except Exception as exc:
+            print(f"⚠️ [AI] Runtime {name} ({os.path.basename(candidate_path)}) dilewati: {exc}")
+            errors.append(f"{name}: {exc}")
+            continue
+        print(f"✅ [AI] Runtime inference: {name} ({os.path.basename(candidate_path)})")
+        return runtime
+    raise RuntimeError("Tidak ada model yang bisa dimuat" + (f" ({'; '.join(errors)})" if errors else ""))
@@ -0,0 +1,332 @@
+"""
+Lapisan klien LLM untuk chatbot: setiap provider (Gemini, OpenAI, stub)
+dibungkus dengan timeout, semaphore konkurensi dan circuit breaker sendiri,
+lalu LLMClient menjalankan failover antar provider.
+
+Panggilan provider berjalan di thread pool terpisah sehingga worker Flask
+hanya menunggu sampai batas waktu, tidak ikut tertahan oleh provider yang
+lambat. Jika provider utama belum menjawab setelah LLM_HEDGE_AFTER_SECONDS,
+provider berikutnya ikut dipanggil (hedged request) dan jawaban pertama yang
+berhasil dipakai. Provider yang gagal berturut-turut diputus (circuit open)
+selama masa cooldown agar request berikutnya langsung ke cadangan.
+"""
+import abc
+import collections
+import concurrent.futures
+import os
+import queue
+import threading
+import time
+from typing import Iterator, List, Optional
+
+LLM_TIMEOUT_SECONDS = float(os.environ.get("LLM_TIMEOUT_SECONDS", "20"))
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "4"))
+LLM_HEDGE_AFTER_SECONDS = float(os.environ.get("LLM_HEDGE_AFTER_SECONDS", "4"))
+LLM_BREAKER_FAILURES = int(os.environ.get("LLM_BREAKER_FAILURES", "3"))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.environ.get("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+
+LLMResult = collections.namedtuple("LLMResult", "answer provider fallback latency_ms")
+StreamChunk = collections.namedtuple("StreamChunk", "provider text fallback")
+
+
+class LLMUnavailable(RuntimeError):
+    """Semua provider gagal, timeout, penuh atau circuit-nya sedang terbuka."""
+
+
+class CircuitBreaker:
+    """
+    closed -> open setelah N kegagalan beruntun -> half_open (satu percobaan)
+    setelah cooldown. Percobaan yang tidak melapor dalam cooldown_seconds
+    dianggap hilang dan percobaan baru diizinkan.
+    """
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES,
+                 cooldown_seconds: float = LLM_BREAKER_COOLDOWN_SECONDS):
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown_seconds = cooldown_seconds
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_started_at = 0.0
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == "open":
+                if time.monotonic() - self._opened_at < self.cooldown_seconds:
+                    return False
+                self._state = "half_open"
+                self._trial_started_at = time.monotonic()
+                return True
+            if self._state == "half_open":
+                # Percobaan sedang berjalan, request lain menunggu hasilnya (maksimal cooldown)
+                if time.monotonic() - self._trial_started_at < self.cooldown_seconds:
+                    return False
+                self._trial_started_at = time.monotonic()
+                return True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = "closed"
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == "half_open" or self._failures >= self.failure_threshold:
+                self._state = "open"
+                self._opened_at = time.monotonic()
+
+    def record_abandoned(self) -> None:
+        """Hasil panggilan diabaikan (kalah hedge / klien putus): percobaan half_open kembali ke open."""
+        with self._lock:
+            if self._state == "half_open":
+                self._state = "open"
+                self._opened_at = time.monotonic()
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+
+class Provider(abc.ABC):
+    """
+    Satu backend LLM. Subclass mengisi complete() dan (opsional) stream().
+    Timeout & konkurensi bisa diatur per provider lewat
+    LLM_<NAMA>_TIMEOUT_SECONDS dan LLM_<NAMA>_MAX_CONCURRENCY.
+    """
+
+    name = "base"
+
+    def __init__(self, timeout: Optional[float] = None, max_concurrency: Optional[int] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        prefix = f"LLM_{self.name.upper()}_"
+        self.timeout = timeout or float(os.environ.get(prefix + "TIMEOUT_SECONDS", LLM_TIMEOUT_SECONDS))
+        self.max_concurrency = max_concurrency or int(os.environ.get(prefix + "MAX_CONCURRENCY", LLM_MAX_CONCURRENCY))
+        self.semaphore = threading.BoundedSemaphore(self.max_concurrency)
+        self.breaker = breaker or CircuitBreaker()
+
+    def available(self) -> bool:
+        """False jika provider tidak dikonfigurasi (tanpa API key/model)."""
+        return True
+
+    @abc.abstractmethod
+    def complete(self, question: str, stats: dict) -> str:
+        ...
+
+    def stream(self, question: str, stats: dict) -> Iterator[str]:
+        yield self.complete(question, stats)
+
+
+class LLMClient:
+    def __init__(self, providers: List[Provider], hedge_after_seconds: float = LLM_HEDGE_AFTER_SECONDS):
+        self.providers = {provider.name: provider for provider in providers}
+        self.hedge_after_seconds = hedge_after_seconds
+        # Thread pool seukuran total semaphore: antrean nyata ada di semaphore, bukan di executor
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, sum(p.max_concurrency for p in providers)), thread_name_prefix="llm"
+        )
+        self._lock = threading.Lock()
+        self._stats = {
+            name: {"calls": 0, "successes": 0, "failures": 0, "timeouts": 0, "rejected": 0, "circuit_open": 0,
+                   "in_flight": 0}
+            for name in self.providers
+        }
+        self._hedges = 0
+
+    def chain(self, prefer: Optional[str] = None, fallback: bool = True) -> List[Provider]:
+        """Provider yang tersedia, `prefer` lebih dulu, sisanya sesuai urutan pendaftaran."""
+        names = list(self.providers)
+        if not fallback:
+            names = [prefer] if prefer in self.providers else []
+        elif prefer in self.providers:
+            names.remove(prefer)
+            names.insert(0, prefer)
+        return [self.providers[name] for name in names if self.providers[name].available()]
+
+    # --- pencatatan ---
+    def _count(self, provider: Provider, field: str, delta: int = 1) -> None:
+        with self._lock:
+            self._stats[provider.name][field] += delta
+
+    def _acquire(self, provider: Provider) -> bool:
+        if not provider.semaphore.acquire(blocking=False):
+            self._count(provider, "rejected")
+            return False
+        if not provider.breaker.allow():
+            provider.semaphore.release()
+            self._count(provider, "circuit_open")
+            return False
+        self._count(provider, "calls")
+        self._count(provider, "in_flight")
+        return True
+
+    def _release(self, provider: Provider, outcome: Optional[str]) -> None:
+        """
+        outcome None = hasil diabaikan (sudah dihitung timeout oleh pemanggil, atau
+        tidak lagi ditunggu): counter per provider dilewati, tetapi breaker tetap
+        diselesaikan agar percobaan half_open tidak menggantung.
+        """
+        if outcome == "successes":
+            provider.breaker.record_success()
+        elif outcome is not None:
+            provider.breaker.record_failure()
+        else:
+            provider.breaker.record_abandoned()
+        if outcome is not None:
+            self._count(provider, outcome)
+        self._count(provider, "in_flight", -1)
+        provider.semaphore.release()
+
+    # --- jawaban utuh ---
+    def ask(self, question: str, stats: dict, prefer: Optional[str] = None, fallback: bool = True) -> LLMResult:
+        chain = self.chain(prefer, fallback)
+        started = time.monotonic()
+        errors = []
+        pending = {}  # future -> (index di chain, provider, deadline, abandoned flag)
+        next_index = 0
+        last_launch = started
+
+        def launch_next() -> bool:
+            nonlocal next_index
+            while next_index < len(chain):
+                index, provider = next_index, chain[next_index]
+                next_index += 1
+                if not self._acquire(provider):
+                    errors.append(f"{provider.name}: penuh/circuit terbuka")
+                    continue
+                abandoned = threading.Event()
+                future = self._executor.submit(self._run_complete, provider, question, stats, abandoned)
+                pending[future] = (index, provider, time.monotonic() + provider.timeout, abandoned)
+                return True
+            return False
+
+        launch_next()
+        while pending:
+            now = time.monotonic()
+            wait_for = min(deadline for _, _, deadline, _ in pending.values()) - now
+            if next_index < len(chain):
+                wait_for = min(wait_for, last_launch + self.hedge_after_seconds - now)
+            done, _ = concurrent.futures.wait(
+                list(pending), timeout=max(0.0, wait_for), return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                index, provider, _, _ = pending.pop(future)
+                try:
+                    answer = future.result()
+                except Exception as exc:
+                    errors.append(f"{provider.name}: {exc}")
+                    continue
+                for _, _, _, abandoned in pending.values():
+                    abandoned.set()
+                latency_ms = round((time.monotonic() - started) * 1000, 1)
+                return LLMResult(answer, provider.name, index > 0, latency_ms)
+
+            now = time.monotonic()
+            for future, (_, provider, deadline, abandoned) in list(pending.items()):
+                if now >= deadline:
+                    # Thread-nya dibiarkan selesai sendiri (semaphore dilepas saat itu)
+                    del pending[future]
+                    abandoned.set()
+                    provider.breaker.record_failure()
+                    self._count(provider, "timeouts")
+                    errors.append(f"{provider.name}: timeout {provider.timeout:g}s")
+            hedge_due = next_index < len(chain) and now - last_launch >= self.hedge_after_seconds
+            if not pending or hedge_due:
+                if launch_next():
+                    last_launch = time.monotonic()
+                    if len(pending) > 1:
+                        with self._lock:
+                            self._hedges += 1
+        raise LLMUnavailable("; ".join(errors) or "tidak ada provider LLM yang tersedia")
+
+    def _run_complete(self, provider: Provider, question: str, stats: dict, abandoned: threading.Event) -> str:
+        outcome = "failures"
+        try:
+            answer = provider.complete(question, stats)
+            if not answer:
+                raise ValueError("jawaban kosong")
+            outcome = "successes"
+            return answer
+        finally:
+            self._release(provider, None if abandoned.is_set() and outcome == "failures" else outcome)
+
+    # --- streaming ---
+    def stream(self, question: str, stats: dict, prefer: Optional[str] = None,
+               fallback: bool = True) -> Iterator[StreamChunk]:
+        """
+        Token demi token. Failover hanya sebelum token pertama; setelah itu
+        kegagalan/timeout antar token menghentikan stream dengan LLMUnavailable.
+        """
+        errors = []
+        for index, provider in enumerate(self.chain(prefer, fallback)):
+            if not self._acquire(provider):
+                errors.append(f"{provider.name}: penuh/circuit terbuka")
+                continue
+            tokens = queue.Queue()
+            stop = threading.Event()
+            self._executor.submit(self._pump, provider, question, stats, tokens, stop)
+            got_token = False
+            try:
+                while True:
+                    try:
+                        kind, value = tokens.get(timeout=provider.timeout)
+                    except queue.Empty:
+                        stop.set()
+                        provider.breaker.record_failure()
+                        self._count(provider, "timeouts")
+                        value = f"timeout {provider.timeout:g}s"
+                        kind = "error"
+                    if kind == "token":
+                        got_token = True
+                        yield StreamChunk(provider.name, value, index > 0)
+                        continue
+                    if kind == "end" and got_token:
+                        return
+                    if got_token:
+                        raise LLMUnavailable(f"{provider.name}: stream terhenti ({value})")
+                    errors.append(f"{provider.name}: {value or 'jawaban kosong'}")
+                    break
+            finally:
+                # Klien putus / provider diganti: hentikan thread pemompa
+                stop.set()
+        raise LLMUnavailable("; ".join(errors) or "tidak ada provider LLM yang tersedia")
+
+    def _pump(self, provider: Provider, question: str, stats: dict, tokens: queue.Queue,
+              stop: threading.Event) -> None:
+        outcome = "failures"
+        try:
+            got_token = False
+            for token in provider.stream(question, stats):
+                if stop.is_set():
+                    if got_token:
+                        # Provider sehat, hanya klien yang berhenti membaca
+                        provider.breaker.record_success()
+                    outcome = None
+                    return
+                got_token = got_token or bool(token)
+                if token:
+                    tokens.put(("token", token))
+            outcome = "successes"
+            tokens.put(("end", None))
+        except Exception as exc:
+            tokens.put(("error", exc))
+        finally:
+            if stop.is_set() and outcome == "failures":
+                outcome = None
+            self._release(provider, outcome)
+
+    def stats(self) -> dict:
+        with self._lock:
+            providers = {
+                name: {
+                    **counters,
+                    "available": self.providers[name].available(),
+                    "circuit": self.providers[name].breaker.state,
+                    "timeout_seconds": self.providers[name].timeout,
+                    "max_concurrency": self.providers[name].max_concurrency,
+                }
+                for name, counters in self._stats.items()
+            }
+            return {"providers": providers, "hedges": self._hedges, "hedge_after_seconds": self.hedge_after_seconds}
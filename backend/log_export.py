@@ -0,0 +1,207 @@
+"""
+Export trash_logs / users untuk laporan dalam CSV atau NDJSON, opsional gzip.
+
+Baris dibaca dengan cursor unbuffered (MySQL mengirim hasil sedikit demi
+sedikit, bukan fetchall() ke memori) dan langsung di-encode per batch, jadi
+export jutaan baris tetap memakai memori konstan. Export memakai koneksi
+sendiri di luar db_pool agar download yang lama tidak menahan koneksi pool
+yang dibutuhkan request lain.
+"""
+import csv
+import datetime
+import decimal
+import io
+import json
+import os
+import threading
+import zlib
+from typing import Iterator, Mapping, Optional
+
+import mysql.connector
+
+import db_pool
+import log_query
+
+EXPORT_FETCH_SIZE = int(os.environ.get("EXPORT_FETCH_SIZE", "1000"))
+# Klien lambat (download besar) tidak boleh memutus query di sisi MySQL
+EXPORT_NET_WRITE_TIMEOUT_SECONDS = int(os.environ.get("EXPORT_NET_WRITE_TIMEOUT_SECONDS", "600"))
+# Tiap export memegang satu koneksi MySQL di luar pool selama download berlangsung
+EXPORT_MAX_CONCURRENT = max(1, int(os.environ.get("EXPORT_MAX_CONCURRENT", "2")))
+EXPORT_RETRY_AFTER_SECONDS = int(os.environ.get("EXPORT_RETRY_AFTER_SECONDS", "30"))
+GZIP_LEVEL = 6
+
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+_slots = threading.BoundedSemaphore(EXPORT_MAX_CONCURRENT)
+
+
+class ExportBusy(RuntimeError):
+    """Semua slot export (EXPORT_MAX_CONCURRENT) sedang dipakai."""
+
+
+class ExportSlot:
+    """Satu slot export; release() aman dipanggil lebih dari sekali."""
+
+    def __init__(self):
+        if not _slots.acquire(blocking=False):
+            raise ExportBusy(f"Maksimal {EXPORT_MAX_CONCURRENT} export berjalan bersamaan, coba lagi nanti")
+        self._lock = threading.Lock()
+        self._released = False
+
+    def release(self) -> None:
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        _slots.release()
+
+
+LOG_COLUMNS = (
+    "id", "timestamp", "trash_type", "event_kind", "confidence", "location_ip",
+    "user_id", "user_name", "rfid_uid", "user_role", "user_prodi",
+)
+USER_COLUMNS = ("id", "rfid_uid", "name", "username", "role", "prodi", "saldo", "created_at")
+
+
+def _logs_query(args: Mapping) -> tuple:
+    # Export default berisi semua jenis event; filter sama dengan /api/logs
+    where, params = log_query.build_filters({"kind": "all", **args})
+    query = (
+        "SELECT l.id, l.timestamp, l.trash_type, l.event_kind, l.confidence, l.location_ip, "
+        "l.user_id, u.name, u.rfid_uid, u.role, u.prodi "
+        "FROM trash_logs l JOIN users u ON u.id = l.user_id"
+    )
+    if where:
+        query += " WHERE " + where
+    return LOG_COLUMNS, query + " ORDER BY l.timestamp, l.id", params
+
+
+def _users_query(args: Mapping) -> tuple:
+    clauses = []
+    params = []
+    if args.get("role"):
+        clauses.append("role = %s")
+        params.append(args["role"].strip())
+    if args.get("prodi"):
+        clauses.append("prodi = %s")
+        params.append(args["prodi"].strip())
+    since, until = log_query.date_range(args)
+    if since:
+        clauses.append("created_at >= %s")
+        params.append(since)
+    if until:
+        clauses.append("created_at < %s")
+        params.append(until)
+    query = f"SELECT {', '.join(USER_COLUMNS)} FROM users"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    return USER_COLUMNS, query + " ORDER BY id", params
+
+
+DATASETS = {"logs": _logs_query, "users": _users_query}
+
+
+def build_query(dataset: str, args: Mapping) -> tuple:
+    """(kolom, sql, params); FilterError untuk dataset/filter tidak valid (sebelum stream dimulai)."""
+    if dataset not in DATASETS:
+        raise log_query.FilterError(f"dataset harus salah satu dari: {', '.join(DATASETS)}")
+    return DATASETS[dataset](args)
+
+
+def iter_rows(query: str, params, stats: Optional[dict] = None,
+              slot: Optional[ExportSlot] = None) -> Iterator[list]:
+    """Batch baris (list tuple) dari cursor unbuffered pada koneksi khusus export."""
+    conn = None
+    cursor = None
+    try:
+        conn = mysql.connector.connect(**db_pool.DB_CONFIG)
+        setup = conn.cursor()
+        setup.execute(f"SET SESSION net_write_timeout = {EXPORT_NET_WRITE_TIMEOUT_SECONDS}")
+        setup.close()
+        cursor = conn.cursor(buffered=False)
+        cursor.execute(query, tuple(params))
+        while True:
+            batch = cursor.fetchmany(EXPORT_FETCH_SIZE)
+            if not batch:
+                break
+            if stats is not None:
+                stats["rows"] = stats.get("rows", 0) + len(batch)
+            yield batch
+    finally:
+        # Export yang dibatalkan di tengah masih menyisakan hasil belum dibaca;
+        # koneksinya dibuang saja, bukan dikembalikan ke pool
+        for closeable in (cursor, conn):
+            if closeable is None:
+                continue
+            try:
+                closeable.close()
+            except Exception:
+                pass
+        if slot is not None:
+            slot.release()
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode("utf-8", "replace")
+    raise TypeError(f"Tidak bisa di-encode ke JSON: {type(value).__name__}")
+
+
+def encode(batches: Iterator[list], columns: tuple, fmt: str) -> Iterator[bytes]:
+    """Batch baris -> potongan bytes CSV (dengan header) atau NDJSON, satu potongan per batch."""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for batch in batches:
+            writer.writerows(
+                [value.isoformat() if isinstance(value, datetime.datetime) else value for value in row]
+                for row in batch
+            )
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            # Tanpa baris sama sekali: header tetap dikirim
+            yield buffer.getvalue().encode("utf-8")
+    elif fmt == "ndjson":
+        for batch in batches:
+            yield "".join(
+                json.dumps(dict(zip(columns, row)), default=_json_default, ensure_ascii=False) + "\n"
+                for row in batch
+            ).encode("utf-8")
+    else:
+        raise log_query.FilterError(f"format harus salah satu dari: {', '.join(FORMATS)}")
+
+
+def gzip_chunks(chunks: Iterator[bytes], level: int = GZIP_LEVEL) -> Iterator[bytes]:
+    """Kompres stream menjadi satu file gzip utuh tanpa menampung seluruh isi."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream(dataset: str, fmt: str, args: Mapping, compress: bool = False, stats: Optional[dict] = None) -> tuple:
+    """
+    Validasi parameter, ambil satu slot export (ExportBusy jika penuh), lalu
+    return (iterator bytes, mimetype, nama file, slot). Query baru dijalankan
+    saat iterator mulai dibaca; slot dilepas saat iterator selesai/ditutup,
+    tetapi pemanggil tetap harus memanggil slot.release() di akhir request
+    untuk iterator yang tidak pernah dibaca.
+    """
+    if fmt not in FORMATS:
+        raise log_query.FilterError(f"format harus salah satu dari: {', '.join(FORMATS)}")
+    columns, query, params = build_query(dataset, args)
+    slot = ExportSlot()
+    chunks = encode(iter_rows(query, params, stats, slot), columns, fmt)
+    filename = f"ecosmart_{dataset}_{datetime.date.today():%Y%m%d}.{fmt}"
+    if compress:
+        return gzip_chunks(chunks), "application/gzip", filename + ".gz", slot
+    return chunks, FORMATS[fmt], filename, slot
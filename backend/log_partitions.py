@@ -0,0 +1,245 @@
+"""
+Partisi bulanan trash_logs (RANGE atas TO_DAYS(timestamp)) dan kebijakan retensi.
+
+Setiap bulan punya partisi `pYYYYMM`, ditambah partisi penampung `pmax`.
+Maintenance berkala menambah partisi beberapa bulan ke depan dan, untuk
+partisi yang lebih tua dari LOG_RETENTION_MONTHS, mengekspor isinya ke
+CSV gzip di LOG_ARCHIVE_DIR lalu DROP PARTITION (instan, tanpa DELETE besar).
+
+Counter di trash_stats_rollup tidak ikut dihapus, jadi total statistik tetap
+mencakup data yang sudah diarsipkan (`stats_rollup.rebuild` hanya melihat
+data yang masih ada di tabel).
+
+Jalankan `python log_partitions.py status|rotate` atau `flask rotate-logs`.
+"""
+import csv
+import datetime
+import gzip
+import os
+import sys
+import threading
+import time
+from typing import Callable, Optional
+
+import mysql.connector
+
+RETENTION_MONTHS = int(os.environ.get("LOG_RETENTION_MONTHS", "12"))
+MONTHS_AHEAD = int(os.environ.get("LOG_PARTITION_MONTHS_AHEAD", "3"))
+ARCHIVE_DIR = os.environ.get(
+    "LOG_ARCHIVE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "log_archive")
+)
+MAINTENANCE_INTERVAL_SECONDS = float(os.environ.get("LOG_MAINTENANCE_INTERVAL_HOURS", "24")) * 3600
+# Recent logs dashboard cukup membaca partisi dalam jendela ini
+RECENT_WINDOW_DAYS = int(os.environ.get("RECENT_LOGS_WINDOW_DAYS", "30"))
+
+CATCH_ALL_PARTITION = "pmax"
+ARCHIVE_COLUMNS = ("id", "user_id", "trash_type", "confidence", "location_ip", "timestamp")
+ARCHIVE_FETCH_SIZE = 1000
+
+
+def month_start(value=None) -> datetime.date:
+    value = value or datetime.datetime.now()
+    return datetime.date(value.year, value.month, 1)
+
+
+def add_months(month: datetime.date, count: int) -> datetime.date:
+    index = month.year * 12 + (month.month - 1) + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime.date) -> str:
+    return f"p{month:%Y%m}"
+
+
+def _partition_clause(month: datetime.date) -> str:
+    upper = add_months(month, 1)
+    return f"PARTITION {partition_name(month)} VALUES LESS THAN (TO_DAYS('{upper:%Y-%m-%d}'))"
+
+
+def partition_definitions(first_month: datetime.date, last_month: datetime.date) -> str:
+    """Klausa partisi bulanan first_month..last_month (inklusif) + pmax."""
+    clauses = []
+    month = first_month
+    while month <= last_month:
+        clauses.append(_partition_clause(month))
+        month = add_months(month, 1)
+    clauses.append(f"PARTITION {CATCH_ALL_PARTITION} VALUES LESS THAN MAXVALUE")
+    return ", ".join(clauses)
+
+
+def recent_window_start(days: int = RECENT_WINDOW_DAYS, now: Optional[datetime.datetime] = None) -> datetime.datetime:
+    now = now or datetime.datetime.now()
+    return now - datetime.timedelta(days=days)
+
+
+def is_partitioned(cursor) -> bool:
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'trash_logs' AND PARTITION_NAME IS NOT NULL"
+    )
+    return cursor.fetchone()[0] > 0
+
+
+def list_partitions(cursor) -> list:
+    """[{name, month (date | None untuk pmax), rows (perkiraan InnoDB)}] urut posisi."""
+    cursor.execute(
+        "SELECT PARTITION_NAME, TABLE_ROWS FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'trash_logs' AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION"
+    )
+    partitions = []
+    for name, rows in cursor.fetchall():
+        month = None
+        if name != CATCH_ALL_PARTITION:
+            try:
+                month = datetime.datetime.strptime(name, "p%Y%m").date()
+            except ValueError:
+                pass
+        partitions.append({"name": name, "month": month, "rows": int(rows or 0)})
+    return partitions
+
+
+def ensure_future_partitions(conn, months_ahead: int = MONTHS_AHEAD) -> list:
+    """Pecah pmax agar ada partisi sampai `months_ahead` bulan ke depan. Return nama partisi baru."""
+    cursor = conn.cursor()
+    try:
+        months = [p["month"] for p in list_partitions(cursor) if p["month"]]
+        target = add_months(month_start(), months_ahead)
+        month = add_months(max(months), 1) if months else month_start()
+        created = []
+        clauses = []
+        while month <= target:
+            clauses.append(_partition_clause(month))
+            created.append(partition_name(month))
+            month = add_months(month, 1)
+        if clauses:
+            clauses.append(f"PARTITION {CATCH_ALL_PARTITION} VALUES LESS THAN MAXVALUE")
+            cursor.execute(
+                f"ALTER TABLE trash_logs REORGANIZE PARTITION {CATCH_ALL_PARTITION} INTO ({', '.join(clauses)})"
+            )
+        return created
+    finally:
+        cursor.close()
+
+
+def archive_partition(conn, name: str, archive_dir: str = ARCHIVE_DIR) -> tuple:
+    """Ekspor satu partisi ke <archive_dir>/trash_logs_<name>.csv.gz. Return (path, jumlah_baris)."""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"trash_logs_{name}.csv.gz")
+    if os.path.exists(path):
+        # Jangan timpa arsip lama (mis. partisi yang sama dibuat ulang)
+        path = os.path.join(archive_dir, f"trash_logs_{name}_{int(time.time())}.csv.gz")
+    tmp_path = path + ".tmp"
+
+    cursor = conn.cursor()
+    rows = 0
+    try:
+        cursor.execute(f"SELECT {', '.join(ARCHIVE_COLUMNS)} FROM trash_logs PARTITION ({name}) ORDER BY id")
+        with gzip.open(tmp_path, "wt", newline="", encoding="utf-8") as handle:
+            writer = csv.writer(handle)
+            writer.writerow(ARCHIVE_COLUMNS)
+            while True:
+                batch = cursor.fetchmany(ARCHIVE_FETCH_SIZE)
+                if not batch:
+                    break
+                writer.writerows(batch)
+                rows += len(batch)
+        os.replace(tmp_path, path)
+        return path, rows
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        cursor.close()
+
+
+def drop_partition(conn, name: str) -> None:
+    if name == CATCH_ALL_PARTITION:
+        raise ValueError("Partisi pmax tidak boleh di-drop")
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"ALTER TABLE trash_logs DROP PARTITION {name}")
+    finally:
+        cursor.close()
+
+
+def apply_retention(conn, retention_months: int = RETENTION_MONTHS, archive: bool = True,
+                    archive_dir: str = ARCHIVE_DIR) -> list:
+    """Arsipkan (opsional) lalu drop partisi bulanan yang lebih tua dari retensi."""
+    cutoff = add_months(month_start(), -max(retention_months, 1) + 1)
+    cursor = conn.cursor()
+    try:
+        expired = [p for p in list_partitions(cursor) if p["month"] and p["month"] < cutoff]
+    finally:
+        cursor.close()
+
+    results = []
+    for partition in expired:
+        path, rows = archive_partition(conn, partition["name"], archive_dir) if archive else (None, 0)
+        drop_partition(conn, partition["name"])
+        results.append({"partition": partition["name"], "archive": path, "rows": rows})
+        print(f"🗄️  [LOGS] Partisi {partition['name']} diarsipkan ({rows} baris) & di-drop")
+    return results
+
+
+def run_maintenance(conn, retention_months: int = RETENTION_MONTHS, archive: bool = True) -> dict:
+    cursor = conn.cursor()
+    try:
+        partitioned = is_partitioned(cursor)
+    finally:
+        cursor.close()
+    if not partitioned:
+        return {"partitioned": False, "created": [], "archived": []}
+    created = ensure_future_partitions(conn)
+    archived = apply_retention(conn, retention_months, archive)
+    return {"partitioned": True, "created": created, "archived": archived}
+
+
+def start_maintenance_thread(connect: Callable, on_archived: Optional[Callable] = None,
+                             interval_seconds: float = MAINTENANCE_INTERVAL_SECONDS) -> threading.Thread:
+    """Thread daemon: jalankan run_maintenance saat start lalu setiap interval."""
+
+    def _loop():
+        while True:
+            try:
+                conn = connect()
+                try:
+                    result = run_maintenance(conn)
+                finally:
+                    conn.close()
+                if result["archived"] and on_archived:
+                    on_archived(result)
+            except Exception as exc:
+                print(f"⚠️ [LOGS] Maintenance partisi gagal: {exc}")
+            time.sleep(interval_seconds)
+
+    thread = threading.Thread(target=_loop, name="log-partition-maintenance", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    from db_pool import get_connection
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    try:
+        conn = get_connection()
+        try:
+            if command == "rotate":
+                result = run_maintenance(conn)
+                if not result["partitioned"]:
+                    print("ℹ️  trash_logs belum dipartisi. Jalankan: python migrate_db.py")
+                else:
+                    print(f"✅ Partisi baru: {result['created'] or '-'}; diarsipkan: {len(result['archived'])}")
+            else:
+                cursor = conn.cursor()
+                try:
+                    for partition in list_partitions(cursor):
+                        print(f"{partition['name']:>8}  ~{partition['rows']} baris")
+                finally:
+                    cursor.close()
+        finally:
+            conn.close()
+    except mysql.connector.Error as exc:
+        print(f"❌ Gagal maintenance partisi: {exc}")
@@ -0,0 +1,146 @@
+import base64
+import datetime
+from typing import Mapping, Optional
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Nilai kolom trash_logs.event_kind (kolom generated, lihat migrasi 007)
+EVENT_KINDS = ("scan", "role", "logout")
+# Ekspresi kolom generated di migrasi 007; klasifikasinya sama dengan dashboard_cache.is_scan_log
+EVENT_KIND_SQL = (
+    "CASE WHEN trash_type LIKE '%LOGOUT%' THEN 'logout' "
+    "WHEN trash_type LIKE 'ROLE\\_%' THEN 'role' ELSE 'scan' END"
+)
+
+LOG_SELECT = """
+    SELECT
+        l.id,
+        l.timestamp,
+        l.trash_type,
+        l.event_kind,
+        l.confidence,
+        l.location_ip,
+        u.name AS user_name,
+        u.rfid_uid,
+        u.role AS user_role,
+        u.prodi AS user_prodi
+    FROM trash_logs l
+    JOIN users u ON u.id = l.user_id
+"""
+
+
+class FilterError(ValueError):
+    """Parameter filter/cursor tidak valid (dikembalikan sebagai HTTP 400)."""
+
+
+def _parse_datetime(value: str, name: str) -> datetime.datetime:
+    try:
+        parsed = datetime.datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        raise FilterError(f"{name} harus tanggal ISO (YYYY-MM-DD atau YYYY-MM-DDTHH:MM:SS)")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def date_range(args: Mapping) -> tuple:
+    """(since, until) dari query string; until tanggal saja = sampai akhir hari itu."""
+    since = _parse_datetime(args["since"], "since") if args.get("since") else None
+    until = None
+    if args.get("until"):
+        until = _parse_datetime(args["until"], "until")
+        if len(args["until"].strip()) == 10:
+            until += datetime.timedelta(days=1)
+    return since, until
+
+
+def build_filters(args: Mapping) -> tuple:
+    """
+    Query string -> (klausa WHERE tanpa kata WHERE, params). Filter: kind
+    (scan|role|logout|all, default scan), trash_type, location, user_id, prodi,
+    since (inklusif) dan until (eksklusif; tanggal saja = sampai akhir hari itu).
+    """
+    clauses = []
+    params = []
+    kind = (args.get("kind") or "scan").lower()
+    if kind != "all":
+        if kind not in EVENT_KINDS:
+            raise FilterError(f"kind harus salah satu dari: all, {', '.join(EVENT_KINDS)}")
+        clauses.append("l.event_kind = %s")
+        params.append(kind)
+    if args.get("trash_type"):
+        clauses.append("l.trash_type = %s")
+        params.append(args["trash_type"].strip().upper())
+    if args.get("location"):
+        clauses.append("l.location_ip = %s")
+        params.append(args["location"].strip())
+    if args.get("user_id"):
+        try:
+            params.append(int(args["user_id"]))
+        except ValueError:
+            raise FilterError("user_id harus angka")
+        clauses.append("l.user_id = %s")
+    if args.get("prodi"):
+        clauses.append("u.prodi = %s")
+        params.append(args["prodi"].strip())
+    since, until = date_range(args)
+    if since:
+        clauses.append("l.timestamp >= %s")
+        params.append(since)
+    if until:
+        clauses.append("l.timestamp < %s")
+        params.append(until)
+    return " AND ".join(clauses), params
+
+
+def encode_cursor(row: dict) -> str:
+    raw = f"{row['timestamp'].isoformat()}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor_value: str) -> tuple:
+    try:
+        padded = cursor_value + "=" * (-len(cursor_value) % 4)
+        timestamp, log_id = base64.urlsafe_b64decode(padded.encode("ascii")).decode("ascii").split("|")
+        return datetime.datetime.fromisoformat(timestamp), int(log_id)
+    except (ValueError, UnicodeError):
+        raise FilterError("cursor tidak valid")
+
+
+def parse_limit(value: Optional[str]) -> int:
+    if not value:
+        return DEFAULT_PAGE_SIZE
+    try:
+        return max(1, min(int(value), MAX_PAGE_SIZE))
+    except ValueError:
+        raise FilterError("limit harus angka")
+
+
+def fetch_page(cursor, args: Mapping) -> tuple:
+    """
+    Satu halaman log terbaru-dulu dengan keyset pagination pada (timestamp, id):
+    halaman berikutnya melanjutkan dari baris terakhir lewat index, bukan OFFSET,
+    sehingga biayanya sama di kedalaman berapa pun. Return (rows, next_cursor).
+    """
+    where, params = build_filters(args)
+    limit = parse_limit(args.get("limit"))
+    clauses = [where] if where else []
+    if args.get("cursor"):
+        before_ts, before_id = decode_cursor(args["cursor"])
+        # Bentuk OR eksplisit (bukan row constructor) agar MySQL memakai range scan di index
+        clauses.append("(l.timestamp < %s OR (l.timestamp = %s AND l.id < %s))")
+        params.extend([before_ts, before_ts, before_id])
+    query = LOG_SELECT
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += " ORDER BY l.timestamp DESC, l.id DESC LIMIT %s"
+    cursor.execute(query, (*params, limit + 1))
+    rows = cursor.fetchall()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def fetch_last_scan(cursor) -> Optional[dict]:
+    """Scan sampah terakhir (bukan login/logout role) langsung dari index event_kind."""
+    cursor.execute(LOG_SELECT + " WHERE l.event_kind = 'scan' ORDER BY l.timestamp DESC, l.id DESC LIMIT 1")
+    return cursor.fetchone()
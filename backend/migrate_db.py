@@ -1,6 +1,10 @@
 import mysql.connector
 from mysql.connector import errorcode
 import os
+import sys
+
+import log_partitions
+import log_query
 
 DB_NAME = os.environ.get("ECOSMART_DB", "ecosmart")
 DB_CONFIG = {
@@ -33,39 +37,378 @@ def create_database():
         conn.close()
 
 
+# ---------------------------------------------------------------------------
+# Migrasi berversi. Setiap migrasi berjalan sekali dan dicatat di tabel
+# schema_migrations; langkahnya idempoten (cek kolom/index dulu) sehingga aman
+# dijalankan ulang di database lama yang sebagian sudah dipatch manual.
+# ---------------------------------------------------------------------------
+
+
+def _column_exists(cursor, table: str, column: str) -> bool:
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+        (table, column),
+    )
+    return cursor.fetchone()[0] > 0
+
+
+def _index_exists(cursor, table: str, index: str) -> bool:
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s",
+        (table, index),
+    )
+    return cursor.fetchone()[0] > 0
+
+
+def _add_index(cursor, table: str, index: str, columns: str) -> None:
+    if _index_exists(cursor, table, index):
+        print(f"   ↪ index {table}.{index} sudah ada, skip")
+        return
+    cursor.execute(f"ALTER TABLE {table} ADD INDEX {index} ({columns})")
+    print(f"   ↪ index {table}.{index} ({columns}) dibuat")
+
+
+def _m001_create_core_tables(cursor):
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            rfid_uid VARCHAR(128) NOT NULL UNIQUE,
+            name VARCHAR(255) NOT NULL,
+            username VARCHAR(255),
+            role ENUM('admin','user','petugas') NOT NULL DEFAULT 'user',
+            prodi VARCHAR(255),
+            saldo INT NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS trash_logs (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            trash_type VARCHAR(64) NOT NULL,
+            confidence FLOAT NOT NULL DEFAULT 0,
+            location_ip VARCHAR(255),
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+        """
+    )
+
+
+def _m002_add_users_username(cursor):
+    # Pengganti add_username_column.py untuk database yang dibuat sebelum kolom ini ada
+    if not _column_exists(cursor, "users", "username"):
+        cursor.execute("ALTER TABLE users ADD COLUMN username VARCHAR(255) AFTER name")
+
+
+def _m003_create_stats_rollup(cursor):
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS trash_stats_rollup (
+            bucket_kind ENUM('all','day','hour') NOT NULL,
+            bucket_start DATETIME NOT NULL,
+            trash_type VARCHAR(64) NOT NULL,
+            location VARCHAR(255) NOT NULL,
+            cnt INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (bucket_kind, bucket_start, trash_type, location)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+        """
+    )
+
+
+def _m004_add_hot_query_indexes(cursor):
+    # recent_logs dashboard: ORDER BY timestamp DESC LIMIT 20 (id sebagai tie-breaker)
+    _add_index(cursor, "trash_logs", "idx_logs_timestamp", "timestamp, id")
+    # Fallback statistik per jenis/lokasi: index covering tanpa baca baris
+    _add_index(cursor, "trash_logs", "idx_logs_type_location", "trash_type, location_ip")
+    # Riwayat per lokasi (grafik / prediksi) berurutan waktu
+    _add_index(cursor, "trash_logs", "idx_logs_location_timestamp", "location_ip, timestamp")
+    # Riwayat per user; juga memenuhi kebutuhan index FK user_id
+    _add_index(cursor, "trash_logs", "idx_logs_user_timestamp", "user_id, timestamp")
+    # Leaderboard dashboard: ORDER BY saldo DESC LIMIT 5
+    _add_index(cursor, "users", "idx_users_saldo", "saldo, id")
+    # Daftar user dashboard: ORDER BY name
+    _add_index(cursor, "users", "idx_users_name", "name")
+    # MVP leaderboard: WHERE role='user' AND prodi IS NOT NULL, urut prodi + saldo
+    _add_index(cursor, "users", "idx_users_role_prodi_saldo", "role, prodi, saldo")
+
+
+def _m005_partition_trash_logs(cursor):
+    # MySQL: tabel terpartisi tidak boleh punya foreign key, dan kolom partisi
+    # (timestamp, NOT NULL) wajib ada di setiap unique key termasuk primary key.
+    if log_partitions.is_partitioned(cursor):
+        print("   ↪ trash_logs sudah terpartisi, skip")
+        return
+    cursor.execute(
+        "SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS "
+        "WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'trash_logs'"
+    )
+    for (constraint,) in cursor.fetchall():
+        cursor.execute(f"ALTER TABLE trash_logs DROP FOREIGN KEY {constraint}")
+    cursor.execute("UPDATE trash_logs SET timestamp = NOW() WHERE timestamp IS NULL")
+    cursor.execute(
+        "ALTER TABLE trash_logs "
+        "MODIFY timestamp DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP, "
+        "DROP PRIMARY KEY, ADD PRIMARY KEY (id, timestamp)"
+    )
+    cursor.execute("SELECT MIN(timestamp) FROM trash_logs")
+    oldest = cursor.fetchone()[0]
+    first = log_partitions.month_start(oldest)
+    last = log_partitions.add_months(log_partitions.month_start(), log_partitions.MONTHS_AHEAD)
+    cursor.execute(
+        "ALTER TABLE trash_logs PARTITION BY RANGE (TO_DAYS(timestamp)) "
+        f"({log_partitions.partition_definitions(first, last)})"
+    )
+    print(f"   ↪ trash_logs dipartisi per bulan ({log_partitions.partition_name(first)}..pmax)")
+
+
+def _m006_create_bin_telemetry(cursor):
+    # Raw: retensi pendek (telemetry.RAW_RETENTION_HOURS); rollup menit/jam untuk riwayat panjang
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS bin_telemetry_raw (
+            bin_id VARCHAR(64) NOT NULL,
+            ts DATETIME(3) NOT NULL,
+            distance_cm FLOAT NOT NULL,
+            status VARCHAR(32),
+            PRIMARY KEY (bin_id, ts),
+            INDEX idx_telemetry_raw_ts (ts)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS bin_telemetry_rollup (
+            resolution ENUM('minute','hour') NOT NULL,
+            bin_id VARCHAR(64) NOT NULL,
+            bucket_start DATETIME NOT NULL,
+            samples INT NOT NULL DEFAULT 0,
+            sum_cm DOUBLE NOT NULL DEFAULT 0,
+            min_cm FLOAT,
+            max_cm FLOAT,
+            last_cm FLOAT,
+            PRIMARY KEY (resolution, bin_id, bucket_start),
+            INDEX idx_telemetry_rollup_bucket (resolution, bucket_start)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+        """
+    )
+
+
+def _m007_add_event_kind(cursor):
+    # Jenis event dihitung MySQL dari trash_type (kolom generated STORED): baris lama
+    # langsung terisi dan INSERT tidak perlu diubah. Login/logout role difilter di SQL.
+    if not _column_exists(cursor, "trash_logs", "event_kind"):
+        cursor.execute(
+            "ALTER TABLE trash_logs ADD COLUMN event_kind ENUM('scan','role','logout') "
+            f"AS ({log_query.EVENT_KIND_SQL}) STORED NOT NULL AFTER trash_type"
+        )
+    # /api/logs & last_scan: WHERE event_kind = ? ORDER BY timestamp DESC, id DESC (keyset)
+    _add_index(cursor, "trash_logs", "idx_logs_kind_timestamp", "event_kind, timestamp, id")
+    # /api/logs?trash_type=...: urutan waktu per jenis sampah
+    _add_index(cursor, "trash_logs", "idx_logs_type_timestamp", "trash_type, timestamp, id")
+
+
+def _m008_create_points_ledger(cursor):
+    # Append-only; users.saldo = SUM(points) per user (lihat points_ledger.reconcile)
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS points_ledger (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            points INT NOT NULL,
+            reason VARCHAR(32) NOT NULL,
+            idempotency_key VARCHAR(128) NOT NULL,
+            log_id INT NULL,
+            created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE KEY uq_ledger_idempotency_key (idempotency_key),
+            INDEX idx_ledger_user_points (user_id, points)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+        """
+    )
+    # Saldo yang sudah ada menjadi saldo awal, agar SUM ledger langsung sama dengan users.saldo
+    cursor.execute(
+        "INSERT IGNORE INTO points_ledger (user_id, points, reason, idempotency_key) "
+        "SELECT id, saldo, 'opening_balance', CONCAT('opening:', id) FROM users WHERE saldo <> 0"
+    )
+    print(f"   ↪ saldo awal {cursor.rowcount} user dicatat di ledger")
+
+
+def _m009_add_rollup_last_ts(cursor):
+    # Waktu pembacaan terakhir per bucket: batch terlambat tidak boleh menimpa last_cm yang lebih baru
+    if not _column_exists(cursor, "bin_telemetry_rollup", "last_ts"):
+        cursor.execute("ALTER TABLE bin_telemetry_rollup ADD COLUMN last_ts DATETIME(3) NULL AFTER last_cm")
+
+
+# (versi, nama, fungsi). Tambahkan migrasi baru di akhir daftar; jangan ubah yang lama.
+MIGRATIONS = [
+    (1, "create_core_tables", _m001_create_core_tables),
+    (2, "add_users_username", _m002_add_users_username),
+    (3, "create_stats_rollup", _m003_create_stats_rollup),
+    (4, "add_hot_query_indexes", _m004_add_hot_query_indexes),
+    (5, "partition_trash_logs", _m005_partition_trash_logs),
+    (6, "create_bin_telemetry", _m006_create_bin_telemetry),
+    (7, "add_event_kind", _m007_add_event_kind),
+    (8, "create_points_ledger", _m008_create_points_ledger),
+    (9, "add_rollup_last_ts", _m009_add_rollup_last_ts),
+]
+
+
+def _ensure_migrations_table(cursor) -> None:
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+        """
+    )
+
+
+def applied_versions(cursor) -> set:
+    _ensure_migrations_table(cursor)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def run_migrations() -> list:
+    """Jalankan migrasi yang belum tercatat, berurutan. Return daftar versi yang baru diterapkan."""
+    conn = _connect(use_database=True)
+    cursor = conn.cursor()
+    applied_now = []
+    try:
+        done = applied_versions(cursor)
+        for version, name, migrate in MIGRATIONS:
+            if version in done:
+                continue
+            print(f"🔧 Migrasi {version:03d} {name}...")
+            migrate(cursor)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                (version, name),
+            )
+            conn.commit()
+            applied_now.append(version)
+        if applied_now:
+            print(f"✅ {len(applied_now)} migrasi diterapkan (versi terbaru: {MIGRATIONS[-1][0]}).")
+        else:
+            print("✅ Skema sudah versi terbaru.")
+        return applied_now
+    finally:
+        cursor.close()
+        conn.close()
+
+
 def create_tables():
+    run_migrations()
+    print("ℹ️  Jika trash_logs sudah berisi data, jalankan: python stats_rollup.py")
+
+
+def show_status():
     conn = _connect(use_database=True)
     cursor = conn.cursor()
     try:
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS users (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                rfid_uid VARCHAR(128) NOT NULL UNIQUE,
-                name VARCHAR(255) NOT NULL,
-                username VARCHAR(255),
-                role ENUM('admin','user','petugas') NOT NULL DEFAULT 'user',
-                prodi VARCHAR(255),
-                saldo INT NOT NULL DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-            """
-        )
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS trash_logs (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL,
-                trash_type VARCHAR(64) NOT NULL,
-                confidence FLOAT NOT NULL DEFAULT 0,
-                location_ip VARCHAR(255),
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-            """
-        )
-        conn.commit()
-        print("✅ Tabel users & trash_logs siap.")
+        done = applied_versions(cursor)
+        for version, name, _ in MIGRATIONS:
+            mark = "✅" if version in done else "⏳"
+            print(f"{mark} {version:03d} {name}")
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# Query panas dari app.py yang wajib memakai index (dicek dengan EXPLAIN)
+HOT_QUERIES = [
+    (
+        "dashboard recent_logs",
+        "SELECT l.id FROM trash_logs l JOIN users u ON u.id = l.user_id "
+        "WHERE l.timestamp >= NOW() - INTERVAL 30 DAY ORDER BY l.timestamp DESC LIMIT 20",
+        "l",
+    ),
+    (
+        "dashboard last_scan",
+        "SELECT l.id FROM trash_logs l JOIN users u ON u.id = l.user_id "
+        "WHERE l.event_kind = 'scan' ORDER BY l.timestamp DESC, l.id DESC LIMIT 1",
+        "l",
+    ),
+    (
+        "log page (keyset)",
+        "SELECT l.id FROM trash_logs l JOIN users u ON u.id = l.user_id "
+        "WHERE l.event_kind = 'scan' AND (l.timestamp < NOW() OR (l.timestamp = NOW() AND l.id < 1000000)) "
+        "ORDER BY l.timestamp DESC, l.id DESC LIMIT 51",
+        "l",
+    ),
+    (
+        "log page per jenis",
+        "SELECT l.id FROM trash_logs l JOIN users u ON u.id = l.user_id "
+        "WHERE l.event_kind = 'scan' AND l.trash_type = 'KERTAS' ORDER BY l.timestamp DESC, l.id DESC LIMIT 51",
+        "l",
+    ),
+    (
+        "dashboard leaderboard",
+        "SELECT id, rfid_uid, name, role, prodi, saldo FROM users ORDER BY saldo DESC LIMIT 5",
+        "users",
+    ),
+    (
+        "mvp_leaderboard per prodi",
+        "SELECT prodi, COUNT(*), SUM(saldo) FROM users WHERE role = 'user' AND prodi IS NOT NULL GROUP BY prodi",
+        "users",
+    ),
+    (
+        "mvp_leaderboard top-N per prodi",
+        "SELECT id FROM (SELECT id, ROW_NUMBER() OVER (PARTITION BY prodi ORDER BY saldo DESC, id DESC) AS rnk "
+        "FROM users WHERE role = 'user' AND prodi IS NOT NULL) ranked WHERE rnk <= 5",
+        "users",
+    ),
+    (
+        "mvp_leaderboard halaman prodi",
+        "SELECT id, name, saldo FROM users WHERE role = 'user' AND prodi = 'Informatika' "
+        "AND (saldo < 3000 OR (saldo = 3000 AND id < 100)) ORDER BY saldo DESC, id DESC LIMIT 21",
+        "users",
+    ),
+    (
+        "mvp_leaderboard periode",
+        "SELECT user_id, COUNT(*) FROM trash_logs WHERE event_kind = 'scan' "
+        "AND timestamp >= CURDATE() - INTERVAL 7 DAY GROUP BY user_id",
+        "trash_logs",
+    ),
+    (
+        "stats per jenis (fallback)",
+        "SELECT trash_type, COUNT(*) FROM trash_logs WHERE trash_type IN ('KERTAS', 'ANORGANIK') GROUP BY trash_type",
+        "trash_logs",
+    ),
+    (
+        "stats rollup",
+        "SELECT trash_type, location, cnt FROM trash_stats_rollup WHERE bucket_kind = 'all' "
+        "AND trash_type IN ('KERTAS', 'ANORGANIK')",
+        "trash_stats_rollup",
+    ),
+]
+
+
+def check_indexes() -> bool:
+    """EXPLAIN setiap query panas; gagal jika tabel utamanya di-scan penuh tanpa index."""
+    conn = _connect(use_database=True)
+    cursor = conn.cursor(dictionary=True)
+    ok = True
+    try:
+        for label, query, table in HOT_QUERIES:
+            cursor.execute(f"EXPLAIN {query}")
+            rows = cursor.fetchall()
+            row = next((r for r in rows if r.get("table") == table), rows[0])
+            key = row.get("key")
+            access = row.get("type")
+            extra = row.get("Extra") or ""
+            uses_index = bool(key) and access != "ALL"
+            ok = ok and uses_index
+            mark = "✅" if uses_index else "❌"
+            print(f"{mark} {label}: type={access} key={key} rows={row.get('rows')} {extra}")
+        return ok
     finally:
         cursor.close()
         conn.close()
@@ -115,10 +458,20 @@ def seed_users():
 
 
 if __name__ == "__main__":
+    # python migrate_db.py          -> buat database, jalankan migrasi, seed user
+    # python migrate_db.py status   -> daftar migrasi & status
+    # python migrate_db.py check    -> EXPLAIN query panas (exit 1 jika ada full scan)
+    command = sys.argv[1] if len(sys.argv) > 1 else "migrate"
     try:
-        create_database()
-        create_tables()
-        seed_users()
+        if command == "status":
+            show_status()
+        elif command == "check":
+            if not check_indexes():
+                sys.exit(1)
+        else:
+            create_database()
+            create_tables()
+            seed_users()
     except mysql.connector.Error as exc:
         if exc.errno == errorcode.ER_ACCESS_DENIED_ERROR:
             print("❌ Akses ditolak. Periksa username/password MySQL.")
@@ -0,0 +1,229 @@
+"""
+MVP leaderboard per prodi, dihitung di MySQL dengan window function.
+
+- summary(): agregat per prodi + top-N user tiap prodi (ROW_NUMBER() OVER
+  (PARTITION BY prodi ...)), bukan seluruh user yang dikelompokkan di Python.
+- page(): daftar lengkap satu prodi dengan keyset pagination pada
+  (skor, id), sehingga halaman ke berapa pun sama murahnya.
+- period: "all" memakai saldo; "day"/"week"/"month" menghitung poin dari
+  scan di trash_logs sejak awal hari/minggu (Senin)/bulan ini.
+
+Hasil di-cache (TTL) dan dibuang setiap kali saldo berubah (invalidate()).
+"""
+import base64
+import datetime
+import os
+import threading
+from typing import Callable, Optional
+
+import ttl_cache
+
+MVP_TOP_N = int(os.environ.get("MVP_TOP_N", "5"))
+MVP_MAX_TOP_N = 50
+MVP_PAGE_SIZE = 20
+MVP_MAX_PAGE_SIZE = 100
+MVP_CACHE_TTL_SECONDS = float(os.environ.get("MVP_CACHE_TTL_SECONDS", "60"))
+MVP_CACHE_MAX_ENTRIES = 128
+PERIODS = ("all", "day", "week", "month")
+
+_ALL_SCORES = """
+    SELECT u.id, u.name, u.prodi, u.rfid_uid, u.saldo AS score
+    FROM users u
+    WHERE u.role = 'user' AND u.prodi IS NOT NULL
+"""
+# Satu scan = satu reward, jadi poin periode = jumlah scan x reward per scan
+_PERIOD_SCORES = """
+    SELECT u.id, u.name, u.prodi, u.rfid_uid, p.score
+    FROM (
+        SELECT user_id, COUNT(*) * %s AS score
+        FROM trash_logs
+        WHERE event_kind = 'scan' AND timestamp >= %s
+        GROUP BY user_id
+    ) p
+    JOIN users u ON u.id = p.user_id
+    WHERE u.role = 'user' AND u.prodi IS NOT NULL
+"""
+
+
+class LeaderboardError(ValueError):
+    """Parameter period/top/limit/cursor tidak valid (HTTP 400)."""
+
+
+def period_start(period: str, now: Optional[datetime.datetime] = None) -> Optional[datetime.datetime]:
+    """Awal periode (None untuk "all")."""
+    if period not in PERIODS:
+        raise LeaderboardError(f"period harus salah satu dari: {', '.join(PERIODS)}")
+    if period == "all":
+        return None
+    today = (now or datetime.datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "week":
+        return today - datetime.timedelta(days=today.weekday())
+    if period == "month":
+        return today.replace(day=1)
+    return today
+
+
+def _parse_int(value: Optional[str], name: str, default: int, maximum: int) -> int:
+    if not value:
+        return default
+    try:
+        return max(1, min(int(value), maximum))
+    except ValueError:
+        raise LeaderboardError(f"{name} harus angka")
+
+
+def encode_cursor(score: int, user_id: int, rank: int) -> str:
+    raw = f"{score}|{user_id}|{rank}"
+    return base64.urlsafe_b64encode(raw.encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor_value: str) -> tuple:
+    try:
+        padded = cursor_value + "=" * (-len(cursor_value) % 4)
+        score, user_id, rank = base64.urlsafe_b64decode(padded.encode("ascii")).decode("ascii").split("|")
+        return int(score), int(user_id), int(rank)
+    except (ValueError, UnicodeError):
+        raise LeaderboardError("cursor tidak valid")
+
+
+class MvpLeaderboard:
+    """`connect()` mengembalikan koneksi MySQL (dari pool); `reward_points` = poin per scan."""
+
+    def __init__(self, connect: Callable, reward_points: int, ttl_seconds: float = MVP_CACHE_TTL_SECONDS):
+        self.connect = connect
+        self.reward_points = reward_points
+        self._cache = ttl_cache.TTLCache(MVP_CACHE_MAX_ENTRIES, ttl_seconds)
+        self._lock = threading.Lock()
+        # Generasi masuk ke key cache: hasil query yang sedang berjalan saat
+        # invalidate() disimpan di generasi lama dan tidak akan terbaca lagi
+        self._generation = 0
+        self._invalidations = 0
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._invalidations += 1
+        self._cache.clear()
+
+    def _cached(self, key: tuple, compute: Callable[[], dict]) -> tuple:
+        """Return (payload, cached)."""
+        with self._lock:
+            generation = self._generation
+        payload, source = self._cache.get_or_compute((generation, *key), lambda: (compute(), True))
+        return payload, source != "computed"
+
+    def _scores(self, period: str) -> tuple:
+        since = period_start(period)
+        if since is None:
+            return _ALL_SCORES, [], since
+        return _PERIOD_SCORES, [self.reward_points, since], since
+
+    def _query(self, query: str, params) -> list:
+        conn = self.connect()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(query, tuple(params))
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def summary(self, period: str = "all", top_n: Optional[str] = None) -> tuple:
+        """Agregat per prodi + top-N user per prodi. Return (payload, cached)."""
+        top = _parse_int(top_n, "top", MVP_TOP_N, MVP_MAX_TOP_N)
+        scores, params, since = self._scores(period)
+
+        def compute() -> dict:
+            field = "saldo" if period == "all" else "points"
+            conn = self.connect()
+            cursor = conn.cursor(dictionary=True)
+            try:
+                cursor.execute(
+                    f"""
+                    SELECT prodi, COUNT(*) AS total_users, SUM(score) AS total_{field},
+                           AVG(score) AS avg_{field}, MAX(score) AS max_{field}
+                    FROM ({scores}) s
+                    GROUP BY prodi
+                    ORDER BY total_{field} DESC, avg_{field} DESC
+                    """,
+                    tuple(params),
+                )
+                leaderboard = cursor.fetchall()
+                cursor.execute(
+                    f"""
+                    SELECT id, name, prodi, rfid_uid, score, rnk
+                    FROM (
+                        SELECT s.*, ROW_NUMBER() OVER (PARTITION BY s.prodi ORDER BY s.score DESC, s.id DESC) AS rnk
+                        FROM ({scores}) s
+                    ) ranked
+                    WHERE rnk <= %s
+                    ORDER BY prodi, rnk
+                    """,
+                    (*params, top),
+                )
+                users_by_prodi = {}
+                for row in cursor.fetchall():
+                    users_by_prodi.setdefault(row["prodi"], []).append(_user_row(row, field, row["rnk"]))
+            finally:
+                cursor.close()
+                conn.close()
+            return {
+                "status": "success",
+                "period": period,
+                "since": since.isoformat() if since else None,
+                "top_n": top,
+                "leaderboard": leaderboard,
+                "users_by_prodi": users_by_prodi,
+            }
+
+        return self._cached(("summary", period, top), compute)
+
+    def page(self, prodi: str, period: str = "all", limit: Optional[str] = None,
+             cursor_value: Optional[str] = None) -> tuple:
+        """Satu halaman peringkat lengkap satu prodi. Return (payload, cached)."""
+        size = _parse_int(limit, "limit", MVP_PAGE_SIZE, MVP_MAX_PAGE_SIZE)
+        after = decode_cursor(cursor_value) if cursor_value else None
+        scores, params, since = self._scores(period)
+
+        def compute() -> dict:
+            field = "saldo" if period == "all" else "points"
+            query = f"SELECT id, name, prodi, rfid_uid, score FROM ({scores}) s WHERE s.prodi = %s"
+            query_params = [*params, prodi]
+            if after:
+                # Urutan (skor DESC, id DESC) = urutan index (role, prodi, saldo) dibaca mundur
+                query += " AND (s.score < %s OR (s.score = %s AND s.id < %s))"
+                query_params.extend([after[0], after[0], after[1]])
+            query += " ORDER BY s.score DESC, s.id DESC LIMIT %s"
+            rows = self._query(query, (*query_params, size + 1))
+            first_rank = after[2] + 1 if after else 1
+            users = [_user_row(row, field, first_rank + index) for index, row in enumerate(rows[:size])]
+            next_cursor = None
+            if len(rows) > size:
+                last = rows[size - 1]
+                next_cursor = encode_cursor(int(last["score"]), last["id"], first_rank + size - 1)
+            return {
+                "status": "success",
+                "prodi": prodi,
+                "period": period,
+                "since": since.isoformat() if since else None,
+                "users": users,
+                "next_cursor": next_cursor,
+            }
+
+        return self._cached(("page", prodi, period, size, cursor_value or ""), compute)
+
+    def stats(self) -> dict:
+        with self._lock:
+            generation, invalidations = self._generation, self._invalidations
+        return {**self._cache.stats(), "generation": generation, "invalidations": invalidations}
+
+
+def _user_row(row: dict, field: str, rank: int) -> dict:
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "prodi": row["prodi"],
+        "rfid_uid": row["rfid_uid"],
+        field: int(row["score"] or 0),
+        "rank": rank,
+    }
@@ -0,0 +1,162 @@
+"""
+Buku besar poin (points_ledger): setiap perubahan saldo dicatat sebagai satu
+baris append-only dengan idempotency key unik, dan users.saldo dinaikkan
+secara atomik (saldo = saldo + poin) dalam transaksi yang sama.
+
+- Retry scan yang sama (key sama) ditolak oleh UNIQUE key, jadi poin tidak
+  pernah dikreditkan dua kali.
+- Tidak ada read-modify-write di Python: scan bersamaan untuk user yang sama
+  tidak saling menimpa.
+- users.saldo adalah cache dari SUM(points); reconcile() menghitung ulang
+  dan (opsional) memperbaikinya per batch.
+
+    python points_ledger.py           # laporan selisih saja
+    python points_ledger.py --apply   # perbaiki saldo dari ledger
+"""
+import argparse
+import hashlib
+import os
+from typing import Optional
+
+import mysql.connector
+from mysql.connector import errorcode
+
+RECONCILE_BATCH_SIZE = int(os.environ.get("LEDGER_RECONCILE_BATCH_SIZE", "500"))
+IDEMPOTENCY_KEY_MAX_LENGTH = 128
+RECONCILE_SAMPLE_LIMIT = 20
+
+
+def idempotency_key(kind: str, *parts) -> str:
+    """Key ledger "<kind>:<bagian>:..."; key yang terlalu panjang diganti hash-nya."""
+    key = ":".join([kind, *(str(part) for part in parts)])
+    if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        key = f"{kind}:sha1:{hashlib.sha1(key.encode('utf-8')).hexdigest()}"
+    return key
+
+
+def credit(cursor, user_id: int, points: int, key: str, reason: str = "scan",
+           log_id: Optional[int] = None) -> Optional[int]:
+    """
+    Catat `points` untuk user dan naikkan saldonya. Return saldo baru, atau
+    None jika `key` sudah pernah dikreditkan (pemanggil sebaiknya rollback).
+    Tidak commit: pemanggil meng-commit bersama INSERT lain (mis. trash_logs).
+    """
+    try:
+        cursor.execute(
+            "INSERT INTO points_ledger (user_id, points, reason, idempotency_key, log_id) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            (user_id, points, reason, key, log_id),
+        )
+    except mysql.connector.IntegrityError as exc:
+        if exc.errno == errorcode.ER_DUP_ENTRY:
+            return None
+        raise
+    # Kunci baris user baru diambil di sini, tepat sebelum commit, agar singkat
+    cursor.execute("UPDATE users SET saldo = saldo + %s WHERE id = %s", (points, user_id))
+    cursor.execute("SELECT saldo FROM users WHERE id = %s", (user_id,))
+    row = cursor.fetchone()
+    return row["saldo"] if isinstance(row, dict) else row[0]
+
+
+def reset_all(cursor, reset_id: str) -> int:
+    """
+    Nolkan saldo semua user lewat ledger: satu baris kompensasi (reason
+    'reset', poin = -saldo) per user yang saldonya bukan 0, lalu saldo = 0,
+    sehingga SUM ledger tetap sama dengan users.saldo. Return jumlah user.
+    Tidak commit, sama seperti credit().
+    """
+    # Kunci dulu baris user agar kredit yang berjalan bersamaan menunggu reset selesai
+    cursor.execute("SELECT id, saldo FROM users WHERE saldo <> 0 ORDER BY id FOR UPDATE")
+    rows = cursor.fetchall()
+    entries = []
+    for row in rows:
+        user_id, saldo = (row["id"], row["saldo"]) if isinstance(row, dict) else row
+        entries.append((user_id, -saldo, "reset", idempotency_key("reset", reset_id, user_id)))
+    if entries:
+        cursor.executemany(
+            "INSERT INTO points_ledger (user_id, points, reason, idempotency_key) VALUES (%s, %s, %s, %s)",
+            entries,
+        )
+        cursor.execute("UPDATE users SET saldo = 0 WHERE saldo <> 0")
+    return len(entries)
+
+
+def current_saldo(cursor, user_id: int) -> Optional[int]:
+    cursor.execute("SELECT saldo FROM users WHERE id = %s", (user_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return row["saldo"] if isinstance(row, dict) else row[0]
+
+
+def reconcile(conn, apply: bool = False, batch_size: int = RECONCILE_BATCH_SIZE) -> dict:
+    """
+    Bandingkan users.saldo dengan SUM(points_ledger.points) per batch user
+    (urut id). Dengan apply=True baris user satu batch dikunci (FOR UPDATE)
+    lalu saldo yang selisih ditimpa dengan total ledger, satu commit per batch.
+    Kredit yang sedang berjalan aman: kredit yang belum commit menambah saldo
+    setelah batch ini selesai, yang sudah commit ikut terhitung di SUM.
+    """
+    cursor = conn.cursor()
+    result = {"users": 0, "mismatched": 0, "fixed": 0, "diff_total": 0, "samples": []}
+    last_id = 0
+    try:
+        while True:
+            # READ COMMITTED (hanya transaksi berikutnya): SUM membaca kredit yang sudah commit
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL READ COMMITTED")
+            cursor.execute(
+                "SELECT id, saldo FROM users WHERE id > %s ORDER BY id LIMIT %s" + (" FOR UPDATE" if apply else ""),
+                (last_id, batch_size),
+            )
+            users = cursor.fetchall()
+            if not users:
+                conn.rollback()
+                break
+            first_id, last_id = users[0][0], users[-1][0]
+            cursor.execute(
+                "SELECT user_id, SUM(points) FROM points_ledger WHERE user_id BETWEEN %s AND %s GROUP BY user_id",
+                (first_id, last_id),
+            )
+            totals = {user_id: int(total or 0) for user_id, total in cursor.fetchall()}
+            fixes = []
+            for user_id, saldo in users:
+                expected = totals.get(user_id, 0)
+                if expected == (saldo or 0):
+                    continue
+                fixes.append((expected, user_id))
+                result["diff_total"] += expected - (saldo or 0)
+                if len(result["samples"]) < RECONCILE_SAMPLE_LIMIT:
+                    result["samples"].append({"user_id": user_id, "saldo": saldo, "ledger": expected})
+            result["users"] += len(users)
+            result["mismatched"] += len(fixes)
+            if apply and fixes:
+                cursor.executemany("UPDATE users SET saldo = %s WHERE id = %s", fixes)
+                result["fixed"] += len(fixes)
+            conn.commit()
+        return result
+    finally:
+        cursor.close()
+
+
+def print_report(result: dict, apply: bool) -> None:
+    for sample in result["samples"]:
+        print(f"   user {sample['user_id']}: saldo {sample['saldo']} vs ledger {sample['ledger']}")
+    action = f"diperbaiki {result['fixed']}" if apply else "jalankan dengan --apply untuk memperbaiki"
+    print(
+        f"✅ [LEDGER] {result['users']} user dicek, {result['mismatched']} selisih "
+        f"(total {result['diff_total']:+d} poin); {action}"
+    )
+
+
+if __name__ == "__main__":
+    import db_pool
+
+    parser = argparse.ArgumentParser(description="Rekonsiliasi users.saldo dengan points_ledger")
+    parser.add_argument("--apply", action="store_true", help="Timpa saldo yang selisih dengan total ledger")
+    parser.add_argument("--batch-size", type=int, default=RECONCILE_BATCH_SIZE)
+    args = parser.parse_args()
+    connection = mysql.connector.connect(**db_pool.DB_CONFIG)
+    try:
+        print_report(reconcile(connection, apply=args.apply, batch_size=args.batch_size), args.apply)
+    finally:
+        connection.close()
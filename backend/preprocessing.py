@@ -0,0 +1,128 @@
+"""
+Preprocessing gambar bersama untuk model klasifikasi sampah (server,
+export_model.py dan skrip uji webcam): BGR -> resize 224x224 -> float32 0..1.
+
+Alur per scan dibuat minim alokasi:
+- decode JPEG langsung di skala kecil (IMREAD_REDUCED_*, setara mode
+  "draft" PIL): frame 1920x1080 cukup di-decode 1/4 karena hasilnya tetap
+  lebih besar dari 224x224, sehingga decode & resize jauh lebih murah;
+- resize ditulis ke buffer uint8 (4x lebih kecil dari float32);
+- konversi ke float32 dan pembagian 255 dilebur jadi satu operasi yang
+  menulis langsung ke buffer batch yang sudah dialokasikan (BatchBuffer).
+"""
+import os
+from typing import Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+IMG_SIZE = (224, 224)  # (lebar, tinggi) seperti argumen cv2.resize
+# 0 = selalu decode ukuran penuh (perilaku lama)
+PREPROCESS_REDUCED_DECODE = os.environ.get("PREPROCESS_REDUCED_DECODE", "1") == "1"
+
+_SCALE = np.float32(1.0 / 255.0)
+_REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+# Marker SOF (start of frame) JPEG yang memuat ukuran gambar
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def jpeg_size(data) -> Optional[Tuple[int, int]]:
+    """(lebar, tinggi) dari header JPEG tanpa decode; None jika bukan JPEG/header tidak terbaca."""
+    view = memoryview(data)
+    if len(view) < 4 or view[0] != 0xFF or view[1] != 0xD8:
+        return None
+    pos = 2
+    while pos + 9 < len(view):
+        if view[pos] != 0xFF:
+            return None
+        marker = view[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker in _JPEG_SOF_MARKERS:
+            height = (view[pos + 5] << 8) | view[pos + 6]
+            width = (view[pos + 7] << 8) | view[pos + 8]
+            return width, height
+        pos += 2 + ((view[pos + 2] << 8) | view[pos + 3])
+    return None
+
+
+def _reduced_flag(size: Optional[Tuple[int, int]], target: Tuple[int, int]) -> int:
+    """Faktor reduksi terbesar yang hasilnya masih >= target (tidak pernah upscale)."""
+    if not PREPROCESS_REDUCED_DECODE or size is None:
+        return cv2.IMREAD_COLOR
+    width, height = size
+    for factor, flag in _REDUCED_FLAGS:
+        if width // factor >= target[0] and height // factor >= target[1]:
+            return flag
+    return cv2.IMREAD_COLOR
+
+
+def decode(data, target: Tuple[int, int] = IMG_SIZE) -> Optional[np.ndarray]:
+    """Bytes JPEG/PNG -> frame BGR, di-decode pada skala terkecil yang cukup untuk `target`."""
+    if data is None or len(data) == 0:
+        return None
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    return cv2.imdecode(buffer, _reduced_flag(jpeg_size(buffer), target))
+
+
+def read(path: str, target: Tuple[int, int] = IMG_SIZE) -> Optional[np.ndarray]:
+    """Seperti cv2.imread, tetapi memakai decode skala kecil untuk JPEG."""
+    try:
+        data = np.fromfile(path, dtype=np.uint8)
+    except OSError:
+        return None
+    return decode(data, target)
+
+
+def resize(frame: np.ndarray, out: Optional[np.ndarray] = None, size: Tuple[int, int] = IMG_SIZE) -> np.ndarray:
+    """Frame BGR -> uint8 (tinggi, lebar, 3) ukuran model, opsional ditulis ke `out`."""
+    if frame.shape[1] == size[0] and frame.shape[0] == size[1]:
+        if out is None:
+            return frame
+        np.copyto(out, frame)
+        return out
+    return cv2.resize(frame, size, dst=out)
+
+
+class BatchBuffer:
+    """
+    Buffer input model (N, tinggi, lebar, 3) float32 yang dipakai ulang antar
+    panggilan. fill() mengembalikan view ke buffer: isinya tertimpa panggilan
+    berikutnya, jadi satu BatchBuffer hanya untuk satu thread (mis. worker batcher).
+    """
+
+    def __init__(self, max_batch: int = 1, size: Tuple[int, int] = IMG_SIZE):
+        self.size = size
+        self._allocate(max(1, max_batch))
+
+    def _allocate(self, capacity: int) -> None:
+        width, height = self.size
+        self._batch = np.empty((capacity, height, width, 3), dtype=np.float32)
+        self._scratch = np.empty((capacity, height, width, 3), dtype=np.uint8)
+
+    @property
+    def capacity(self) -> int:
+        return len(self._batch)
+
+    def fill(self, frames: Sequence[np.ndarray]) -> np.ndarray:
+        """Frame BGR (ukuran apa pun, atau uint8 yang sudah di-resize) -> view float32 (N, H, W, 3)."""
+        count = len(frames)
+        if count > self.capacity:
+            self._allocate(count)
+        for index, frame in enumerate(frames):
+            resize(frame, out=self._scratch[index], size=self.size)
+        batch = self._batch[:count]
+        # uint8 -> float32 dan / 255 dalam satu lintasan, langsung ke buffer
+        np.multiply(self._scratch[:count], _SCALE, out=batch, casting="unsafe")
+        return batch
+
+
+def prepare_batch(frames: Sequence[np.ndarray], size: Tuple[int, int] = IMG_SIZE) -> np.ndarray:
+    """N frame BGR -> array float32 (N, H, W, 3) baru (milik pemanggil)."""
+    return BatchBuffer(len(frames), size).fill(frames)
+
+
+def prepare(frame: np.ndarray, size: Tuple[int, int] = IMG_SIZE) -> np.ndarray:
+    """Satu frame BGR -> input model (H, W, 3) float32 0..1."""
+    return prepare_batch([frame], size)[0]
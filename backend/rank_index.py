@@ -0,0 +1,98 @@
+import threading
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from sortedcontainers import SortedList
+
+
+class RankIndex:
+    """
+    Peringkat saldo semua user di memori: SortedList berisi (-saldo, user_id),
+    jadi urutan list = urutan leaderboard (saldo terbesar dulu, id kecil dulu
+    jika seri). Top-K dan "peringkat saya" O(log n) tanpa query database.
+
+    Diisi dari `loader()` (iterable (user_id, saldo)) saat pertama dipakai,
+    diperbarui lewat update() setiap commit yang mengubah saldo, dan
+    disinkronkan ulang lewat replace() saat snapshot dashboard dimuat penuh.
+    """
+
+    def __init__(self, loader: Callable[[], Iterable[Tuple[int, int]]]):
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._keys = SortedList()
+        self._saldo = {}
+        self._loaded = False
+        self._stats = {"loads": 0, "updates": 0, "rank_queries": 0, "top_queries": 0}
+
+    # --- isi ---
+
+    def ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._load_lock:
+            if self._loaded:
+                return
+            self.replace(self.loader())
+
+    def preload(self) -> None:
+        """Muat saat startup; kegagalan (mis. MySQL belum siap) ditunda ke pemakaian pertama."""
+        try:
+            self.ensure_loaded()
+            print(f"✅ [RANK] Index peringkat dimuat ({len(self._saldo)} user)")
+        except Exception as exc:
+            print(f"⚠️ [RANK] Index peringkat belum dimuat: {exc}")
+
+    def replace(self, rows: Iterable[Tuple[int, int]]) -> None:
+        saldo = {int(user_id): int(value or 0) for user_id, value in rows}
+        keys = SortedList((-value, user_id) for user_id, value in saldo.items())
+        with self._lock:
+            self._saldo = saldo
+            self._keys = keys
+            self._loaded = True
+            self._stats["loads"] += 1
+
+    def update(self, user_id: int, saldo: int) -> None:
+        """Tambah user baru atau pindahkan posisinya setelah saldo berubah."""
+        saldo = int(saldo or 0)
+        with self._lock:
+            if not self._loaded:
+                return
+            old = self._saldo.get(user_id)
+            if old == saldo:
+                return
+            if old is not None:
+                self._keys.remove((-old, user_id))
+            self._keys.add((-saldo, user_id))
+            self._saldo[user_id] = saldo
+            self._stats["updates"] += 1
+
+    # --- baca ---
+
+    def top(self, k: int) -> List[Tuple[int, int]]:
+        """[(user_id, saldo)] peringkat 1..k."""
+        self.ensure_loaded()
+        with self._lock:
+            self._stats["top_queries"] += 1
+            return [(user_id, -negated) for negated, user_id in self._keys.islice(0, k)]
+
+    def rank(self, user_id: int) -> Optional[dict]:
+        """Peringkat 1-based user beserta selisih poin ke peringkat di atasnya; None jika tidak ada."""
+        self.ensure_loaded()
+        with self._lock:
+            self._stats["rank_queries"] += 1
+            saldo = self._saldo.get(user_id)
+            if saldo is None:
+                return None
+            position = self._keys.index((-saldo, user_id))
+            above = self._keys[position - 1] if position > 0 else None
+            return {
+                "user_id": user_id,
+                "saldo": saldo,
+                "rank": position + 1,
+                "total_users": len(self._keys),
+                "points_to_next": (-above[0] - saldo) if above else 0,
+            }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"loaded": self._loaded, "users": len(self._keys), **self._stats}
@@ -1,19 +1,35 @@
+import datetime
+
 import mysql.connector
 
-from app import _get_connection
+import points_ledger
+import stats_rollup
+from db_pool import get_connection
 
 
-def reset_trash_data():
-    conn = _get_connection()
+def reset_trash_data(conn=None) -> int:
+    """
+    Hapus log & nolkan saldo dalam satu transaksi. Saldo dinolkan lewat baris
+    kompensasi di points_ledger agar rekonsiliasi tetap cocok. Return jumlah
+    user yang saldonya direset.
+    """
+    owns_connection = conn is None
+    conn = conn or get_connection()
     cursor = conn.cursor()
     try:
         cursor.execute("DELETE FROM trash_logs")
-        cursor.execute("UPDATE users SET saldo = 0")
+        stats_rollup.clear(cursor)
+        reset_users = points_ledger.reset_all(cursor, datetime.datetime.now().strftime("%Y%m%d%H%M%S%f"))
         conn.commit()
-        print("✅ Data log & saldo berhasil direset.")
+        print(f"✅ Data log & saldo berhasil direset ({reset_users} user).")
+        return reset_users
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         cursor.close()
-        conn.close()
+        if owns_connection:
+            conn.close()
 
 
 if __name__ == "__main__":
@@ -21,4 +37,3 @@ if __name__ == "__main__":
         reset_trash_data()
     except mysql.connector.Error as exc:
         print(f"❌ Gagal reset data: {exc}")
-
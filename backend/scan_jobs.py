@@ -0,0 +1,138 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+SCAN_WORKERS = int(os.environ.get("SCAN_WORKERS", "4"))
+# Job yang sudah selesai disimpan sebentar agar ESP32/frontend sempat mengambil hasilnya
+JOB_TTL_SECONDS = int(os.environ.get("SCAN_JOB_TTL_SECONDS", "300"))
+MAX_LONG_POLL_SECONDS = 30.0
+
+FINAL_STATES = {"done", "failed"}
+
+
+class ScanJob:
+    __slots__ = ("id", "key", "state", "result", "http_status", "created_at", "updated_at", "meta")
+
+    def __init__(self, meta: Optional[dict] = None, key: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.state = "queued"
+        self.result = None
+        self.http_status = 202
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.meta = meta or {}
+
+    def snapshot(self) -> dict:
+        data = {
+            "job_id": self.id,
+            "state": self.state,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+        if self.state in FINAL_STATES and self.result is not None:
+            # Hasil akhir digabung di level atas agar format sama dengan respons scan sinkron
+            data.update(self.result)
+        else:
+            data.update({"status": "pending", "esp_command": "PENDING"})
+            data.update(self.meta)
+        return data
+
+
+class ScanJobQueue:
+    """
+    Antrean job scan: request hanya mendaftarkan job lalu langsung kembali,
+    capture/klasifikasi/simpan dikerjakan worker pool. Hasil dibaca lewat
+    get() atau wait() (long-poll) dengan job id.
+    """
+
+    def __init__(self, workers: int = SCAN_WORKERS, ttl_seconds: int = JOB_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="scan-job")
+        self._jobs = {}
+        self._by_key = {}  # idempotency key -> job id
+        self._cond = threading.Condition()
+        self._stats = {"submitted": 0, "done": 0, "failed": 0, "deduplicated": 0}
+
+    def submit(self, fn: Callable, *args, meta: Optional[dict] = None, key: Optional[str] = None) -> ScanJob:
+        """
+        `fn(job_queue, job, *args)` harus mengembalikan (payload_dict, http_status).
+        Jika `key` sama dengan job yang masih disimpan (mis. ESP32 mengirim ulang
+        setelah timeout), job lama dikembalikan dan tidak ada capture kedua.
+        """
+        with self._cond:
+            self._prune_locked()
+            existing = self._jobs.get(self._by_key.get(key)) if key else None
+            # Job gagal boleh diulang dengan key yang sama
+            if existing is not None and existing.state != "failed":
+                self._stats["deduplicated"] += 1
+                return existing
+            job = ScanJob(meta, key)
+            self._jobs[job.id] = job
+            if key:
+                self._by_key[key] = job.id
+            self._stats["submitted"] += 1
+        self._executor.submit(self._run, job, fn, args)
+        return job
+
+    def _run(self, job: ScanJob, fn: Callable, args: tuple) -> None:
+        try:
+            result, http_status = fn(self, job, *args)
+            self._finish(job, "done", result, http_status)
+        except Exception as exc:
+            print(f"❌ [SCAN-JOB] Job {job.id} gagal: {exc}")
+            self._finish(job, "failed", {"status": "error", "message": str(exc)}, 500)
+
+    def _finish(self, job: ScanJob, state: str, result: dict, http_status: int) -> None:
+        with self._cond:
+            job.state = state
+            job.result = result
+            job.http_status = http_status
+            job.updated_at = time.time()
+            self._stats[state] += 1
+            self._cond.notify_all()
+
+    def set_state(self, job: ScanJob, state: str) -> None:
+        with self._cond:
+            job.state = state
+            job.updated_at = time.time()
+            self._cond.notify_all()
+
+    def get(self, job_id: str) -> Optional[ScanJob]:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def wait(self, job_id: str, timeout: float) -> Optional[ScanJob]:
+        """Long-poll: tunggu sampai job selesai atau timeout, lalu kembalikan job."""
+        deadline = time.monotonic() + min(max(timeout, 0.0), MAX_LONG_POLL_SECONDS)
+        with self._cond:
+            job = self._jobs.get(job_id)
+            while job is not None and job.state not in FINAL_STATES:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return job
+
+    def _prune_locked(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        expired = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.state in FINAL_STATES and job.updated_at < cutoff
+        ]
+        for job_id in expired:
+            job = self._jobs.pop(job_id)
+            if job.key and self._by_key.get(job.key) == job_id:
+                del self._by_key[job.key]
+
+    def stats(self) -> dict:
+        with self._cond:
+            pending = sum(1 for job in self._jobs.values() if job.state not in FINAL_STATES)
+            return {"pending": pending, "tracked": len(self._jobs), **self._stats}
+
+
+job_queue = ScanJobQueue()
@@ -0,0 +1,189 @@
+import abc
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "memory").lower()
+SESSION_TTL_SECONDS = float(os.environ.get("SESSION_TTL_SECONDS", "900"))
+SESSION_SQLITE_PATH = os.environ.get(
+    "SESSION_SQLITE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "sessions.sqlite3")
+)
+SESSION_REDIS_URL = os.environ.get("SESSION_REDIS_URL", "redis://localhost:6379/0")
+SESSION_REDIS_PREFIX = "ecosmart:session:"
+# Kiosk tanpa identitas (firmware/frontend lama) berbagi satu session seperti dulu
+DEFAULT_KIOSK = "default"
+
+
+class SessionStore(abc.ABC):
+    """
+    Session aktif per kiosk (bin). Setiap session kedaluwarsa setelah TTL
+    kecuali diperbarui lewat set()/touch(). Backend: memory (satu proses),
+    sqlite (beberapa worker di satu mesin), redis (beberapa mesin).
+    """
+
+    name = "base"
+
+    @abc.abstractmethod
+    def get(self, kiosk_id: str) -> Optional[dict]:
+        ...
+
+    @abc.abstractmethod
+    def set(self, kiosk_id: str, session: dict, ttl: Optional[float] = None) -> None:
+        ...
+
+    @abc.abstractmethod
+    def delete(self, kiosk_id: str) -> None:
+        ...
+
+    @abc.abstractmethod
+    def all(self) -> dict:
+        """{kiosk_id: session} untuk semua session yang belum kedaluwarsa."""
+
+    def touch(self, kiosk_id: str, ttl: Optional[float] = None) -> bool:
+        session = self.get(kiosk_id)
+        if session is None:
+            return False
+        self.set(kiosk_id, session, ttl)
+        return True
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "active": len(self.all()), "ttl_seconds": SESSION_TTL_SECONDS}
+
+
+class MemorySessionStore(SessionStore):
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}  # kiosk_id -> (expires_at, session)
+
+    def get(self, kiosk_id: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._sessions.get(kiosk_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._sessions[kiosk_id]
+                return None
+            return dict(entry[1])
+
+    def set(self, kiosk_id: str, session: dict, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (ttl or SESSION_TTL_SECONDS)
+        with self._lock:
+            self._sessions[kiosk_id] = (expires_at, dict(session))
+
+    def delete(self, kiosk_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(kiosk_id, None)
+
+    def all(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            expired = [kiosk for kiosk, (expires_at, _) in self._sessions.items() if expires_at <= now]
+            for kiosk in expired:
+                del self._sessions[kiosk]
+            return {kiosk: dict(session) for kiosk, (_, session) in self._sessions.items()}
+
+
+class SqliteSessionStore(SessionStore):
+    """File SQLite (mode WAL) yang bisa dibagi beberapa proses worker Flask di satu mesin."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str = SESSION_SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "kiosk_id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3.Connection tidak aman dibagi antar thread: satu koneksi per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            self._local.conn = conn
+        return conn
+
+    def get(self, kiosk_id: str) -> Optional[dict]:
+        row = self._conn().execute(
+            "SELECT data FROM sessions WHERE kiosk_id = ? AND expires_at > ?", (kiosk_id, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, kiosk_id: str, session: dict, ttl: Optional[float] = None) -> None:
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO sessions (kiosk_id, data, expires_at) VALUES (?, ?, ?)",
+            (kiosk_id, json.dumps(session, default=str), time.time() + (ttl or SESSION_TTL_SECONDS)),
+        )
+        conn.commit()
+
+    def delete(self, kiosk_id: str) -> None:
+        conn = self._conn()
+        conn.execute("DELETE FROM sessions WHERE kiosk_id = ?", (kiosk_id,))
+        conn.commit()
+
+    def all(self) -> dict:
+        conn = self._conn()
+        now = time.time()
+        conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+        conn.commit()
+        rows = conn.execute("SELECT kiosk_id, data FROM sessions").fetchall()
+        return {kiosk: json.loads(data) for kiosk, data in rows}
+
+
+class RedisSessionStore(SessionStore):
+    """Redis (atau server kompatibel, mis. Valkey/KeyDB) dengan SETEX per kiosk."""
+
+    name = "redis"
+
+    def __init__(self, url: str = SESSION_REDIS_URL, prefix: str = SESSION_REDIS_PREFIX):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("SESSION_BACKEND=redis membutuhkan paket 'redis' (pip install redis)") from exc
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+
+    def get(self, kiosk_id: str) -> Optional[dict]:
+        data = self._client.get(self.prefix + kiosk_id)
+        return json.loads(data) if data else None
+
+    def set(self, kiosk_id: str, session: dict, ttl: Optional[float] = None) -> None:
+        seconds = max(1, int(ttl or SESSION_TTL_SECONDS))
+        self._client.setex(self.prefix + kiosk_id, seconds, json.dumps(session, default=str))
+
+    def delete(self, kiosk_id: str) -> None:
+        self._client.delete(self.prefix + kiosk_id)
+
+    def all(self) -> dict:
+        sessions = {}
+        for key in self._client.scan_iter(match=self.prefix + "*"):
+            data = self._client.get(key)
+            if data:
+                sessions[key[len(self.prefix):]] = json.loads(data)
+        return sessions
+
+
+_BACKENDS = {
+    "memory": MemorySessionStore,
+    "sqlite": SqliteSessionStore,
+    "redis": RedisSessionStore,
+}
+
+
+def create_store(backend: str = SESSION_BACKEND) -> SessionStore:
+    if backend not in _BACKENDS:
+        raise ValueError(f"SESSION_BACKEND tidak dikenal: {backend} (pilih: {', '.join(_BACKENDS)})")
+    return _BACKENDS[backend]()
+
+
+store = create_store()
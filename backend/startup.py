@@ -0,0 +1,25 @@
+import threading
+import time
+
+# Titik nol laporan startup: app.py mengimpor modul ini paling awal
+_STARTED_AT = time.perf_counter()
+_lock = threading.Lock()
+_marks = {}
+
+
+def mark(name: str) -> float:
+    """Catat detik sejak app mulai dimuat untuk tahap `name` (hanya catatan pertama yang dipakai)."""
+    elapsed = round(time.perf_counter() - _STARTED_AT, 3)
+    with _lock:
+        return _marks.setdefault(name, elapsed)
+
+
+def report() -> dict:
+    with _lock:
+        marks = dict(sorted(_marks.items(), key=lambda item: item[1]))
+    return {"marks_seconds": marks, "uptime_seconds": round(time.perf_counter() - _STARTED_AT, 1)}
+
+
+def print_report() -> None:
+    parts = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in report()["marks_seconds"].items())
+    print(f"⏱️ [STARTUP] {parts}")
@@ -0,0 +1,131 @@
+"""
+Tabel rollup trash_stats_rollup: jumlah log per (jenis sampah, lokasi) untuk
+bucket 'all' (sepanjang waktu), 'day' dan 'hour'. Diperbarui dalam transaksi
+yang sama dengan setiap INSERT trash_logs, sehingga statistik dashboard/chat
+cukup membaca beberapa baris bucket, bukan scan seluruh trash_logs.
+
+Jalankan `python stats_rollup.py` (atau `flask rebuild-stats`) untuk membangun
+ulang rollup dari trash_logs, mis. setelah tabel baru dibuat.
+"""
+import datetime
+
+import mysql.connector
+
+SCAN_TYPES = ("KERTAS", "ANORGANIK")
+UNKNOWN_LOCATION = "Tidak Diketahui"
+ALL_TIME_BUCKET = "1970-01-01 00:00:00"
+LOCATION_CHART_LIMIT = 5
+
+_BUCKET_EXPRESSIONS = {
+    "all": f"'{ALL_TIME_BUCKET}'",
+    "day": "DATE({ts})",
+    "hour": "DATE_FORMAT({ts}, '%%Y-%%m-%%d %%H:00:00')",
+}
+
+
+def record_log(cursor, trash_type: str, location: str) -> None:
+    """Tambah 1 ke semua bucket untuk log yang baru di-INSERT (panggil sebelum commit)."""
+    location = location or UNKNOWN_LOCATION
+    rows = []
+    params = []
+    for kind, expression in _BUCKET_EXPRESSIONS.items():
+        rows.append(f"('{kind}', {expression.format(ts='NOW()')}, %s, %s, 1)")
+        params.extend([trash_type, location])
+    cursor.execute(
+        "INSERT INTO trash_stats_rollup (bucket_kind, bucket_start, trash_type, location, cnt) "
+        f"VALUES {', '.join(rows)} "
+        "ON DUPLICATE KEY UPDATE cnt = cnt + 1",
+        tuple(params),
+    )
+
+
+def fetch_counts(cursor) -> tuple:
+    """Return (type_counts, location_counts) sepanjang waktu untuk jenis KERTAS/ANORGANIK."""
+    cursor.execute(
+        "SELECT trash_type, location, cnt FROM trash_stats_rollup "
+        "WHERE bucket_kind = 'all' AND trash_type IN ('KERTAS', 'ANORGANIK')"
+    )
+    type_counts = {}
+    location_counts = {}
+    for row in cursor.fetchall():
+        type_counts[row["trash_type"]] = type_counts.get(row["trash_type"], 0) + row["cnt"]
+        location_counts[row["location"]] = location_counts.get(row["location"], 0) + row["cnt"]
+    return type_counts, location_counts
+
+
+def fetch_stats(cursor) -> dict:
+    """Format sama dengan _build_stats lama: total_logs, kertas, anorganik, location_chart (top 5)."""
+    type_counts, location_counts = fetch_counts(cursor)
+    top_locations = sorted(location_counts.items(), key=lambda item: -item[1])[:LOCATION_CHART_LIMIT]
+    return {
+        "total_logs": sum(type_counts.get(t, 0) for t in SCAN_TYPES),
+        "kertas": type_counts.get("KERTAS", 0),
+        "anorganik": type_counts.get("ANORGANIK", 0),
+        "location_chart": [{"location": loc, "count": cnt} for loc, cnt in top_locations],
+    }
+
+
+def fetch_series(cursor, bucket_kind: str, since: datetime.datetime, location: str = None) -> list:
+    """Deret waktu per bucket 'day'/'hour' sejak `since`, dipecah per jenis sampah."""
+    if bucket_kind not in ("day", "hour"):
+        raise ValueError("bucket_kind harus 'day' atau 'hour'")
+    query = (
+        "SELECT bucket_start, trash_type, SUM(cnt) AS cnt FROM trash_stats_rollup "
+        "WHERE bucket_kind = %s AND bucket_start >= %s AND trash_type IN ('KERTAS', 'ANORGANIK')"
+    )
+    params = [bucket_kind, since]
+    if location:
+        query += " AND location = %s"
+        params.append(location)
+    query += " GROUP BY bucket_start, trash_type ORDER BY bucket_start"
+    cursor.execute(query, tuple(params))
+
+    series = {}
+    for row in cursor.fetchall():
+        bucket = row["bucket_start"]
+        key = bucket.isoformat() if hasattr(bucket, "isoformat") else str(bucket)
+        point = series.setdefault(key, {"bucket_start": key, "kertas": 0, "anorganik": 0})
+        point[row["trash_type"].lower()] = int(row["cnt"])
+    return list(series.values())
+
+
+def rebuild(conn) -> int:
+    """Hitung ulang seluruh rollup dari trash_logs dalam satu transaksi. Return jumlah baris rollup."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM trash_stats_rollup")
+        for kind, expression in _BUCKET_EXPRESSIONS.items():
+            bucket = expression.format(ts="timestamp").replace("%%", "%")
+            cursor.execute(
+                "INSERT INTO trash_stats_rollup (bucket_kind, bucket_start, trash_type, location, cnt) "
+                f"SELECT '{kind}', {bucket} AS bucket, trash_type, "
+                f"IFNULL(location_ip, '{UNKNOWN_LOCATION}') AS loc, COUNT(*) "
+                "FROM trash_logs GROUP BY bucket, trash_type, loc"
+            )
+        cursor.execute("SELECT COUNT(*) FROM trash_stats_rollup")
+        total = cursor.fetchone()[0]
+        conn.commit()
+        return total
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def clear(cursor) -> None:
+    cursor.execute("DELETE FROM trash_stats_rollup")
+
+
+if __name__ == "__main__":
+    from db_pool import get_connection
+
+    try:
+        conn = get_connection()
+        try:
+            rows = rebuild(conn)
+            print(f"✅ Rollup statistik dibangun ulang ({rows} bucket).")
+        finally:
+            conn.close()
+    except mysql.connector.Error as exc:
+        print(f"❌ Gagal membangun rollup: {exc}")
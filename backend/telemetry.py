@@ -0,0 +1,613 @@
+"""
+Time-series jarak ultrasonic per bin (fill level).
+
+Pembacaan dari /api/bin-update hanya di-append ke buffer memori (O(1), tanpa
+I/O di request). Thread writer mem-flush buffer tiap TELEMETRY_FLUSH_SECONDS:
+satu executemany ke bin_telemetry_raw dan satu upsert agregat ke
+bin_telemetry_rollup untuk resolusi 'minute' dan 'hour' (downsampling
+dihitung dari batch di memori, bukan dengan scan tabel raw). Data raw dan
+rollup menit dipangkas sesuai retensi; rollup jam disimpan permanen.
+
+Perangkat bisa mengirim banyak pembacaan sekaligus ke /api/bin-telemetry
+sebagai JSON array, NDJSON, atau format biner ringkas (lihat parse_binary).
+"""
+import collections
+import datetime
+import json
+import os
+import struct
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+from mysql.connector import errors as mysql_errors
+
+FLUSH_INTERVAL_SECONDS = float(os.environ.get("TELEMETRY_FLUSH_SECONDS", "5"))
+MAX_BATCH = int(os.environ.get("TELEMETRY_MAX_BATCH", "500"))
+MAX_BUFFER = int(os.environ.get("TELEMETRY_MAX_BUFFER", "20000"))
+RAW_RETENTION_HOURS = float(os.environ.get("TELEMETRY_RAW_RETENTION_HOURS", "48"))
+MINUTE_RETENTION_DAYS = float(os.environ.get("TELEMETRY_MINUTE_RETENTION_DAYS", "30"))
+PRUNE_INTERVAL_SECONDS = 600.0
+# Gagal koneksi/DB mati: batch dikembalikan ke buffer, paling banyak sekian kali berturut-turut
+MAX_FLUSH_RETRIES = int(os.environ.get("TELEMETRY_MAX_FLUSH_RETRIES", "20"))
+# Pembacaan yang ditolak MySQL (data rusak) atau gagal terus ditulis ke sini (JSON per baris)
+DEAD_LETTER_PATH = os.environ.get(
+    "TELEMETRY_DEAD_LETTER_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "log_archive", "telemetry_dead_letter.jsonl"),
+)
+# Batch firmware yang dikirim ulang (respons hilang/timeout) memakai id yang sama (header X-Telemetry-Batch)
+BATCH_DEDUPE_SECONDS = float(os.environ.get("TELEMETRY_BATCH_DEDUPE_SECONDS", "900"))
+BATCH_DEDUPE_MAX_ENTRIES = 4096
+MAX_BATCH_ID_LENGTH = 64
+# Error yang bisa sembuh sendiri (koneksi putus, pool penuh); selain ini dianggap data yang salah
+TRANSIENT_ERRORS = (mysql_errors.OperationalError, mysql_errors.InterfaceError, mysql_errors.PoolError)
+
+MAX_BATCH_READINGS = int(os.environ.get("TELEMETRY_MAX_BATCH_READINGS", "1000"))
+MIN_DISTANCE_CM = 0
+MAX_DISTANCE_CM = 1000
+DEFAULT_STATUS = "terisi"
+# Sesuai lebar kolom bin_telemetry_raw.bin_id / status (migrasi 006)
+MAX_DEVICE_ID_LENGTH = 64
+MAX_STATUS_LENGTH = 32
+# Timestamp di luar jendela ini dianggap jam perangkat salah
+MAX_READING_AGE = datetime.timedelta(days=7)
+MAX_CLOCK_SKEW = datetime.timedelta(minutes=5)
+
+# Format biner (little-endian): "EB", versi (u8), panjang device_id (u8), device_id,
+# lalu N record 6 byte: umur pembacaan dalam ms relatif waktu kirim (u32), jarak mm (u16)
+BINARY_MAGIC = b"EB"
+BINARY_VERSION = 1
+BINARY_CONTENT_TYPES = ("application/octet-stream", "application/x-ecosmart-telemetry")
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+_BINARY_HEADER = struct.Struct("<2sBB")
+_BINARY_RECORD = struct.Struct("<IH")
+
+RESOLUTIONS = ("raw", "minute", "hour")
+# Resolusi otomatis: rentang <= 2 jam pakai raw, <= 3 hari pakai menit, selebihnya jam
+_AUTO_RESOLUTION = ((datetime.timedelta(hours=2), "raw"), (datetime.timedelta(days=3), "minute"))
+
+
+def _bucket(ts: datetime.datetime, resolution: str) -> datetime.datetime:
+    if resolution == "minute":
+        return ts.replace(second=0, microsecond=0)
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def downsample(readings: Iterable[tuple], resolution: str) -> dict:
+    """
+    Agregasi (bin_id, ts, distance_cm, status) ke bucket menit/jam.
+    Return {(bin_id, bucket_start): [samples, sum, min, max, last_ts, last]}.
+    """
+    buckets = {}
+    for bin_id, ts, distance, _status in readings:
+        key = (bin_id, _bucket(ts, resolution))
+        agg = buckets.get(key)
+        if agg is None:
+            buckets[key] = [1, distance, distance, distance, ts, distance]
+            continue
+        agg[0] += 1
+        agg[1] += distance
+        agg[2] = min(agg[2], distance)
+        agg[3] = max(agg[3], distance)
+        if ts >= agg[4]:
+            agg[4], agg[5] = ts, distance
+    return buckets
+
+
+class BatchError(ValueError):
+    """Body batch tidak bisa dibaca sama sekali (format rusak, terlalu besar)."""
+
+
+def validate_distance(value) -> float:
+    """Aturan yang sama dengan /api/bin-update. ValueError berisi pesan untuk klien."""
+    try:
+        distance = float(value)
+    except (ValueError, TypeError):
+        raise ValueError("distance_cm must be a number")
+    if distance != distance or distance < MIN_DISTANCE_CM or distance > MAX_DISTANCE_CM:
+        raise ValueError("distance_cm out of range")
+    return distance
+
+
+def validate_device_id(value) -> str:
+    """device_id dari firmware: string tidak kosong (setelah strip), sama seperti _resolve_bin."""
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError("device_id must be a non-empty string")
+    value = value.strip()
+    if len(value) > MAX_DEVICE_ID_LENGTH:
+        raise ValueError(f"device_id max {MAX_DEVICE_ID_LENGTH} characters")
+    return value
+
+
+def validate_status(value) -> str:
+    if value is None or value == "":
+        return DEFAULT_STATUS
+    if not isinstance(value, str):
+        raise ValueError("status must be a string")
+    if len(value) > MAX_STATUS_LENGTH:
+        raise ValueError(f"status max {MAX_STATUS_LENGTH} characters")
+    return value
+
+
+def parse_json(body: bytes) -> tuple:
+    try:
+        payload = json.loads(body or b"null")
+    except ValueError as exc:
+        raise BatchError(f"JSON tidak valid: {exc}")
+    if isinstance(payload, list):
+        return None, payload, []
+    if isinstance(payload, dict) and isinstance(payload.get("readings"), list):
+        return payload.get("device_id"), payload["readings"], []
+    if isinstance(payload, dict) and "distance_cm" in payload:
+        return payload.get("device_id"), [payload], []
+    raise BatchError("Body harus array pembacaan atau {device_id, readings: [...]}")
+
+
+def parse_ndjson(body: bytes) -> tuple:
+    items = []
+    errors = []
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            items.append(json.loads(line))
+        except ValueError:
+            errors.append({"index": len(items), "message": "baris NDJSON tidak valid"})
+            items.append(None)
+    return None, items, errors
+
+
+def parse_binary(body: bytes) -> tuple:
+    if len(body) < _BINARY_HEADER.size:
+        raise BatchError("Body biner terlalu pendek")
+    magic, version, id_len = _BINARY_HEADER.unpack_from(body)
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise BatchError("Header biner tidak dikenal")
+    offset = _BINARY_HEADER.size + id_len
+    device_id = body[_BINARY_HEADER.size:offset].decode("utf-8", "replace") or None
+    records = body[offset:]
+    if len(records) % _BINARY_RECORD.size:
+        raise BatchError("Panjang record biner tidak valid")
+    items = [
+        {"age_ms": age_ms, "distance_cm": distance_mm / 10.0}
+        for age_ms, distance_mm in _BINARY_RECORD.iter_unpack(records)
+    ]
+    return device_id, items, []
+
+
+def parse_batch(body: bytes, content_type: Optional[str]) -> tuple:
+    """Return (device_id | None, items, errors) sesuai Content-Type (JSON, NDJSON atau biner)."""
+    content_type = (content_type or "").lower()
+    if content_type in BINARY_CONTENT_TYPES:
+        return parse_binary(body)
+    if content_type in NDJSON_CONTENT_TYPES:
+        return parse_ndjson(body)
+    return parse_json(body)
+
+
+def _reading_time(item: dict, received_at: datetime.datetime) -> datetime.datetime:
+    if item.get("age_ms") is not None:
+        return received_at - datetime.timedelta(milliseconds=float(item["age_ms"]))
+    ts = item.get("ts")
+    if ts is None:
+        return received_at
+    if isinstance(ts, (int, float)):
+        return datetime.datetime.fromtimestamp(ts)
+    return parse_local_datetime(str(ts))
+
+
+def parse_local_datetime(value: str) -> datetime.datetime:
+    """ISO (boleh berakhiran Z / offset) -> waktu lokal server tanpa tzinfo, seperti kolom DATETIME."""
+    parsed = datetime.datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    return parsed.astimezone().replace(tzinfo=None) if parsed.tzinfo else parsed
+
+
+def validate_readings(items: list, default_device: str, received_at: Optional[datetime.datetime] = None,
+                      errors: Optional[list] = None) -> tuple:
+    """
+    Validasi satu kali jalan. Return (readings [(bin_id, ts, distance_cm, status)], errors).
+    Pembacaan yang tidak valid dilewati dan dilaporkan per index; sisanya tetap diterima.
+    """
+    received_at = received_at or datetime.datetime.now()
+    errors = list(errors or [])
+    if len(items) > MAX_BATCH_READINGS:
+        raise BatchError(f"Maksimal {MAX_BATCH_READINGS} pembacaan per batch")
+    readings = []
+    for index, item in enumerate(items):
+        if item is None:
+            continue  # baris rusak, sudah dicatat parser
+        if not isinstance(item, dict):
+            errors.append({"index": index, "message": "pembacaan harus object"})
+            continue
+        try:
+            distance = validate_distance(item.get("distance_cm"))
+            ts = _reading_time(item, received_at)
+            device_id = item.get("device_id")
+            bin_id = validate_device_id(default_device if device_id is None or device_id == "" else device_id)
+            status = validate_status(item.get("status"))
+        except (ValueError, TypeError, OverflowError, OSError) as exc:
+            errors.append({"index": index, "message": str(exc)})
+            continue
+        if ts < received_at - MAX_READING_AGE or ts > received_at + MAX_CLOCK_SKEW:
+            errors.append({"index": index, "message": "timestamp out of range"})
+            continue
+        readings.append((bin_id, ts, distance, status))
+    return readings, errors
+
+
+class BatchDeduper:
+    """
+    Id batch yang sudah diterima per bin (LRU + TTL, di memori seperti buffer
+    writer). Firmware mengirim umur pembacaan relatif terhadap waktu kirim,
+    sehingga batch yang di-retry menghasilkan timestamp berbeda dan tidak
+    tertangkap oleh cek (bin_id, ts) di write_batch; id batch yang sama ditolak di sini.
+    """
+
+    def __init__(self, ttl_seconds: float = BATCH_DEDUPE_SECONDS, max_entries: int = BATCH_DEDUPE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._seen = collections.OrderedDict()  # (bin_id, batch_id) -> waktu diterima (monotonic)
+        self._stats = {"claimed": 0, "duplicates": 0}
+
+    def claim(self, bin_id: str, batch_id: str) -> bool:
+        """True jika batch baru (dan dicatat); False jika id ini sudah diterima dalam TTL."""
+        key = (bin_id, batch_id)
+        now = time.monotonic()
+        with self._lock:
+            while self._seen:
+                claimed_at = next(iter(self._seen.values()))
+                if now - claimed_at < self.ttl_seconds and len(self._seen) < self.max_entries:
+                    break
+                self._seen.popitem(last=False)
+            if key in self._seen:
+                self._stats["duplicates"] += 1
+                return False
+            self._seen[key] = now
+            self._stats["claimed"] += 1
+            return True
+
+    def release(self, bin_id: str, batch_id: str) -> None:
+        """Batch yang akhirnya ditolak seluruhnya boleh dikirim ulang dengan id yang sama."""
+        with self._lock:
+            self._seen.pop((bin_id, batch_id), None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"tracked": len(self._seen), "ttl_seconds": self.ttl_seconds, **self._stats}
+
+
+def latest_per_bin(readings: Iterable[tuple]) -> dict:
+    """{bin_id: pembacaan terbaru} untuk memperbarui registry sekali per bin."""
+    latest = {}
+    for reading in readings:
+        current = latest.get(reading[0])
+        if current is None or reading[1] >= current[1]:
+            latest[reading[0]] = reading
+    return latest
+
+
+class TelemetryWriter:
+    """Buffer pembacaan + thread flush batch ke MySQL. `connect()` mengembalikan koneksi (pool)."""
+
+    def __init__(self, connect: Callable, flush_interval: float = FLUSH_INTERVAL_SECONDS,
+                 max_batch: int = MAX_BATCH, max_buffer: int = MAX_BUFFER):
+        self.connect = connect
+        self.flush_interval = flush_interval
+        self.max_batch = max(1, max_batch)
+        self._buffer = collections.deque(maxlen=max(1, max_buffer))
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._last_prune = 0.0
+        self._retries = 0  # flush gagal (transient) berturut-turut
+        self._stats = {
+            "recorded": 0,
+            "written": 0,
+            "flushes": 0,
+            "flush_errors": 0,
+            "dropped": 0,
+            "dead_lettered": 0,
+            "duplicates": 0,
+            "last_flush_ms": None,
+        }
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+                self._thread.start()
+
+    def record(self, bin_id: str, distance_cm: float, status: Optional[str] = None,
+               ts: Optional[datetime.datetime] = None) -> None:
+        self.record_many([(bin_id, ts or datetime.datetime.now(), float(distance_cm), status)])
+
+    def record_many(self, readings: Iterable[tuple]) -> int:
+        """Append banyak (bin_id, ts, distance_cm, status) sekaligus. Return jumlah yang diterima."""
+        self._ensure_started()
+        count = 0
+        with self._cond:
+            for reading in readings:
+                if len(self._buffer) == self._buffer.maxlen:
+                    # Buffer penuh (DB mati lama): deque membuang pembacaan tertua
+                    self._stats["dropped"] += 1
+                self._buffer.append(reading)
+                count += 1
+            self._stats["recorded"] += count
+            if len(self._buffer) >= self.max_batch:
+                self._cond.notify()
+        return count
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if len(self._buffer) < self.max_batch:
+                    self._cond.wait(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as exc:
+                print(f"⚠️ [TELEMETRY] Flush gagal: {exc}")
+                time.sleep(self.flush_interval)
+
+    def _drain(self) -> list:
+        with self._cond:
+            batch = list(self._buffer)
+            self._buffer.clear()
+        return batch
+
+    def _requeue(self, batch: list) -> None:
+        with self._cond:
+            self._requeue_locked(batch)
+
+    def _requeue_locked(self, batch: list) -> None:
+        room = self._buffer.maxlen - len(self._buffer)
+        keep = batch[-room:] if room > 0 else []
+        self._stats["dropped"] += len(batch) - len(keep)
+        self._buffer.extendleft(reversed(keep))
+
+    def _write(self, batch: list) -> int:
+        """Tulis satu batch dalam satu transaksi. Return jumlah pembacaan baru (tanpa duplikat)."""
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            try:
+                inserted = write_batch(cursor, batch)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        finally:
+            conn.close()
+        with self._cond:
+            self._stats["duplicates"] += len(batch) - inserted
+        return inserted
+
+    def _write_rows(self, batch: list) -> int:
+        """
+        Batch ditolak karena data: tulis per baris agar hanya pembacaan yang
+        rusak yang disisihkan ke dead-letter. Return jumlah baris yang ditulis.
+        """
+        written = 0
+        rejected = []
+        for index, reading in enumerate(batch):
+            try:
+                inserted = self._write([reading])
+            except TRANSIENT_ERRORS as exc:
+                # Koneksi putus di tengah jalan: sisa batch dicoba lagi di flush berikutnya
+                print(f"⚠️ [TELEMETRY] Flush per baris terhenti: {exc}")
+                with self._cond:
+                    self._stats["flush_errors"] += 1
+                    self._requeue_locked(batch[index:])
+                break
+            except Exception as exc:
+                rejected.append((reading, exc))
+                continue
+            written += inserted
+        if rejected:
+            self._dead_letter(rejected)
+        return written
+
+    def _dead_letter(self, rejected: list) -> None:
+        print(f"⚠️ [TELEMETRY] {len(rejected)} pembacaan ditolak, dipindah ke {DEAD_LETTER_PATH}")
+        try:
+            os.makedirs(os.path.dirname(DEAD_LETTER_PATH), exist_ok=True)
+            with open(DEAD_LETTER_PATH, "a", encoding="utf-8") as handle:
+                for (bin_id, ts, distance, status), exc in rejected:
+                    record = {"bin_id": bin_id, "ts": ts, "distance_cm": distance, "status": status, "error": str(exc)}
+                    handle.write(json.dumps(record, default=str, ensure_ascii=False) + "\n")
+        except OSError as exc:
+            print(f"⚠️ [TELEMETRY] Dead-letter gagal ditulis: {exc}")
+        with self._cond:
+            self._stats["dead_lettered"] += len(rejected)
+
+    def flush(self) -> int:
+        """Tulis semua pembacaan yang di-buffer. Return jumlah baris raw yang ditulis."""
+        with self._flush_lock:
+            batch = self._drain()
+            if not batch:
+                self._maybe_prune()
+                return 0
+            started = time.perf_counter()
+            try:
+                written = self._write(batch)
+            except TRANSIENT_ERRORS as exc:
+                with self._cond:
+                    self._stats["flush_errors"] += 1
+                    self._retries += 1
+                    give_up = self._retries > MAX_FLUSH_RETRIES
+                    if give_up:
+                        self._retries = 0
+                    else:
+                        self._requeue_locked(batch)
+                if give_up:
+                    self._dead_letter([(reading, exc) for reading in batch])
+                raise
+            except Exception as exc:
+                # DataError/ProgrammingError dsb.: mengulang batch yang sama tidak akan berhasil
+                print(f"⚠️ [TELEMETRY] Batch ditolak ({exc}), ditulis ulang per baris")
+                with self._cond:
+                    self._stats["flush_errors"] += 1
+                written = self._write_rows(batch)
+            with self._cond:
+                self._retries = 0
+                self._stats["written"] += written
+                self._stats["flushes"] += 1
+                self._stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            self._maybe_prune()
+            return written
+
+    def _maybe_prune(self) -> None:
+        if time.monotonic() - self._last_prune < PRUNE_INTERVAL_SECONDS:
+            return
+        self._last_prune = time.monotonic()
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            try:
+                prune(cursor)
+                conn.commit()
+            finally:
+                cursor.close()
+        finally:
+            conn.close()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "buffered": len(self._buffer),
+                "flush_interval_seconds": self.flush_interval,
+                "retries": self._retries,
+                **self._stats,
+            }
+
+
+def _to_millis(ts: datetime.datetime) -> datetime.datetime:
+    # Presisi kolom DATETIME(3); tanpa ini ts Python (mikrodetik) tidak cocok dengan yang tersimpan
+    return ts.replace(microsecond=ts.microsecond // 1000 * 1000)
+
+
+def _new_readings(cursor, batch: list) -> list:
+    """
+    Pembacaan yang (bin_id, ts)-nya belum ada di raw, tanpa duplikat di dalam
+    batch (yang pertama dipakai, sama seperti INSERT IGNORE). Rentang ts per
+    bin dikunci FOR UPDATE sampai commit sehingga writer lain tidak bisa
+    menyisipkan pembacaan yang sama di antara cek dan INSERT.
+    """
+    unique = {}
+    for bin_id, ts, distance, status in batch:
+        ts = _to_millis(ts)
+        unique.setdefault((bin_id, ts), (bin_id, ts, distance, status))
+    ranges = {}
+    for bin_id, ts in unique:
+        low, high = ranges.get(bin_id, (ts, ts))
+        ranges[bin_id] = (min(low, ts), max(high, ts))
+    existing = set()
+    for bin_id, (low, high) in ranges.items():
+        cursor.execute(
+            "SELECT ts FROM bin_telemetry_raw WHERE bin_id = %s AND ts BETWEEN %s AND %s FOR UPDATE",
+            (bin_id, low, high),
+        )
+        existing.update((bin_id, row[0]) for row in cursor.fetchall())
+    return [reading for key, reading in unique.items() if key not in existing]
+
+
+def write_batch(cursor, batch: list) -> int:
+    """
+    INSERT raw + upsert rollup menit & jam. Rollup hanya dihitung dari
+    pembacaan yang benar-benar baru di raw: batch yang di-requeue atau dikirim
+    ulang dengan timestamp yang sama tidak menambah samples/sum_cm dua kali.
+    Pembacaan yang lebih tua dari retensi raw tidak bisa dicek duplikatnya.
+    Return jumlah pembacaan baru.
+    """
+    fresh = _new_readings(cursor, batch)
+    if not fresh:
+        return 0
+    cursor.executemany(
+        "INSERT INTO bin_telemetry_raw (bin_id, ts, distance_cm, status) VALUES (%s, %s, %s, %s)",
+        fresh,
+    )
+    rows = []
+    for resolution in ("minute", "hour"):
+        for (bin_id, bucket_start), (samples, total, low, high, last_ts, last) in downsample(fresh, resolution).items():
+            rows.append((resolution, bin_id, bucket_start, samples, total, low, high, last, last_ts))
+    # last_cm hanya diganti oleh pembacaan yang lebih baru (batch terlambat tidak menimpa);
+    # MySQL mengevaluasi SET berurutan, jadi last_cm harus sebelum last_ts
+    cursor.executemany(
+        """
+        INSERT INTO bin_telemetry_rollup
+            (resolution, bin_id, bucket_start, samples, sum_cm, min_cm, max_cm, last_cm, last_ts)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            samples = samples + VALUES(samples),
+            sum_cm = sum_cm + VALUES(sum_cm),
+            min_cm = LEAST(min_cm, VALUES(min_cm)),
+            max_cm = GREATEST(max_cm, VALUES(max_cm)),
+            last_cm = IF(last_ts IS NULL OR VALUES(last_ts) >= last_ts, VALUES(last_cm), last_cm),
+            last_ts = GREATEST(COALESCE(last_ts, VALUES(last_ts)), VALUES(last_ts))
+        """,
+        rows,
+    )
+    return len(fresh)
+
+
+def prune(cursor, now: Optional[datetime.datetime] = None) -> None:
+    now = now or datetime.datetime.now()
+    cursor.execute(
+        "DELETE FROM bin_telemetry_raw WHERE ts < %s",
+        (now - datetime.timedelta(hours=RAW_RETENTION_HOURS),),
+    )
+    cursor.execute(
+        "DELETE FROM bin_telemetry_rollup WHERE resolution = 'minute' AND bucket_start < %s",
+        (now - datetime.timedelta(days=MINUTE_RETENTION_DAYS),),
+    )
+
+
+def pick_resolution(since: datetime.datetime, until: datetime.datetime) -> str:
+    span = until - since
+    for limit, resolution in _AUTO_RESOLUTION:
+        if span <= limit:
+            return resolution
+    return "hour"
+
+
+def fetch_history(cursor, bin_id: str, since: datetime.datetime, until: datetime.datetime,
+                  resolution: str = "auto") -> dict:
+    """Riwayat fill level satu bin. Cursor dictionary. Return {resolution, points}."""
+    if resolution == "auto":
+        resolution = pick_resolution(since, until)
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"resolution harus salah satu dari: auto, {', '.join(RESOLUTIONS)}")
+
+    if resolution == "raw":
+        cursor.execute(
+            "SELECT ts, distance_cm, status FROM bin_telemetry_raw "
+            "WHERE bin_id = %s AND ts >= %s AND ts < %s ORDER BY ts",
+            (bin_id, since, until),
+        )
+        points = [
+            {"ts": row["ts"].isoformat(), "distance_cm": row["distance_cm"], "status": row["status"]}
+            for row in cursor.fetchall()
+        ]
+    else:
+        cursor.execute(
+            "SELECT bucket_start, samples, sum_cm, min_cm, max_cm, last_cm FROM bin_telemetry_rollup "
+            "WHERE resolution = %s AND bin_id = %s AND bucket_start >= %s AND bucket_start < %s "
+            "ORDER BY bucket_start",
+            (resolution, bin_id, _bucket(since, resolution), until),
+        )
+        points = [
+            {
+                "ts": row["bucket_start"].isoformat(),
+                "avg_cm": round(row["sum_cm"] / row["samples"], 2) if row["samples"] else None,
+                "min_cm": row["min_cm"],
+                "max_cm": row["max_cm"],
+                "last_cm": row["last_cm"],
+                "samples": row["samples"],
+            }
+            for row in cursor.fetchall()
+        ]
+    return {"bin_id": bin_id, "resolution": resolution, "points": points}
@@ -1,64 +1,163 @@
 import os
-import tensorflow as tf
-import cv2
+import threading
+import time
+from typing import Callable, Optional
+
 import numpy as np
 
-MODEL_PATH = os.path.join("models", "model_sampah_csv_custom.h5")
-IMG_SIZE = (224, 224)
+import inference_runtime
+import preprocessing
+from inference_batcher import MicroBatcher
+
+MODEL_PATH = inference_runtime.KERAS_MODEL_PATH
+IMG_SIZE = preprocessing.IMG_SIZE
 CLASSES = ["Anorganik Lain", "Kertas/Tisu"]
 THRESHOLD = 0.7
 
+# Micro-batching: request bersamaan digabung jadi satu forward pass
+INFERENCE_MAX_BATCH = int(os.environ.get("INFERENCE_MAX_BATCH", "8"))
+INFERENCE_MAX_WAIT_MS = float(os.environ.get("INFERENCE_MAX_WAIT_MS", "10"))
+INFERENCE_TIMEOUT_SECONDS = float(os.environ.get("INFERENCE_TIMEOUT_SECONDS", "30"))
+
 model = None
+_batcher = None
+_batcher_lock = threading.Lock()
+# Hanya dipakai worker batcher (satu thread): input batch tanpa alokasi baru per scan
+_batch_buffer = preprocessing.BatchBuffer(INFERENCE_MAX_BATCH)
+_model_lock = threading.Lock()
+_warmup_lock = threading.Lock()
+_warmup_thread = None
+# cold -> loading -> ready | failed
+_model_status = {"state": "cold", "load_seconds": None, "error": None}
 
 
 def load_model_once():
+    """
+    Muat model sekali (thread-safe) lalu jalankan satu forward pass dummy agar
+    request pertama tidak ikut membayar inisialisasi graph. Runtime dipilih
+    inference_runtime (TFLite/ONNX jika sudah di-export, selain itu Keras);
+    TensorFlow baru diimpor di sini jika memang dibutuhkan.
+    """
     global model
-    if model is None:
-        print("⏳ [AI] Loading Model TensorFlow... (Tunggu sebentar)")
-        try:
-            model = tf.keras.models.load_model(MODEL_PATH)
-            print("✅ [AI] Model Loaded!")
-        except Exception as exc:
-            print(f"❌ [AI] Error Load Model: {exc}")
-            return False
+    if model is not None:
+        return True
+    with _model_lock:
+        if model is None:
+            print("⏳ [AI] Loading Model... (Tunggu sebentar)")
+            _model_status.update(state="loading", error=None)
+            started = time.perf_counter()
+            try:
+                loaded = inference_runtime.load_runtime()
+                loaded.predict_batch(np.zeros((1, IMG_SIZE[1], IMG_SIZE[0], 3), dtype="float32"))
+                model = loaded
+            except Exception as exc:
+                _model_status.update(state="failed", error=str(exc))
+                print(f"❌ [AI] Error Load Model: {exc}")
+                return False
+            _model_status.update(state="ready", load_seconds=round(time.perf_counter() - started, 2))
+            print(f"✅ [AI] Model Loaded! ({_model_status['load_seconds']}s)")
     return True
 
 
+def warm_up_async(on_done: Optional[Callable[[bool], None]] = None) -> Optional[threading.Thread]:
+    """Mulai load_model_once() di thread background (idempotent). on_done(ok) dipanggil setelahnya."""
+    global _warmup_thread
+    with _warmup_lock:
+        if model is not None or _model_status["state"] == "failed":
+            return None
+        if _warmup_thread is not None and _warmup_thread.is_alive():
+            return _warmup_thread
+
+        def run():
+            ok = load_model_once()
+            if on_done:
+                on_done(ok)
+
+        _warmup_thread = threading.Thread(target=run, name="model-warmup", daemon=True)
+        _warmup_thread.start()
+        return _warmup_thread
+
+
+def is_ready() -> bool:
+    return model is not None
+
+
+def model_status() -> dict:
+    runtime = model.describe() if model is not None else {"backend": None, "model": None}
+    return {**_model_status, **runtime}
+
+
 def _map_index_to_label(idx: int) -> str:
     if idx == 1:
         return "KERTAS"
     return "ANORGANIK"
 
 
+def _run_model_batch(inputs: list) -> list:
+    """Satu forward pass untuk N frame uint8 yang sudah di-resize (normalisasi dilakukan di sini)."""
+    batch = _batch_buffer.fill(inputs)
+    predictions = model.predict_batch(batch)
+    return [predictions[i] for i in range(len(inputs))]
+
+
+def _get_batcher() -> MicroBatcher:
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = MicroBatcher(
+                    _run_model_batch,
+                    max_batch_size=INFERENCE_MAX_BATCH,
+                    max_wait_ms=INFERENCE_MAX_WAIT_MS,
+                    name="INFERENCE",
+                )
+    return _batcher
+
+
+def inference_stats() -> dict:
+    stats = _get_batcher().stats()
+    stats["model_loaded"] = model is not None
+    stats["model_state"] = _model_status["state"]
+    stats["backend"] = model.name if model is not None else None
+    return stats
+
+
+def _model_name() -> str:
+    return os.path.basename(model.path) if model is not None else os.path.basename(MODEL_PATH)
+
+
+def _error_result(message: str) -> dict:
+    return {
+        "label": "ERROR",
+        "confidence": 0.0,
+        "model": _model_name(),
+        "details": {"error": message},
+    }
+
+
+def decode_image_bytes(data: bytes):
+    """Decode bytes JPEG/PNG ke array BGR, di skala terkecil yang cukup untuk model. None jika gagal."""
+    return preprocessing.decode(data)
+
+
 def predict_image(image_path: str) -> dict:
-    if not load_model_once():
-        return {
-            "label": "ERROR",
-            "confidence": 0.0,
-            "model": os.path.basename(MODEL_PATH),
-            "details": {"error": "Model gagal diload"},
-        }
-
-    img = cv2.imread(image_path)
+    img = preprocessing.read(image_path)
     if img is None:
-        return {
-            "label": "ERROR",
-            "confidence": 0.0,
-            "model": os.path.basename(MODEL_PATH),
-            "details": {"error": "Gambar tidak ditemukan"},
-        }
-
-    img_resized = cv2.resize(img, IMG_SIZE)
-    img_array = img_resized.astype("float32") / 255.0
-    img_array = np.expand_dims(img_array, axis=0)
-
-    prediction = model.predict(img_array)
-    raw = np.squeeze(prediction)
-    prediction_list = raw.tolist() if hasattr(raw, "tolist") else [float(raw)]
+        return _error_result("Gambar tidak ditemukan")
+    return predict_array(img)
 
-    label = "ANORGANIK"
-    confidence = 0.0
 
+def predict_bytes(data: bytes) -> dict:
+    """Klasifikasi dari bytes gambar ter-encode (upload/kamera) tanpa menulis ke disk."""
+    img = decode_image_bytes(data)
+    if img is None:
+        return _error_result("Gambar tidak valid")
+    return predict_array(img)
+
+
+def interpret(raw: np.ndarray) -> tuple:
+    """Output model (sigmoid 1 nilai atau softmax per kelas) -> (label, confidence)."""
+    raw = np.squeeze(raw)
     if raw.size == 1:
         score = float(raw)
         label = "KERTAS" if score >= THRESHOLD else "ANORGANIK"
@@ -67,14 +166,28 @@ def predict_image(image_path: str) -> dict:
         best_idx = int(np.argmax(raw))
         label = _map_index_to_label(best_idx)
         confidence = float(raw[best_idx])
+    return label, max(0.0, min(confidence, 1.0))
+
 
-    confidence = max(0.0, min(confidence, 1.0))
+def predict_array(img: np.ndarray) -> dict:
+    """Klasifikasi dari frame BGR yang sudah di-decode (mis. hasil cv2 / camera_module)."""
+    if not load_model_once():
+        return _error_result("Model gagal diload")
+
+    if img is None or img.size == 0:
+        return _error_result("Gambar kosong")
+
+    # Yang masuk antrean cukup frame uint8 224x224; float32 dibuat sekali per batch
+    raw = np.squeeze(_get_batcher().submit(preprocessing.resize(img), timeout=INFERENCE_TIMEOUT_SECONDS))
+    prediction_list = raw.tolist() if hasattr(raw, "tolist") else [float(raw)]
+    label, confidence = interpret(raw)
     print(f"🔍 [AI SCORE] Label: {label}, Confidence: {confidence:.4f} (raw: {prediction_list})")
 
     return {
         "label": label,
         "confidence": confidence,
-        "model": os.path.basename(MODEL_PATH),
+        "model": _model_name(),
+        "backend": model.name,
         "details": {
             "raw": prediction_list,
             "classes": CLASSES,
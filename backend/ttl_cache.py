@@ -0,0 +1,109 @@
+import collections
+import threading
+import time
+from typing import Callable, Hashable
+
+
+class _InFlight:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """
+    Cache LRU + TTL dengan single-flight: key identik yang diminta bersamaan
+    hanya memicu satu compute(), sisanya menunggu hasil yang sama. Dipakai
+    jawaban chatbot (chat_cache) dan leaderboard MVP (mvp_ranking).
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "not_cached": 0}
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], tuple]) -> tuple:
+        """
+        `compute()` mengembalikan (value, cacheable). Return (value, source) dengan
+        source "cache", "coalesced" atau "computed".
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry[1], "cache"
+                del self._entries[key]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _InFlight()
+                self._stats["misses"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value, "coalesced"
+
+        try:
+            value, cacheable = compute()
+            flight.value = value
+            with self._lock:
+                if cacheable:
+                    self._store(key, value)
+                else:
+                    self._stats["not_cached"] += 1
+            return value, "computed"
+        except Exception as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def peek(self, key: Hashable):
+        """Nilai yang masih berlaku atau None, tanpa single-flight (mis. jalur streaming chat)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value) -> None:
+        with self._lock:
+            self._store(key, value)
+
+    def _store(self, key: Hashable, value) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "in_flight": len(self._inflight),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                **self._stats,
+            }
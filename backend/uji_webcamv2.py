@@ -1,7 +1,7 @@
 import cv2
-import numpy as np
 import tensorflow as tf
 import time
+import preprocessing
 
 # ==========================================
 # 1. KONFIGURASI PENGGUNA
@@ -10,7 +10,7 @@ import time
 MODEL_PATH = 'model_sampah_csv_custom.h5' 
 
 # Ukuran input model (Wajib 224 jika pakai MobileNetV2 standar)
-IMG_SIZE = (224, 224)
+IMG_SIZE = preprocessing.IMG_SIZE
 
 # Label Kelas (Sesuai urutan alfabetis folder/generator)
 # 0 = Anorganik, 1 = Kertas/Tisu
@@ -36,14 +36,14 @@ except:
 # ==========================================
 # 3. FUNGSI UTAMA
 # ==========================================
+# Buffer [1, 224, 224, 3] dipakai ulang tiap frame (tidak ada alokasi baru per frame)
+_input_buffer = preprocessing.BatchBuffer(1, IMG_SIZE)
+
+
 def preprocess_image(frame):
-    # 1. Resize ke 224x224
-    img = cv2.resize(frame, IMG_SIZE)
-    # 2. Convert ke Array & Normalisasi (0-1)
-    img = np.array(img, dtype=np.float32) / 255.0
-    # 3. Tambah dimensi batch [1, 224, 224, 3]
-    img = np.expand_dims(img, axis=0)
-    return img
+    # Resize ke 224x224 + normalisasi (0-1) + dimensi batch [1, 224, 224, 3],
+    # sama persis dengan server (backend/preprocessing.py)
+    return _input_buffer.fill([frame])
 
 def draw_bar(frame, score):
     """Menggambar bar visualisasi kepercayaan"""
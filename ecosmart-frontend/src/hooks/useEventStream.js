@@ -0,0 +1,36 @@
+import { useEffect, useRef, useState } from 'react'
+import { subscribeEvents } from '../services/events'
+
+/**
+ * Dengarkan satu topik SSE dari backend. Selama stream belum/tidak terhubung,
+ * `fallback` dipanggil berkala setiap `fallbackInterval` ms (polling lama),
+ * dan sekali saat stream (re)connect agar state tidak ketinggalan.
+ */
+export const useEventStream = (topic, onEvent, { enabled = true, fallback = null, fallbackInterval = 3000 } = {}) => {
+  const [connected, setConnected] = useState(false)
+  const onEventRef = useRef(onEvent)
+  const fallbackRef = useRef(fallback)
+
+  onEventRef.current = onEvent
+  fallbackRef.current = fallback
+
+  useEffect(() => {
+    if (!enabled) return undefined
+    const unsubscribe = subscribeEvents(
+      topic,
+      (data) => onEventRef.current?.(data),
+      (isConnected) => setConnected(isConnected)
+    )
+    return unsubscribe
+  }, [topic, enabled])
+
+  useEffect(() => {
+    if (!enabled || !fallbackRef.current) return undefined
+    fallbackRef.current()
+    if (connected) return undefined
+    const intervalId = setInterval(() => fallbackRef.current?.(), fallbackInterval)
+    return () => clearInterval(intervalId)
+  }, [enabled, connected, fallbackInterval])
+
+  return { connected }
+}
@@ -1,6 +1,7 @@
 import { useEffect, useState, useRef } from 'react'
 import { useNavigate, useLocation } from 'react-router-dom'
 import { checkSession } from '../services/api'
+import { subscribeEvents } from '../services/events'
 
 export const useSessionPolling = (enabled = true, interval = 1000) => {
   const [session, setSession] = useState(null)
@@ -14,10 +15,8 @@ export const useSessionPolling = (enabled = true, interval = 1000) => {
   useEffect(() => {
     if (!enabled) return
 
-    const pollSession = async () => {
+    const handleSession = (data) => {
       try {
-        const data = await checkSession()
-        
         // CRITICAL: Skip session update jika baru saja logout (prevent immediate re-login)
         // Check if session timestamp is before logout timestamp
         if (logoutTimestampRef.current && data.active && data.user?.timestamp) {
@@ -95,9 +94,32 @@ export const useSessionPolling = (enabled = true, interval = 1000) => {
       }
     }
 
+    const pollSession = async () => {
+      const data = await checkSession()
+      handleSession(data)
+    }
+
+    // Server push: perubahan session langsung dikirim backend lewat SSE.
+    // Polling /api/check-session hanya berjalan selama stream belum/tidak terhubung.
+    let intervalId = null
+    const stopPolling = () => {
+      if (intervalId) {
+        clearInterval(intervalId)
+        intervalId = null
+      }
+    }
     pollSession()
-    const intervalId = setInterval(pollSession, interval)
-    return () => clearInterval(intervalId)
+    const unsubscribe = subscribeEvents('session', handleSession, (connected) => {
+      if (connected) {
+        stopPolling()
+      } else if (!intervalId) {
+        intervalId = setInterval(pollSession, interval)
+      }
+    })
+    return () => {
+      unsubscribe()
+      stopPolling()
+    }
   }, [enabled, interval, navigate, location.pathname])
 
   // Reset redirect flag when location changes - prevent loop
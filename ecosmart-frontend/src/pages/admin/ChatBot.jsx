@@ -1,7 +1,7 @@
 import { useState } from 'react'
 import { motion } from 'framer-motion'
 import { MessageSquare } from 'lucide-react'
-import { chatOpenAI } from '../../services/api'
+import { chatOpenAI, streamChat } from '../../services/api'
 
 const ChatBot = () => {
   const [chatMessages, setChatMessages] = useState([])
@@ -17,24 +17,38 @@ const ChatBot = () => {
     setChatMessages((prev) => [...prev, { role: 'user', content: userMessage }])
     setIsChatLoading(true)
 
-    try {
-      const response = await chatOpenAI(userMessage)
-      if (response.status === 'success') {
-        setChatMessages((prev) => [
-          ...prev,
-          { role: 'assistant', content: response.answer },
-        ])
-      } else {
-        setChatMessages((prev) => [
-          ...prev,
-          { role: 'assistant', content: 'Maaf, terjadi kesalahan.' },
-        ])
-      }
-    } catch (error) {
+    // Balasan asisten diisi bertahap saat token datang
+    let streamed = false
+    const appendToken = (text) => {
+      const first = !streamed
+      streamed = true
+      setIsChatLoading(false)
+      setChatMessages((prev) => {
+        if (first) return [...prev, { role: 'assistant', content: text }]
+        const last = prev[prev.length - 1]
+        return [...prev.slice(0, -1), { ...last, content: last.content + text }]
+      })
+    }
+    const showError = () => {
       setChatMessages((prev) => [
         ...prev,
         { role: 'assistant', content: 'Maaf, terjadi kesalahan.' },
       ])
+    }
+
+    try {
+      let response
+      try {
+        response = await streamChat(userMessage, appendToken)
+      } catch (streamError) {
+        // Stream tidak bisa dibuka (mis. proxy lama): pakai endpoint biasa
+        if (streamed) throw streamError
+        response = await chatOpenAI(userMessage)
+        if (response.status === 'success') appendToken(response.answer)
+      }
+      if (response.status !== 'success' && !streamed) showError()
+    } catch (error) {
+      if (!streamed) showError()
     } finally {
       setIsChatLoading(false)
     }
@@ -73,7 +87,7 @@ const ChatBot = () => {
                     : 'bg-gray-100 text-gray-800'
                 }`}
               >
-                <p className="text-sm">{msg.content}</p>
+                <p className="text-sm whitespace-pre-wrap">{msg.content}</p>
               </div>
             </div>
           ))}
@@ -1,23 +1,14 @@
-import { useEffect, useState } from 'react'
+import { useEffect, useRef, useState } from 'react'
 import { motion } from 'framer-motion'
 import { BarChart3, Trash2, TrendingUp } from 'lucide-react'
 import { getDashboardData, getBinStatus } from '../../services/api'
+import { useEventStream } from '../../hooks/useEventStream'
 
 const AdminDashboard = () => {
   const [dashboardData, setDashboardData] = useState(null)
   const [binStatus, setBinStatus] = useState(null)
 
-  useEffect(() => {
-    loadDashboardData()
-    loadBinStatus()
-
-    const interval = setInterval(() => {
-      loadDashboardData()
-      loadBinStatus()
-    }, 5000)
-
-    return () => clearInterval(interval)
-  }, [])
+  const reloadTimerRef = useRef(null)
 
   const loadDashboardData = async () => {
     const data = await getDashboardData()
@@ -29,6 +20,21 @@ const AdminDashboard = () => {
     if (status) setBinStatus(status)
   }
 
+  // Log baru dipush via SSE: muat ulang dashboard sekali untuk satu rentetan event
+  const scheduleDashboardReload = () => {
+    if (reloadTimerRef.current) return
+    reloadTimerRef.current = setTimeout(() => {
+      reloadTimerRef.current = null
+      loadDashboardData()
+    }, 500)
+  }
+
+  useEffect(() => () => clearTimeout(reloadTimerRef.current), [])
+
+  // Polling 5 detik hanya dipakai jika stream SSE terputus
+  useEventStream('logs', scheduleDashboardReload, { fallback: loadDashboardData, fallbackInterval: 5000 })
+  useEventStream('bin', setBinStatus, { fallback: loadBinStatus, fallbackInterval: 5000 })
+
   const binCapacity = binStatus?.distance_cm
     ? Math.max(0, Math.min(100, ((30 - binStatus.distance_cm) / 30) * 100))
     : 0
@@ -2,18 +2,28 @@ import { useEffect, useState } from 'react'
 import { motion } from 'framer-motion'
 import { getMVPLeaderboard } from '../../services/api'
 
+const PERIODS = [
+  { value: 'all', label: 'Total Saldo' },
+  { value: 'day', label: 'Hari Ini' },
+  { value: 'week', label: 'Minggu Ini' },
+  { value: 'month', label: 'Bulan Ini' },
+]
+
 const Leaderboard = () => {
   const [leaderboard, setLeaderboard] = useState(null)
+  const [period, setPeriod] = useState('all')
 
   useEffect(() => {
-    loadLeaderboard()
-  }, [])
+    loadLeaderboard(period)
+  }, [period])
 
-  const loadLeaderboard = async () => {
-    const data = await getMVPLeaderboard()
+  const loadLeaderboard = async (selected) => {
+    const data = await getMVPLeaderboard(selected)
     if (data) setLeaderboard(data)
   }
 
+  const isAll = period === 'all'
+
   return (
     <div className="p-8">
       <motion.div
@@ -26,6 +36,22 @@ const Leaderboard = () => {
           <p className="text-gray-600">Top performers per program studi</p>
         </div>
 
+        <div className="flex gap-2">
+          {PERIODS.map((option) => (
+            <button
+              key={option.value}
+              onClick={() => setPeriod(option.value)}
+              className={`px-4 py-2 rounded-lg text-sm font-medium ${
+                period === option.value
+                  ? 'bg-indigo-600 text-white'
+                  : 'bg-white text-gray-600 shadow-sm'
+              }`}
+            >
+              {option.label}
+            </button>
+          ))}
+        </div>
+
         {leaderboard?.leaderboard?.map((prodi, idx) => (
           <div key={idx} className="bg-white rounded-xl shadow-md p-6">
             <div className="flex items-center justify-between mb-4">
@@ -33,9 +59,9 @@ const Leaderboard = () => {
                 {prodi.prodi || 'Tidak Diketahui'}
               </h3>
               <div className="text-right">
-                <p className="text-sm text-gray-600">Total Saldo</p>
+                <p className="text-sm text-gray-600">{isAll ? 'Total Saldo' : 'Total Poin'}</p>
                 <p className="text-2xl font-bold text-indigo-600">
-                  {prodi.total_saldo?.toLocaleString('id-ID') || 0}
+                  {Number((isAll ? prodi.total_saldo : prodi.total_points) || 0).toLocaleString('id-ID')}
                 </p>
               </div>
             </div>
@@ -67,7 +93,7 @@ const Leaderboard = () => {
                       </div>
                     </div>
                     <p className="font-bold text-indigo-600">
-                      {user.saldo?.toLocaleString('id-ID') || 0} pts
+                      {((isAll ? user.saldo : user.points) || 0).toLocaleString('id-ID')} pts
                     </p>
                   </div>
                 ))}
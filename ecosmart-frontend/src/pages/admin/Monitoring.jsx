@@ -1,21 +1,19 @@
-import { useEffect, useState } from 'react'
+import { useState } from 'react'
 import { motion } from 'framer-motion'
 import { getBinStatus } from '../../services/api'
+import { useEventStream } from '../../hooks/useEventStream'
 
 const Monitoring = () => {
   const [binStatus, setBinStatus] = useState(null)
 
-  useEffect(() => {
-    loadBinStatus()
-    const interval = setInterval(loadBinStatus, 2000) // Update every 2 seconds
-    return () => clearInterval(interval)
-  }, [])
-
   const loadBinStatus = async () => {
     const status = await getBinStatus()
     if (status) setBinStatus(status)
   }
 
+  // Update dipush backend via SSE; polling 2 detik hanya jika stream terputus
+  useEventStream('bin', setBinStatus, { fallback: loadBinStatus, fallbackInterval: 2000 })
+
   const binCapacity = binStatus?.distance_cm
     ? Math.max(0, Math.min(100, ((30 - binStatus.distance_cm) / 30) * 100))
     : 0
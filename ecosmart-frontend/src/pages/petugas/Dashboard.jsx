@@ -1,9 +1,10 @@
 import { useEffect, useState } from 'react'
 import { useNavigate } from 'react-router-dom'
 import { motion } from 'framer-motion'
-import { AlertTriangle, CheckCircle, Clock, Trash2, Loader2 } from 'lucide-react'
+import { AlertTriangle, CheckCircle, Clock, Trash2, Loader2, MapPin } from 'lucide-react'
 import { useSessionPolling } from '../../hooks/useSessionPolling'
-import { getBinStatus, updateBinStatus, logout } from '../../services/api'
+import { getBinStatus, getPickupRoute, updateBinStatus, logout } from '../../services/api'
+import { useEventStream } from '../../hooks/useEventStream'
 
 const PetugasDashboard = () => {
   const navigate = useNavigate()
@@ -12,6 +13,16 @@ const PetugasDashboard = () => {
   const [binStatus, setBinStatus] = useState(null)
   const [countdown, setCountdown] = useState(60)
   const [isResetting, setIsResetting] = useState(false)
+  const [pickupStops, setPickupStops] = useState([])
+  const isPetugasSession =
+    (session?.active || !!session?.user) && (session?.role || session?.user?.role) === 'petugas'
+
+  // Status tong dipush via SSE; polling 3 detik hanya jika stream terputus
+  useEventStream('bin', setBinStatus, {
+    enabled: isPetugasSession,
+    fallback: () => loadBinStatus(),
+    fallbackInterval: 3000,
+  })
 
   useEffect(() => {
     // FIX: Cek session dengan struktur yang fleksibel (sama seperti user)
@@ -25,9 +36,6 @@ const PetugasDashboard = () => {
       return
     }
 
-    loadBinStatus()
-    const interval = setInterval(loadBinStatus, 3000)
-
     const countdownInterval = setInterval(() => {
       setCountdown((prev) => {
         if (prev <= 1) {
@@ -40,11 +48,22 @@ const PetugasDashboard = () => {
     }, 1000)
 
     return () => {
-      clearInterval(interval)
       clearInterval(countdownInterval)
     }
   }, [session, navigate])
 
+  // Rute pickup dihitung di background oleh backend; cukup ambil dari cache sekali per menit
+  useEffect(() => {
+    if (!isPetugasSession) return
+    const loadRoute = async () => {
+      const route = await getPickupRoute(session?.user?.id)
+      if (route?.stops) setPickupStops(route.stops)
+    }
+    loadRoute()
+    const routeInterval = setInterval(loadRoute, 60000)
+    return () => clearInterval(routeInterval)
+  }, [isPetugasSession, session?.user?.id])
+
   const loadBinStatus = async () => {
     const status = await getBinStatus()
     if (status) setBinStatus(status)
@@ -60,7 +79,7 @@ const PetugasDashboard = () => {
   const handleResetBin = async () => {
     setIsResetting(true)
     try {
-      await updateBinStatus('siap', 30)
+      await updateBinStatus('siap', 30, binStatus?.bin_id)
       await loadBinStatus()
       setTimeout(() => {
         handleAutoLogout()
@@ -164,6 +183,34 @@ const PetugasDashboard = () => {
         )}
       </motion.div>
 
+      {/* Pickup Route */}
+      {pickupStops.length > 0 && (
+        <motion.div
+          initial={{ opacity: 0, y: 20 }}
+          animate={{ opacity: 1, y: 0 }}
+          transition={{ delay: 0.3 }}
+          className="bg-white rounded-2xl shadow-lg p-6"
+        >
+          <div className="flex items-center gap-2 mb-4">
+            <MapPin className="text-orange-600" size={20} />
+            <h3 className="font-bold text-gray-800">Rute Pengambilan</h3>
+          </div>
+          <ol className="space-y-2">
+            {pickupStops.map((stop) => (
+              <li key={stop.bin_id} className="flex items-center justify-between text-sm">
+                <span className="text-gray-700">
+                  {stop.order}. {stop.location || stop.bin_id}
+                </span>
+                <span className={stop.hours_to_full <= 0 ? 'text-red-600 font-bold' : 'text-gray-500'}>
+                  {stop.fill_percent ?? '-'}% ·{' '}
+                  {stop.hours_to_full <= 0 ? 'PENUH' : `penuh ~${stop.hours_to_full.toFixed(1)} jam`}
+                </span>
+              </li>
+            ))}
+          </ol>
+        </motion.div>
+      )}
+
       {/* Action Button */}
       <motion.div
         initial={{ opacity: 0, y: 20 }}
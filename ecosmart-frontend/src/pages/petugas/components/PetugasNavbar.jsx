@@ -1,7 +1,10 @@
 import { useNavigate } from 'react-router-dom'
 import { LogOut } from 'lucide-react'
 import { useSessionPolling } from '../../../hooks/useSessionPolling'
-import { logout } from '../../../services/api'
+import { KIOSK_ID, logout } from '../../../services/api'
+
+// Session per kiosk: header yang sama dengan klien axios di services/api
+const kioskHeaders = KIOSK_ID ? { 'X-Kiosk-Id': KIOSK_ID } : {}
 
 const PetugasNavbar = () => {
   const navigate = useNavigate()
@@ -30,14 +33,14 @@ const PetugasNavbar = () => {
       try {
         log('Clearing session di backend...')
         // Coba ambil session dari check-session dulu untuk dapat rfid_uid
-        const sessionCheck = await fetch('http://localhost:5001/api/check-session')
+        const sessionCheck = await fetch('http://localhost:5001/api/check-session', { headers: kioskHeaders })
         const sessionData = await sessionCheck.json()
         log('Current session from backend', sessionData)
         
         // Clear session di backend - WAIT untuk response
         const logoutResponse = await fetch('http://localhost:5001/api/logout', {
           method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
+          headers: { 'Content-Type': 'application/json', ...kioskHeaders },
           body: JSON.stringify({ 
             rfid_uid: session?.user?.rfid_uid || sessionData?.user?.rfid_uid || 'petugas',
             role: 'petugas' 
@@ -50,7 +53,7 @@ const PetugasNavbar = () => {
         
         // Verifikasi session sudah clear
         await new Promise(resolve => setTimeout(resolve, 200)) // Tunggu 200ms
-        const verifySession = await fetch('http://localhost:5001/api/check-session')
+        const verifySession = await fetch('http://localhost:5001/api/check-session', { headers: kioskHeaders })
         const verifyData = await verifySession.json()
         log('Session after logout (should be inactive)', verifyData)
         
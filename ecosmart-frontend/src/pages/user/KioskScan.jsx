@@ -3,6 +3,7 @@ import { useNavigate } from 'react-router-dom'
 import { motion } from 'framer-motion'
 import { useSessionPolling } from '../../hooks/useSessionPolling'
 import { logout, getDashboardData, getBinStatus } from '../../services/api'
+import { subscribeEvents } from '../../services/events'
 
 const KioskScan = () => {
   const navigate = useNavigate()
@@ -62,30 +63,34 @@ const KioskScan = () => {
   useEffect(() => {
     if (!session?.active || session?.role !== 'user') return
 
+    const handleScanLog = (newLog) => {
+      if (!newLog) return
+      setLastLog(newLog)
+
+      // Auto-logout setelah scan berhasil - tunggu program ino selesai semua
+      // Hanya trigger untuk trash scan yang valid (KERTAS, ANORGANIK), bukan ROLE_ logs
+      const trashType = newLog?.trash_type
+      if (trashType && !hasScanned && 
+          trashType !== 'ROLE_USER_LOGOUT' && 
+          !trashType.startsWith('ROLE_') &&
+          (trashType === 'KERTAS' || trashType === 'ANORGANIK' || trashType === 'TISU')) {
+        setHasScanned(true)
+        // FIX: Delay lebih lama untuk biarkan user lihat saldo bertambah
+        // Timing: ino selesai (8s) + lihat saldo (5s) = 13 detik total
+        console.log(`[AUTO-LOGOUT] Scan terdeteksi: ${trashType}, akan logout dalam 13 detik (setelah ino selesai + lihat saldo)...`)
+        const timer = setTimeout(() => {
+          console.log('[AUTO-LOGOUT] Program ino selesai dan user sudah lihat saldo, auto logout...')
+          handleLogout()
+        }, 13000) // 13 detik: 8s untuk ino selesai + 5s untuk lihat saldo bertambah
+        setAutoLogoutTimer(timer)
+      }
+    }
+
     const fetchData = async () => {
       try {
         const data = await getDashboardData()
         if (data?.last_scan) {
-          const newLog = data.last_scan
-          setLastLog(newLog)
-          
-          // Auto-logout setelah scan berhasil - tunggu program ino selesai semua
-          // Hanya trigger untuk trash scan yang valid (KERTAS, ANORGANIK), bukan ROLE_ logs
-          const trashType = newLog?.trash_type
-          if (trashType && !hasScanned && 
-              trashType !== 'ROLE_USER_LOGOUT' && 
-              !trashType.startsWith('ROLE_') &&
-              (trashType === 'KERTAS' || trashType === 'ANORGANIK' || trashType === 'TISU')) {
-            setHasScanned(true)
-            // FIX: Delay lebih lama untuk biarkan user lihat saldo bertambah
-            // Timing: ino selesai (8s) + lihat saldo (5s) = 13 detik total
-            console.log(`[AUTO-LOGOUT] Scan terdeteksi: ${trashType}, akan logout dalam 13 detik (setelah ino selesai + lihat saldo)...`)
-            const timer = setTimeout(() => {
-              console.log('[AUTO-LOGOUT] Program ino selesai dan user sudah lihat saldo, auto logout...')
-              handleLogout()
-            }, 13000) // 13 detik: 8s untuk ino selesai + 5s untuk lihat saldo bertambah
-            setAutoLogoutTimer(timer)
-          }
+          handleScanLog(data.last_scan)
         }
       } catch (error) {
         console.error('Error fetching dashboard data:', error)
@@ -103,14 +108,41 @@ const KioskScan = () => {
       }
     }
 
+    // Scan baru & status tong dipush backend via SSE. Polling 2 detik hanya
+    // berjalan selama stream belum/tidak terhubung.
+    let intervalId = null
+    const stopPolling = () => {
+      if (intervalId) {
+        clearInterval(intervalId)
+        intervalId = null
+      }
+    }
+    const handleStreamStatus = (connected) => {
+      if (connected) {
+        stopPolling()
+      } else if (!intervalId) {
+        intervalId = setInterval(() => {
+          fetchData()
+          fetchBinStatus()
+        }, 2000)
+      }
+    }
+
     fetchData()
     fetchBinStatus()
-    const interval = setInterval(() => {
-      fetchData()
-      fetchBinStatus()
-    }, 2000) // Poll every 2 seconds untuk deteksi scan lebih cepat
-    return () => clearInterval(interval)
-  }, [session?.active, session?.role, hasScanned, handleLogout])
+    const unsubscribeLogs = subscribeEvents('logs', (log) => {
+      // Hanya scan milik user yang sedang login di kiosk ini
+      if (log?.rfid_uid && log.rfid_uid === session?.user?.rfid_uid) {
+        handleScanLog(log)
+      }
+    }, handleStreamStatus)
+    const unsubscribeBin = subscribeEvents('bin', (status) => status && setBinOverview(status))
+    return () => {
+      unsubscribeLogs()
+      unsubscribeBin()
+      stopPolling()
+    }
+  }, [session?.active, session?.role, session?.user?.rfid_uid, hasScanned, handleLogout])
 
   // Cleanup auto-logout timer
   useEffect(() => {
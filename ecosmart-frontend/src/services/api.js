@@ -1,11 +1,26 @@
 import axios from 'axios'
 
-const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:5001'
+export const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:5001'
+
+// Identitas kiosk/bin: buka halaman dengan ?kiosk=BIN-01 sekali (disimpan di localStorage)
+// atau set VITE_KIOSK_ID. Kosong = kiosk bersama 'default' seperti sebelumnya.
+const resolveKioskId = () => {
+  if (typeof window === 'undefined') return import.meta.env.VITE_KIOSK_ID || ''
+  const fromUrl = new URLSearchParams(window.location.search).get('kiosk')
+  if (fromUrl) {
+    window.localStorage.setItem('kioskId', fromUrl)
+    return fromUrl
+  }
+  return window.localStorage.getItem('kioskId') || import.meta.env.VITE_KIOSK_ID || ''
+}
+
+export const KIOSK_ID = resolveKioskId()
 
 const api = axios.create({
   baseURL: API_BASE_URL,
   headers: {
     'Content-Type': 'application/json',
+    ...(KIOSK_ID ? { 'X-Kiosk-Id': KIOSK_ID } : {}),
   },
 })
 
@@ -49,9 +64,9 @@ export const getBinStatus = async () => {
   }
 }
 
-export const updateBinStatus = async (status, distance_cm) => {
+export const updateBinStatus = async (status, distance_cm, device_id) => {
   try {
-    const response = await api.post('/api/bin-update', { status, distance_cm })
+    const response = await api.post('/api/bin-update', { status, distance_cm, device_id })
     return response.data
   } catch (error) {
     console.error('Error updating bin status:', error)
@@ -59,6 +74,18 @@ export const updateBinStatus = async (status, distance_cm) => {
   }
 }
 
+export const getPickupRoute = async (petugasId) => {
+  try {
+    const response = await api.get('/api/pickup-route', {
+      params: petugasId ? { petugas_id: petugasId } : {},
+    })
+    return response.data
+  } catch (error) {
+    console.error('Error fetching pickup route:', error)
+    return null
+  }
+}
+
 export const chatOpenAI = async (question) => {
   try {
     const response = await api.post('/api/chat-openai', { question })
@@ -69,9 +96,51 @@ export const chatOpenAI = async (question) => {
   }
 }
 
-export const getMVPLeaderboard = async () => {
+// Jawaban chatbot token demi token dari /api/chat-stream (SSE lewat POST, jadi
+// dibaca manual dengan fetch + ReadableStream, bukan EventSource).
+// Melempar error jika stream tidak bisa dibuka sama sekali.
+export const streamChat = async (question, onToken) => {
+  const response = await fetch(`${API_BASE_URL}/api/chat-stream`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      ...(KIOSK_ID ? { 'X-Kiosk-Id': KIOSK_ID } : {}),
+    },
+    body: JSON.stringify({ question, provider: 'openai' }),
+  })
+  if (!response.ok || !response.body) throw new Error(`HTTP ${response.status}`)
+
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  let result = { status: 'error', message: 'Stream terputus' }
+  for (;;) {
+    const { value, done } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+    let boundary
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const raw = buffer.slice(0, boundary)
+      buffer = buffer.slice(boundary + 2)
+      let event = 'message'
+      let data = ''
+      for (const line of raw.split('\n')) {
+        if (line.startsWith('event: ')) event = line.slice(7)
+        else if (line.startsWith('data: ')) data += line.slice(6)
+      }
+      if (!data) continue
+      const payload = JSON.parse(data)
+      if (event === 'token') onToken(payload.text)
+      else if (event === 'done') result = { status: 'success', ...payload }
+      else if (event === 'error') result = { status: 'error', message: payload.message }
+    }
+  }
+  return result
+}
+
+export const getMVPLeaderboard = async (period = 'all') => {
   try {
-    const response = await api.get('/api/mvp-leaderboard')
+    const response = await api.get('/api/mvp-leaderboard', { params: { period } })
     return response.data
   } catch (error) {
     console.error('Error fetching leaderboard:', error)
@@ -0,0 +1,96 @@
+import { API_BASE_URL, KIOSK_ID } from './api'
+
+// Satu EventSource dipakai bersama oleh semua komponen; topik digabung dari semua listener
+const listeners = new Map() // topic -> Set(handler)
+const statusListeners = new Set()
+let source = null
+let sourceTopics = ''
+let reconnectTimer = null
+
+const isEventStreamSupported = () => typeof window !== 'undefined' && !!window.EventSource
+
+const activeTopics = () =>
+  [...listeners.entries()]
+    .filter(([, handlers]) => handlers.size > 0)
+    .map(([topic]) => topic)
+    .sort()
+    .join(',')
+
+const notifyStatus = (connected) => {
+  statusListeners.forEach((handler) => handler(connected))
+}
+
+const closeSource = () => {
+  if (source) {
+    source.close()
+    source = null
+  }
+  sourceTopics = ''
+}
+
+const openSource = () => {
+  const topics = activeTopics()
+  if (topics === sourceTopics && source) return
+
+  closeSource()
+  if (!topics || !isEventStreamSupported()) {
+    notifyStatus(false)
+    return
+  }
+
+  sourceTopics = topics
+  const kiosk = KIOSK_ID ? `&kiosk=${encodeURIComponent(KIOSK_ID)}` : ''
+  source = new EventSource(`${API_BASE_URL}/api/events?topics=${topics}${kiosk}`)
+  source.onopen = () => notifyStatus(true)
+  source.onerror = () => {
+    notifyStatus(false)
+    // EventSource reconnect sendiri; jika koneksi ditutup permanen, buka ulang manual
+    if (source && source.readyState === EventSource.CLOSED && !reconnectTimer) {
+      reconnectTimer = setTimeout(() => {
+        reconnectTimer = null
+        closeSource()
+        openSource()
+      }, 3000)
+    }
+  }
+  topics.split(',').forEach((topic) => {
+    source.addEventListener(topic, (event) => {
+      let data = null
+      try {
+        data = JSON.parse(event.data)
+      } catch (error) {
+        console.error(`[EVENTS] Gagal parse event ${topic}:`, error)
+        return
+      }
+      listeners.get(topic)?.forEach((handler) => handler(data))
+    })
+  })
+}
+
+/**
+ * Subscribe ke topik SSE ('session', 'bin', 'logs').
+ * onStatus(connected) dipanggil saat stream terhubung/putus, supaya pemanggil bisa
+ * fallback ke polling. Return fungsi unsubscribe.
+ * Tanpa dukungan EventSource tidak ada yang didaftarkan; onStatus(false) langsung
+ * dipanggil agar pemanggil memakai polling.
+ */
+export const subscribeEvents = (topic, handler, onStatus) => {
+  if (!isEventStreamSupported()) {
+    if (onStatus) onStatus(false)
+    return () => {}
+  }
+  if (!listeners.has(topic)) listeners.set(topic, new Set())
+  listeners.get(topic).add(handler)
+  if (onStatus) {
+    statusListeners.add(onStatus)
+    onStatus(!!source && source.readyState === EventSource.OPEN)
+  }
+  openSource()
+
+  return () => {
+    listeners.get(topic)?.delete(handler)
+    if (onStatus) statusListeners.delete(onStatus)
+    // Ditunda agar unmount+mount ulang (mis. pindah halaman) tidak memutus stream
+    setTimeout(openSource, 0)
+  }
+}